@@ -1,25 +1,52 @@
 import os
 import uuid
+import click
 from datetime import timedelta, datetime
-from functools import wraps
-from flask import Flask, request
+from flask import Flask, current_app, request
 from flask_cors import CORS
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from extensions import db, cache, mail, celery
 from models.user import User, Role
-from models.reservation import Reservation
+from models.reservation import Reservation, STATUS_CODES, STATUS_NAMES
 from models.parking_lot import ParkingLot
 from models.parking_spot import ParkingSpot
+from services.availability import (
+    bump_lot_version,
+    lot_version,
+    lots_etag,
+    lots_listing,
+    reconcile_lot_counters,
+    pack_bitmap,
+    set_spot_status,
+    set_spots_status,
+    spots_etag,
+    spots_listing,
+)
+from services.schema import upgrade_schema
+from services.metrics import init_metrics, render_metrics
+from services.querystats import init_query_stats
+from services.replica import REPLICA_BIND, copy_sqlite_database, create_replica_router, replica_reads
+from services.sqlite import configure_sqlite
+from services import cache as response_cache
+from services.allocator import create_allocator
+from services.auth import admin_required, current_roles, issue_token, primary_role, token_is_stale
+from services.bulk import MAX_ITEMS as BULK_MAX_ITEMS, MODES as BULK_MODES, plan_bulk_reservations
+from services.events import create_broker
+from services.lots import SpotsInUse, create_spots, resize_lot
+from services.passwords import HashingBusy, create_hashing_pool
+from services.intervals import interval_indexes, parse_client_time, spot_has_overlap
+from services.pagination import page_limit, seek_page
 
 from security import user_datastore, security, jwt
 from flask_jwt_extended import (
-    create_access_token,
     jwt_required,
     get_jwt_identity,
 )
 from flask_restx import Api, Resource, Namespace, fields
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 import logging
 
@@ -29,6 +56,37 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+CORS_ORIGINS = ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5000"]
+
+# answer for a booking that lost a race for its spot
+SPOT_TAKEN = {"message": "This spot was just booked by someone else", "errors": {"spot_id": "Please pick another spot or time"}}
+# answer when the password hashing pool is full (services/passwords.py)
+HASHING_BUSY = {"message": "We're handling a lot of sign-ins right now", "errors": {"general": "Please try again in a moment"}}
+
+
+# Helper function to create user with proper password hashing
+def create_user_with_hash(username, email, password, roles=None):
+    """Create user with properly hashed password and fs_uniquifier"""
+    hashed_password = current_app.extensions["password_hasher"].hash(password)
+    fs_uniquifier = str(uuid.uuid4())
+    
+    user = User(
+        username=username,
+        email=email,
+        password=hashed_password,
+        fs_uniquifier=fs_uniquifier,
+        active=True
+    )
+    
+    if roles:
+        for role_name in roles:
+            role = Role.query.filter_by(name=role_name).first()
+            if role:
+                user.roles.append(role)
+    
+    db.session.add(user)
+    return user
+
 
 def create_app(test_config=None):
     app = Flask(__name__)
@@ -42,6 +100,24 @@ def create_app(test_config=None):
         "pool_pre_ping": True,
         "pool_recycle": 300,
     }
+    # SQLite only: per-connection pragmas and an optional in-process writer queue (services/sqlite.py)
+    app.config["SQLITE_PRAGMAS"] = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 10000)),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "cache_size": -int(os.getenv("SQLITE_CACHE_KB", 20000)),  # negative means KiB
+        "mmap_size": int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+        "temp_store": "MEMORY",
+    }
+    app.config["SQLITE_WRITE_LOCK"] = os.getenv("SQLITE_WRITE_LOCK", "false").lower() in ["true", "on", "1"]
+    app.config["SQLITE_WRITE_LOCK_TIMEOUT"] = float(os.getenv("SQLITE_WRITE_LOCK_TIMEOUT", 30))
+    # Read replica for the read-only endpoints (services/replica.py); unset means primary only
+    app.config["REPLICA_DATABASE_URI"] = os.getenv("REPLICA_DATABASE_URI")
+    # keep a user on the primary this long after their own write
+    app.config["REPLICA_STICKY_SECONDS"] = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+    app.config["REPLICA_MAX_LAG_SECONDS"] = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 2))
+    app.config["REPLICA_CHECK_SECONDS"] = float(os.getenv("REPLICA_CHECK_SECONDS", 1))
+    app.config["REPLICA_RETRY_SECONDS"] = float(os.getenv("REPLICA_RETRY_SECONDS", 10))
     
     # Security configuration
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
@@ -56,6 +132,8 @@ def create_app(test_config=None):
     app.config["JWT_TOKEN_LOCATION"] = ["headers"]
     app.config["JWT_HEADER_NAME"] = "Authorization"
     app.config["JWT_HEADER_TYPE"] = "Bearer"
+    # tokens carry roles; this bounds how long a worker trusts its cached auth version
+    app.config["AUTH_VERSION_CACHE_SECONDS"] = int(os.getenv("AUTH_VERSION_CACHE_SECONDS", 30))
 
     # Cache configuration
     app.config["CACHE_TYPE"] = os.getenv("CACHE_TYPE", "simple")
@@ -66,6 +144,39 @@ def create_app(test_config=None):
     app.config["CELERY_BROKER_URL"] = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/1")
     app.config["CELERY_RESULT_BACKEND"] = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/2")
 
+    # Spot status event streams ("memory" for a single process, "redis" across workers)
+    app.config["EVENTS_BROKER"] = os.getenv("EVENTS_BROKER", "memory")
+    app.config["EVENTS_REDIS_URL"] = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/3")
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    # serve the lots/spots reads on the event loop with async SQLAlchemy (services/fastpath.py)
+    app.config["FAST_READS"] = os.getenv("FAST_READS", "false").lower() in ["true", "on", "1"]
+
+    # Prometheus metrics at /api/metrics (services/metrics.py); a token, if set, is required to scrape
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "true").lower() in ["true", "on", "1"]
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN")
+    # per-request SQL stats (services/querystats.py): slow statements, statement budget, N+1 shapes
+    app.config["QUERY_STATS_ENABLED"] = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ["true", "on", "1"]
+    app.config["SLOW_QUERY_MS"] = float(os.getenv("SLOW_QUERY_MS", 200))
+    app.config["QUERY_BUDGET"] = int(os.getenv("QUERY_BUDGET", 50))
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+    # Free-spot allocator for "reserve any spot" (services/allocator.py)
+    app.config["ALLOCATOR_BACKEND"] = os.getenv("ALLOCATOR_BACKEND", "memory")
+    app.config["ALLOCATOR_REDIS_URL"] = os.getenv("ALLOCATOR_REDIS_URL", "redis://localhost:6379/4")
+    app.config["ALLOCATOR_POLICY"] = os.getenv("ALLOCATOR_POLICY", "lowest_number")
+    app.config["ALLOCATOR_ENTRANCE_SPOTS"] = [
+        int(n) for n in os.getenv("ALLOCATOR_ENTRANCE_SPOTS", "1").split(",") if n.strip()
+    ]
+    app.config["ALLOCATOR_RECONCILE_SECONDS"] = float(os.getenv("ALLOCATOR_RECONCILE_SECONDS", 30))
+
+    # Password hashing pool and argon2 parameters (services/passwords.py)
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_QUEUE"] = int(os.getenv("PASSWORD_HASH_QUEUE", 8))
+    app.config["PASSWORD_HASH_TIMEOUT"] = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    app.config["ARGON2_TIME_COST"] = int(os.getenv("ARGON2_TIME_COST", 2))
+    app.config["ARGON2_MEMORY_COST"] = int(os.getenv("ARGON2_MEMORY_COST", 19456))
+    app.config["ARGON2_PARALLELISM"] = int(os.getenv("ARGON2_PARALLELISM", 1))
+
     # Email configuration
     app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", 587))
@@ -76,8 +187,8 @@ def create_app(test_config=None):
     # CORS - Allow all origins in development
     CORS(app, resources={
         r"/api/*": {
-            "origins": ["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5000"],
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "origins": CORS_ORIGINS,
+            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
             "supports_credentials": True
         }
@@ -86,17 +197,38 @@ def create_app(test_config=None):
     if test_config:
         app.config.update(test_config)
 
+    if app.config["REPLICA_DATABASE_URI"]:
+        app.config["SQLALCHEMY_BINDS"] = {
+            **app.config.get("SQLALCHEMY_BINDS", {}), REPLICA_BIND: app.config["REPLICA_DATABASE_URI"]
+        }
+
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine, app.config)
+        if REPLICA_BIND in db.engines:
+            configure_sqlite(db.engines[REPLICA_BIND], app.config, write_lock=False)
+        app.extensions["replica_router"] = create_replica_router(app.config, db.engines, cache)
+        init_metrics(app, {name or "primary": engine for name, engine in db.engines.items()})
+        app.extensions["query_monitor"] = init_query_stats(app, db.engines.values())
     security.init_app(app, user_datastore)
     jwt.init_app(app)
+    jwt.token_in_blocklist_loader(token_is_stale)
     cache.init_app(app)
     mail.init_app(app)
+    app.extensions["spot_events"] = create_broker(app.config)
+    allocator = app.extensions["spot_allocator"] = create_allocator(app.config)
+    app.extensions["spot_change_listeners"] = [allocator.apply_changes]
+    app.extensions["password_hasher"] = create_hashing_pool(app.config)
 
     # Configure Celery
     celery.conf.update(
         broker_url=app.config["CELERY_BROKER_URL"],
         result_backend=app.config["CELERY_RESULT_BACKEND"],
+        beat_schedule={
+            # spots booked ahead only turn occupied once their window starts
+            "sync-spot-occupancy": {"task": "jobs.sync_spot_occupancy", "schedule": 60.0},
+        },
     )
 
     # Flask-RESTX API setup
@@ -149,29 +281,6 @@ def create_app(test_config=None):
         "errors": fields.Raw(description="Detailed errors"),
     })
 
-    # Helper function to create user with proper password hashing
-    def create_user_with_hash(username, email, password, roles=None):
-        """Create user with properly hashed password and fs_uniquifier"""
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
-        fs_uniquifier = str(uuid.uuid4())
-        
-        user = User(
-            username=username,
-            email=email,
-            password=hashed_password,
-            fs_uniquifier=fs_uniquifier,
-            active=True
-        )
-        
-        if roles:
-            for role_name in roles:
-                role = Role.query.filter_by(name=role_name).first()
-                if role:
-                    user.roles.append(role)
-        
-        db.session.add(user)
-        return user
-
     # ========================
     # AUTH ENDPOINTS
     # ========================
@@ -225,7 +334,7 @@ def create_app(test_config=None):
                 db.session.commit()
                 
                 # Auto-login: create token
-                access_token = create_access_token(identity=str(user.id))
+                access_token = issue_token(user)
                 
                 logger.info(f"New user registered: {email}")
                 
@@ -240,6 +349,9 @@ def create_app(test_config=None):
                     }
                 }, 201
                 
+            except HashingBusy:
+                db.session.rollback()
+                return HASHING_BUSY, 503, {"Retry-After": "1"}
             except Exception as e:
                 db.session.rollback()
                 logger.error(f"Registration error: {str(e)}")
@@ -284,15 +396,20 @@ def create_app(test_config=None):
                         "errors": {"general": "Your account has been disabled. Please contact support."}
                     }, 401
                 
-                if not check_password_hash(user.password, password):
+                ok, new_hash = app.extensions["password_hasher"].verify(user.password, password)
+                if not ok:
                     return {
                         "message": "Invalid credentials",
                         "errors": {"password": "Incorrect password"}
                     }, 401
+                if new_hash:
+                    # legacy pbkdf2 or outdated argon2 parameters: upgrade in place
+                    user.password = new_hash
+                    db.session.commit()
                 
                 # Create token
-                access_token = create_access_token(identity=str(user.id))
-                role = user.roles[0].name if user.roles else "user"
+                access_token = issue_token(user)
+                role = primary_role([r.name for r in user.roles])
                 
                 logger.info(f"User logged in: {email}")
                 
@@ -307,6 +424,9 @@ def create_app(test_config=None):
                     }
                 }, 200
                 
+            except HashingBusy:
+                db.session.rollback()
+                return HASHING_BUSY, 503, {"Retry-After": "1"}
             except Exception as e:
                 logger.error(f"Login error: {str(e)}")
                 return {"message": "Login failed. Please try again.", "errors": {"general": str(e)}}, 500
@@ -323,6 +443,7 @@ def create_app(test_config=None):
     @auth_ns.route("/me")
     class MeResource(Resource):
         @jwt_required()
+        @replica_reads
         @auth_ns.response(200, "User info retrieved")
         def get(self):
             """Get current authenticated user info"""
@@ -333,7 +454,7 @@ def create_app(test_config=None):
                 if not user:
                     return {"message": "User not found"}, 404
                 
-                role = user.roles[0].name if user.roles else "user"
+                role = primary_role(current_roles())
                 
                 return {
                     "user": {
@@ -355,6 +476,7 @@ def create_app(test_config=None):
     @user_ns.route("/")
     class UserResource(Resource):
         @jwt_required()
+        @replica_reads
         def get(self):
             """Get current user info"""
             user_id = int(get_jwt_identity())
@@ -365,65 +487,84 @@ def create_app(test_config=None):
                 "id": user.id,
                 "username": user.username,
                 "email": user.email,
-                "role": user.roles[0].name if user.roles else "user"
+                "role": primary_role(current_roles())
             }, 200
 
     @user_ns.route("/role")
     class UserRoleResource(Resource):
         @jwt_required()
         def get(self):
-            """Get current user's role"""
-            user_id = int(get_jwt_identity())
-            user = User.query.get(user_id)
-            if not user:
-                return {"message": "User not found"}, 404
-            role = user.roles[0].name if user.roles else "user"
-            return {"role": role}, 200
+            """Get current user's role (from the token)"""
+            return {"role": primary_role(current_roles())}, 200
+
+    dashboard_parser = user_ns.parser()
+    dashboard_parser.add_argument("status", location="args", help="upcoming, active, completed or cancelled")
+    dashboard_parser.add_argument("cursor", location="args", help="next_cursor from the previous page")
+    dashboard_parser.add_argument("limit", type=int, location="args", help="Page size (default 50, max 500)")
 
     @user_ns.route("/dashboard-data")
     class UserDashboardResource(Resource):
         @jwt_required()
+        @replica_reads
+        @user_ns.expect(dashboard_parser)
         def get(self):
-            """Get user dashboard data with reservations"""
+            """Get user dashboard data: status counts plus one page of reservations"""
             try:
                 user_id = int(get_jwt_identity())
-                
-                reservations = (
-                    Reservation.query
-                    .filter_by(user_id=user_id)
-                    .order_by(Reservation.parking_time.desc())
-                    .all()
+                args = request.args
+
+                stats = {name: 0 for name in ("active", "completed", "upcoming", "cancelled")}
+                status_counts = (
+                    db.session.query(Reservation.status, func.count(Reservation.id))
+                    .filter(Reservation.user_id == user_id)
+                    .group_by(Reservation.status)
                 )
+                for code, count in status_counts:
+                    if STATUS_NAMES.get(code) in stats:
+                        stats[STATUS_NAMES[code]] = count
 
-                reservations_data = []
-                stats = {"active": 0, "completed": 0, "upcoming": 0, "cancelled": 0}
+                query = (
+                    db.session.query(
+                        Reservation.id,
+                        Reservation.parking_time,
+                        Reservation.leaving_time,
+                        Reservation.vehicle_number,
+                        Reservation.cost,
+                        Reservation.status,
+                        ParkingSpot.spot_no,
+                        ParkingLot.prime_location_name,
+                        ParkingLot.address,
+                    )
+                    .outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+                    .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+                    .filter(Reservation.user_id == user_id)
+                )
+                try:
+                    if args.get("status"):
+                        query = query.filter(Reservation.status == STATUS_CODES[args["status"]])
+                    limit = page_limit(args.get("limit"), default=50)
+                    rows, next_cursor = seek_page(
+                        query, Reservation.parking_time, Reservation.id, args.get("cursor"), limit
+                    )
+                except (KeyError, ValueError) as e:
+                    return {"message": "Invalid filter", "errors": {"general": str(e)}}, 400
 
-                for r in reservations:
-                    spot = ParkingSpot.query.get(r.spot_id)
-                    lot = ParkingLot.query.get(spot.lot_id) if spot else None
-                    
-                    # Determine status
-                    status_map = {"U": "upcoming", "A": "active", "C": "completed", "X": "cancelled"}
-                    status = status_map.get(r.status, "unknown")
-                    
-                    reservations_data.append({
-                        "id": r.id,
-                        "lot_name": lot.prime_location_name if lot else "Unknown",
-                        "lot_address": lot.address if lot else "",
-                        "spot_no": spot.spot_no if spot else "?",
-                        "vehicle_number": r.vehicle_number,
-                        "parking_time": r.parking_time.isoformat() if r.parking_time else None,
-                        "leaving_time": r.leaving_time.isoformat() if r.leaving_time else None,
-                        "cost": r.cost,
-                        "status": status,
-                    })
-                    
-                    if status in stats:
-                        stats[status] += 1
+                reservations_data = [{
+                    "id": r.id,
+                    "lot_name": r.prime_location_name or "Unknown",
+                    "lot_address": r.address or "",
+                    "spot_no": r.spot_no if r.spot_no is not None else "?",
+                    "vehicle_number": r.vehicle_number,
+                    "parking_time": r.parking_time.isoformat() if r.parking_time else None,
+                    "leaving_time": r.leaving_time.isoformat() if r.leaving_time else None,
+                    "cost": r.cost,
+                    "status": STATUS_NAMES.get(r.status, "unknown"),
+                } for r in rows]
 
                 return {
                     "reservations": reservations_data,
-                    "stats": stats
+                    "stats": stats,
+                    "next_cursor": next_cursor,
                 }, 200
                 
             except Exception as e:
@@ -434,61 +575,97 @@ def create_app(test_config=None):
     # PARKING ENDPOINTS
     # ========================
     
+    def etag_headers(etag):
+        """ETag plus no-cache, so browsers revalidate with If-None-Match on every poll"""
+        return {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+
+    def not_modified(etag):
+        """Empty 304 for a client that already has ``etag``"""
+        return app.response_class(status=304, headers=etag_headers(etag))
+
     @parking_ns.route("/lots")
     class ParkingLotsResource(Resource):
         @jwt_required()
+        @replica_reads
         def get(self):
             """Get all available parking lots"""
             try:
-                lots = ParkingLot.query.all()
-                lots_data = []
-                
-                for lot in lots:
-                    spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-                    available = sum(1 for s in spots if s.status == "A")
-                    total = len(spots)
-                    
-                    lots_data.append({
-                        "id": lot.id,
-                        "name": lot.prime_location_name,
-                        "address": lot.address,
-                        "pin_code": lot.pin_code,
-                        "price_per_hr": lot.price_per_hr,
-                        "total_spots": total,
-                        "available_spots": available,
-                        "occupancy": round((total - available) / total * 100, 1) if total > 0 else 0
-                    })
-                
-                return {"lots": lots_data}, 200
+                etag = lots_etag()
+                if request.if_none_match.contains_weak(etag):
+                    return not_modified(etag)
+                return response_cache.cached_lots(etag, lots_listing), 200, etag_headers(etag)
             except Exception as e:
                 logger.error(f"Error fetching lots: {str(e)}")
                 return {"message": "Failed to fetch parking lots"}, 500
 
+    spots_parser = parking_ns.parser()
+    spots_parser.add_argument(
+        "format", choices=("json", "bitmap"), default="json", location="args",
+        help="'bitmap' returns occupancy as a base64 bitset (bit i set = spot first_spot_no+i taken)"
+    )
+    spots_parser.add_argument("from", location="args", help="Window start (ISO format); statuses are for [from, to)")
+    spots_parser.add_argument("to", location="args", help="Window end (ISO format); must be in the future")
+
+    def build_window_payload(lot_id, spot_format, start, end):
+        """Spots body with availability for [start, end), from the lot's interval index"""
+        lot = ParkingLot.query.get(lot_id)
+        index = interval_indexes.get(lot_id) if lot else None
+        if index is None:
+            return None
+        free = index.free_flags(start, end)
+        body = {
+            "lot": {"id": lot.id, "name": lot.prime_location_name, "price_per_hr": lot.price_per_hr},
+            "window": {"from": start.isoformat(), "to": end.isoformat()},
+        }
+        if spot_format == "bitmap":
+            bitmap = pack_bitmap(index.spot_ids, index.spot_nos, [not f for f in free])
+            return {**body, "format": "bitmap", **bitmap}
+        body["spots"] = [{
+            "id": spot_id,
+            "spot_no": spot_no,
+            "status": "available" if is_free else "occupied"
+        } for spot_id, spot_no, is_free in zip(index.spot_ids, index.spot_nos, free)]
+        return body
+
     @parking_ns.route("/lots/<int:lot_id>/spots")
     class ParkingSpotsResource(Resource):
         @jwt_required()
+        @replica_reads
+        @parking_ns.expect(spots_parser)
         def get(self, lot_id):
             """Get available spots for a parking lot"""
+            spot_format = request.args.get("format", "json")
+            if spot_format not in ("json", "bitmap"):
+                return {"message": "Unknown format", "errors": {"format": "Use 'json' or 'bitmap'"}}, 400
+            window = None
+            if request.args.get("from") or request.args.get("to"):
+                try:
+                    window = (parse_client_time(request.args["from"]), parse_client_time(request.args["to"]))
+                except (KeyError, ValueError):
+                    return {"message": "Invalid time window", "errors": {"general": "Give both 'from' and 'to' in ISO format"}}, 400
+                if window[1] <= window[0]:
+                    return {"message": "Invalid time window", "errors": {"to": "'to' must be after 'from'"}}, 400
+                # the interval index drops bookings that have already ended, so it can't answer for the past
+                if window[1] <= datetime.now():
+                    return {"message": "Invalid time window", "errors": {"to": "This time window is already over"}}, 400
             try:
-                lot = ParkingLot.query.get(lot_id)
-                if not lot:
+                version = lot_version(lot_id)
+                if version is None:
                     return {"message": "Parking lot not found"}, 404
-                
-                spots = ParkingSpot.query.filter_by(lot_id=lot_id).all()
-                spots_data = [{
-                    "id": s.id,
-                    "spot_no": s.spot_no,
-                    "status": "available" if s.status == "A" else "occupied"
-                } for s in spots]
-                
-                return {
-                    "lot": {
-                        "id": lot.id,
-                        "name": lot.prime_location_name,
-                        "price_per_hr": lot.price_per_hr
-                    },
-                    "spots": spots_data
-                }, 200
+                etag = spots_etag(lot_id, version, spot_format)
+                if window:
+                    etag += f"-{window[0].isoformat()}-{window[1].isoformat()}"
+                if request.if_none_match.contains_weak(etag):
+                    return not_modified(etag)
+                if window:
+                    payload = build_window_payload(lot_id, spot_format, *window)
+                else:
+                    payload = response_cache.cached_spots(
+                        lot_id, version, lambda: spots_listing(lot_id, spot_format), variant=spot_format
+                    )
+                if payload is None:
+                    return {"message": "Parking lot not found"}, 404
+                return payload, 200, etag_headers(etag)
             except Exception as e:
                 logger.error(f"Error fetching spots: {str(e)}")
                 return {"message": "Failed to fetch parking spots"}, 500
@@ -500,6 +677,35 @@ def create_app(test_config=None):
         "leaving_time": fields.String(required=True, description="Expected leaving time (ISO format)"),
     })
 
+    def add_reservation(user_id, spot, lot, vehicle_number, parking_time, leaving_time):
+        """Stage a booking of ``spot`` for the window; the caller commits"""
+        reservation = Reservation(
+            spot_id=spot.id,
+            user_id=user_id,
+            vehicle_number=vehicle_number,
+            parking_time=parking_time,
+            leaving_time=leaving_time,
+            cost=round((leaving_time - parking_time).total_seconds() / 3600 * lot.price_per_hr, 2),
+            status="U"  # Upcoming
+        )
+        bump_lot_version(lot.id)
+        db.session.add(reservation)
+        return reservation
+
+    def reservation_confirmed(reservation, lot, spot):
+        return {
+            "message": "Reservation confirmed!",
+            "reservation": {
+                "id": reservation.id,
+                "lot_name": lot.prime_location_name,
+                "spot_no": spot.spot_no,
+                "vehicle_number": reservation.vehicle_number,
+                "parking_time": reservation.parking_time.isoformat(),
+                "leaving_time": reservation.leaving_time.isoformat(),
+                "estimated_cost": reservation.cost
+            }
+        }, 201
+
     @parking_ns.route("/reserve")
     class ReservationResource(Resource):
         @jwt_required()
@@ -531,60 +737,206 @@ def create_app(test_config=None):
                 
                 # Parse times
                 try:
-                    parking_time = datetime.fromisoformat(parking_time_str.replace("Z", "+00:00"))
-                    leaving_time = datetime.fromisoformat(leaving_time_str.replace("Z", "+00:00"))
+                    parking_time = parse_client_time(parking_time_str)
+                    leaving_time = parse_client_time(leaving_time_str)
                 except ValueError:
                     return {"message": "Invalid date format", "errors": {"general": "Use ISO format for dates"}}, 400
                 
-                # Check spot availability
-                spot = ParkingSpot.query.get(spot_id)
+                now = datetime.now()
+                if leaving_time <= parking_time:
+                    return {"message": "Please fix the errors", "errors": {"leaving_time": "Leaving time must be after parking time"}}, 400
+                if leaving_time <= now:
+                    return {"message": "Please fix the errors", "errors": {"leaving_time": "This time window is already over"}}, 400
+                
+                # Check spot availability for the requested window. The row lock
+                # serializes bookers of one spot where the database supports it;
+                # the overlap guard on reservation (services/schema.py) is the
+                # backstop everywhere else.
+                spot = ParkingSpot.query.filter_by(id=spot_id).with_for_update().first()
                 if not spot:
                     return {"message": "Parking spot not found"}, 404
-                if spot.status != "A":
-                    return {"message": "This spot is no longer available", "errors": {"spot_id": "Spot is occupied"}}, 400
+                if spot.status not in ("A", "O") or spot_has_overlap(spot.id, parking_time, leaving_time):
+                    return {"message": "This spot is no longer available", "errors": {"spot_id": "Spot is already booked for that time"}}, 400
                 
                 lot = ParkingLot.query.get(spot.lot_id)
                 
-                # Calculate cost
-                duration_hours = (leaving_time - parking_time).total_seconds() / 3600
-                cost = round(duration_hours * lot.price_per_hr, 2)
-                
-                # Create reservation
-                reservation = Reservation(
-                    spot_id=spot_id,
-                    user_id=user_id,
-                    vehicle_number=vehicle_number,
-                    parking_time=parking_time,
-                    leaving_time=leaving_time,
-                    cost=cost,
-                    status="U"  # Upcoming
-                )
+                # A booking holds the spot only for its own window, so the spot
+                # shows as occupied now only if that window has already started.
+                # jobs.sync_spot_occupancy flips it when a later window begins.
+                if parking_time <= now and spot.status == "A" and not set_spot_status(spot, "O"):
+                    # someone else took the spot between our read and write
+                    db.session.rollback()
+                    return SPOT_TAKEN, 409
+                reservation = add_reservation(user_id, spot, lot, vehicle_number, parking_time, leaving_time)
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    return SPOT_TAKEN, 409
                 
-                # Mark spot as occupied
-                spot.status = "O"
+                logger.info(f"Reservation created: {reservation.id} for user {user_id}")
                 
-                db.session.add(reservation)
-                db.session.commit()
+                return reservation_confirmed(reservation, lot, spot)
                 
-                logger.info(f"Reservation created: {reservation.id} for user {user_id}")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Reservation error: {str(e)}")
+                return {"message": "Failed to create reservation", "errors": {"general": str(e)}}, 500
+
+    reserve_any_model = parking_ns.model("ReserveAny", {
+        "vehicle_number": fields.String(required=True, description="Vehicle license plate"),
+        "parking_time": fields.String(description="Parking start time (ISO format), defaults to now"),
+        "leaving_time": fields.String(required=True, description="Expected leaving time (ISO format)"),
+    })
+
+    @parking_ns.route("/lots/<int:lot_id>/reserve-any")
+    class ReserveAnyResource(Resource):
+        @jwt_required()
+        @parking_ns.expect(reserve_any_model)
+        def post(self, lot_id):
+            """Reserve whichever spot in the lot the allocation policy picks"""
+            try:
+                user_id = int(get_jwt_identity())
+                data = request.get_json(silent=True) or {}
+                if not isinstance(data, dict):
+                    return {"message": "Please fix the errors", "errors": {"general": "Send a JSON object"}}, 400
+                vehicle_number = data.get("vehicle_number") or ""
+                if not isinstance(vehicle_number, str):
+                    return {"message": "Please fix the errors", "errors": {"vehicle_number": "Must be a string"}}, 400
+                vehicle_number = vehicle_number.strip().upper()
+                if not vehicle_number or not data.get("leaving_time"):
+                    return {"message": "Please fix the errors", "errors": {"general": "Vehicle number and leaving time are required"}}, 400
+                now = datetime.now()
+                try:
+                    # parse_client_time raises ValueError for non-strings too
+                    parking_time = parse_client_time(data["parking_time"]) if data.get("parking_time") else now
+                    leaving_time = parse_client_time(data["leaving_time"])
+                except ValueError:
+                    return {"message": "Invalid date format", "errors": {"general": "Use ISO format for dates"}}, 400
+                if leaving_time <= max(parking_time, now):
+                    return {"message": "Please fix the errors", "errors": {"leaving_time": "Leaving time must be after parking time"}}, 400
+                
+                lot = ParkingLot.query.get(lot_id)
+                if not lot:
+                    return {"message": "Parking lot not found"}, 404
+                
+                allocator = app.extensions["spot_allocator"]
+                if parking_time <= now:
+                    # pop spots that are free right now until one is free for the
+                    # whole window and we win the compare-and-set on it
+                    def claim(spot_id):
+                        spot = ParkingSpot.query.filter_by(id=spot_id, lot_id=lot_id).with_for_update().first()
+                        if spot is None or spot.status != "A":
+                            return False
+                        if spot_has_overlap(spot.id, parking_time, leaving_time):
+                            return None
+                        return set_spot_status(spot, "O")
+                    spot_id = allocator.allocate(lot_id, claim)
+                else:
+                    # the free lists only know about right now; rank the spots the
+                    # interval index says are free for the window and recheck each
+                    # under a row lock, since the index can trail a racing booking
+                    def claim_window(spot_id):
+                        spot = ParkingSpot.query.filter_by(id=spot_id, lot_id=lot_id).with_for_update().first()
+                        return spot is not None and not spot_has_overlap(spot.id, parking_time, leaving_time)
+                    spot_id = allocator.allocate_window(interval_indexes.get(lot_id), parking_time, leaving_time, claim_window)
+                if spot_id is None:
+                    db.session.rollback()
+                    return {"message": "No spots free in this lot for that time", "errors": {"general": "The lot is full"}}, 409
+                
+                spot = db.session.get(ParkingSpot, spot_id)
+                reservation = add_reservation(user_id, spot, lot, vehicle_number, parking_time, leaving_time)
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    if parking_time <= now:
+                        allocator.release(lot_id, spot_id, spot.spot_no)
+                    return SPOT_TAKEN, 409
+                
+                logger.info(f"Reservation created: {reservation.id} for user {user_id} (allocated spot {spot.spot_no})")
+                
+                return reservation_confirmed(reservation, lot, spot)
+                
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Reserve-any error: {str(e)}")
+                return {"message": "Failed to create reservation", "errors": {"general": str(e)}}, 500
+
+    bulk_item_model = parking_ns.model("BulkReservationItem", {
+        "vehicle_number": fields.String(required=True, description="Vehicle license plate"),
+        "spot_id": fields.Integer(description="Book this spot..."),
+        "lot_id": fields.Integer(description="...or any free spot in this lot"),
+        "parking_time": fields.String(description="Parking start time (ISO format), defaults to now"),
+        "leaving_time": fields.String(required=True, description="Expected leaving time (ISO format)"),
+    })
+    bulk_reservation_model = parking_ns.model("BulkReservation", {
+        "mode": fields.String(enum=list(BULK_MODES), default="atomic", description="'atomic' books all or nothing, 'best_effort' books what it can"),
+        "items": fields.List(fields.Nested(bulk_item_model), required=True, description=f"Up to {BULK_MAX_ITEMS} bookings"),
+    })
+
+    @parking_ns.route("/reserve/bulk")
+    class BulkReservationResource(Resource):
+        @jwt_required()
+        @parking_ns.expect(bulk_reservation_model)
+        def post(self):
+            """Book many vehicles in one transaction"""
+            try:
+                user_id = int(get_jwt_identity())
+                data = request.get_json(silent=True) or {}
+                if not isinstance(data, dict):
+                    return {"message": "Please fix the errors", "errors": {"general": "Send a JSON object"}}, 400
+                mode = data.get("mode", "atomic")
+                items = data.get("items")
+                if mode not in BULK_MODES:
+                    return {"message": "Unknown mode", "errors": {"mode": "Use 'atomic' or 'best_effort'"}}, 400
+                if not isinstance(items, list) or not 0 < len(items) <= BULK_MAX_ITEMS:
+                    return {"message": "Please fix the errors", "errors": {"items": f"Send between 1 and {BULK_MAX_ITEMS} items"}}, 400
+                
+                plan = plan_bulk_reservations(user_id, items, app.extensions["spot_allocator"].policy)
+                if not plan.rows or (mode == "atomic" and plan.failed):
+                    db.session.rollback()
+                    return {
+                        "message": "No reservations were made",
+                        "mode": mode,
+                        "created": 0,
+                        "failed": plan.failed,
+                        "results": [r for r in plan.results if r["status"] == "error"],
+                    }, 400
+                
+                # a booking that commits after the plan was read trips the overlap guard on the insert
+                try:
+                    reservation_ids = db.session.scalars(
+                        insert(Reservation).returning(Reservation.id, sort_by_parameter_order=True), plan.rows
+                    ).all()
+                    occupy = ParkingSpot.query.filter(ParkingSpot.id.in_(plan.occupy_spot_ids)).all() if plan.occupy_spot_ids else []
+                    if not set_spots_status(occupy, "O"):
+                        db.session.rollback()
+                        return SPOT_TAKEN, 409
+                    db.session.execute(
+                        update(ParkingLot).where(ParkingLot.id.in_(plan.lot_ids)).values(version=ParkingLot.version + 1)
+                    )
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+                    return SPOT_TAKEN, 409
+                
+                for index, reservation_id in zip(plan.row_items, reservation_ids):
+                    plan.results[index]["reservation"]["id"] = reservation_id
+                logger.info(f"Bulk reservation: {len(reservation_ids)} created for user {user_id}")
                 
                 return {
-                    "message": "Reservation confirmed!",
-                    "reservation": {
-                        "id": reservation.id,
-                        "lot_name": lot.prime_location_name,
-                        "spot_no": spot.spot_no,
-                        "vehicle_number": vehicle_number,
-                        "parking_time": parking_time.isoformat(),
-                        "leaving_time": leaving_time.isoformat(),
-                        "estimated_cost": cost
-                    }
+                    "message": f"{len(reservation_ids)} reservations confirmed",
+                    "mode": mode,
+                    "created": len(reservation_ids),
+                    "failed": plan.failed,
+                    "results": plan.results,
                 }, 201
                 
             except Exception as e:
                 db.session.rollback()
-                logger.error(f"Reservation error: {str(e)}")
-                return {"message": "Failed to create reservation", "errors": {"general": str(e)}}, 500
+                logger.error(f"Bulk reservation error: {str(e)}")
+                return {"message": "Failed to create reservations", "errors": {"general": str(e)}}, 500
 
     @parking_ns.route("/reservations/<int:reservation_id>/cancel")
     class CancelReservationResource(Resource):
@@ -602,12 +954,18 @@ def create_app(test_config=None):
                 if reservation.status not in ["U", "A"]:
                     return {"message": "Cannot cancel this reservation"}, 400
                 
-                # Free up the spot
+                reservation.status = "X"  # Cancelled
+
+                # Free up the spot, unless another booking covers right now
                 spot = ParkingSpot.query.get(reservation.spot_id)
                 if spot:
-                    spot.status = "A"
+                    now = datetime.now()
+                    if spot.status == "O" and not spot_has_overlap(
+                        spot.id, now, now + timedelta(seconds=1), exclude_reservation_id=reservation.id
+                    ):
+                        set_spot_status(spot, "A")
+                    bump_lot_version(spot.lot_id)
                 
-                reservation.status = "X"  # Cancelled
                 db.session.commit()
                 
                 return {"message": "Reservation cancelled successfully"}, 200
@@ -621,45 +979,31 @@ def create_app(test_config=None):
     # ADMIN ENDPOINTS
     # ========================
     
-    def admin_required(f):
-        """Decorator to check admin role"""
-        @wraps(f)
-        def decorated(*args, **kwargs):
-            user_id = int(get_jwt_identity())
-            user = User.query.get(user_id)
-            if not user or not any(r.name == "admin" for r in user.roles):
-                return {"message": "Admin access required"}, 403
-            return f(*args, **kwargs)
-        return decorated
-
     @admin_ns.route("/dashboard-data")
     class AdminDashboardResource(Resource):
-        @jwt_required()
+        @admin_required
+        @replica_reads
         def get(self):
             """Get admin dashboard data"""
             try:
-                user_id = int(get_jwt_identity())
-                user = User.query.get(user_id)
-                
-                if not user or not any(r.name == "admin" for r in user.roles):
-                    return {"message": "Admin access required"}, 403
-
                 lots = ParkingLot.query.all()
                 total_users = User.query.count()
                 total_reservations = Reservation.query.count()
                 
                 # Calculate revenue
-                completed_reservations = Reservation.query.filter_by(status="C").all()
-                total_revenue = sum(r.cost or 0 for r in completed_reservations)
+                total_revenue = (
+                    db.session.query(func.coalesce(func.sum(Reservation.cost), 0))
+                    .filter(Reservation.status == "C")
+                    .scalar()
+                )
 
                 lots_data = []
                 total_spots = 0
                 total_occupied = 0
                 
                 for lot in lots:
-                    spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
-                    lot_total = len(spots)
-                    occupied = sum(1 for s in spots if s.status == "O")
+                    occupied = lot.occupied_spots
+                    lot_total = lot.available_spots + occupied
                     total_spots += lot_total
                     total_occupied += occupied
                     
@@ -694,17 +1038,12 @@ def create_app(test_config=None):
 
     @admin_ns.route("/users")
     class AdminUsersResource(Resource):
-        @jwt_required()
+        @admin_required
+        @replica_reads
         def get(self):
             """Get all users (admin only)"""
             try:
-                user_id = int(get_jwt_identity())
-                user = User.query.get(user_id)
-                
-                if not user or not any(r.name == "admin" for r in user.roles):
-                    return {"message": "Admin access required"}, 403
-                
-                users = User.query.all()
+                users = User.query.options(selectinload(User.roles)).all()
                 users_data = [{
                     "id": u.id,
                     "username": u.username,
@@ -719,45 +1058,123 @@ def create_app(test_config=None):
                 logger.error(f"Error fetching users: {str(e)}")
                 return {"message": "Failed to fetch users"}, 500
 
+    feed_parser = admin_ns.parser()
+    feed_parser.add_argument("status", location="args", help="upcoming, active, completed or cancelled")
+    feed_parser.add_argument("lot_id", type=int, location="args")
+    feed_parser.add_argument("user_id", type=int, location="args")
+    feed_parser.add_argument("from", location="args", help="Earliest parking_time (ISO format)")
+    feed_parser.add_argument("to", location="args", help="Latest parking_time, exclusive (ISO format)")
+    feed_parser.add_argument("cursor", location="args", help="next_cursor from the previous page")
+    feed_parser.add_argument("limit", type=int, location="args", help="Page size (default 100, max 500)")
+
     @admin_ns.route("/reservations")
     class AdminReservationsResource(Resource):
-        @jwt_required()
+        @admin_required
+        @replica_reads
+        @admin_ns.expect(feed_parser)
         def get(self):
-            """Get all reservations (admin only)"""
+            """Get reservations, newest first, one keyset page at a time (admin only)"""
             try:
-                user_id = int(get_jwt_identity())
-                user = User.query.get(user_id)
-                
-                if not user or not any(r.name == "admin" for r in user.roles):
-                    return {"message": "Admin access required"}, 403
-                
-                reservations = Reservation.query.order_by(Reservation.parking_time.desc()).limit(100).all()
-                status_map = {"U": "upcoming", "A": "active", "C": "completed", "X": "cancelled"}
-                
-                data = []
-                for r in reservations:
-                    res_user = User.query.get(r.user_id)
-                    spot = ParkingSpot.query.get(r.spot_id)
-                    lot = ParkingLot.query.get(spot.lot_id) if spot else None
-                    
-                    data.append({
-                        "id": r.id,
-                        "user": res_user.username if res_user else "Unknown",
-                        "user_email": res_user.email if res_user else "",
-                        "lot_name": lot.prime_location_name if lot else "Unknown",
-                        "spot_no": spot.spot_no if spot else "?",
-                        "vehicle_number": r.vehicle_number,
-                        "parking_time": r.parking_time.isoformat() if r.parking_time else None,
-                        "leaving_time": r.leaving_time.isoformat() if r.leaving_time else None,
-                        "cost": r.cost,
-                        "status": status_map.get(r.status, "unknown")
-                    })
-                
-                return {"reservations": data}, 200
+                args = request.args
+                query = (
+                    db.session.query(
+                        Reservation.id,
+                        Reservation.parking_time,
+                        Reservation.leaving_time,
+                        Reservation.vehicle_number,
+                        Reservation.cost,
+                        Reservation.status,
+                        User.username,
+                        User.email,
+                        ParkingSpot.spot_no,
+                        ParkingLot.prime_location_name,
+                    )
+                    .outerjoin(User, User.id == Reservation.user_id)
+                    .outerjoin(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+                    .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+                )
+                try:
+                    if args.get("status"):
+                        query = query.filter(Reservation.status == STATUS_CODES[args["status"]])
+                    if args.get("lot_id"):
+                        query = query.filter(ParkingSpot.lot_id == int(args["lot_id"]))
+                    if args.get("user_id"):
+                        query = query.filter(Reservation.user_id == int(args["user_id"]))
+                    if args.get("from"):
+                        query = query.filter(Reservation.parking_time >= parse_client_time(args["from"]))
+                    if args.get("to"):
+                        query = query.filter(Reservation.parking_time < parse_client_time(args["to"]))
+                    limit = page_limit(args.get("limit"), default=100)
+                    rows, next_cursor = seek_page(
+                        query, Reservation.parking_time, Reservation.id, args.get("cursor"), limit
+                    )
+                except (KeyError, ValueError) as e:
+                    return {"message": "Invalid filter", "errors": {"general": str(e)}}, 400
+
+                data = [{
+                    "id": r.id,
+                    "user": r.username or "Unknown",
+                    "user_email": r.email or "",
+                    "lot_name": r.prime_location_name or "Unknown",
+                    "spot_no": r.spot_no if r.spot_no is not None else "?",
+                    "vehicle_number": r.vehicle_number,
+                    "parking_time": r.parking_time.isoformat() if r.parking_time else None,
+                    "leaving_time": r.leaving_time.isoformat() if r.leaving_time else None,
+                    "cost": r.cost,
+                    "status": STATUS_NAMES.get(r.status, "unknown")
+                } for r in rows]
+                
+                return {"reservations": data, "next_cursor": next_cursor}, 200
             except Exception as e:
                 logger.error(f"Error fetching reservations: {str(e)}")
                 return {"message": "Failed to fetch reservations"}, 500
 
+    @admin_ns.route("/cache-stats")
+    class AdminCacheStatsResource(Resource):
+        @admin_required
+        def get(self):
+            """Response cache hit/miss counters for this worker (admin only)"""
+            return response_cache.stats.snapshot(), 200
+
+    @admin_ns.route("/replica-stats")
+    class AdminReplicaStatsResource(Resource):
+        @admin_required
+        def get(self):
+            """Read replica health, lag and where reads went, for this worker (admin only)"""
+            router = app.extensions["replica_router"]
+            if router is None:
+                return {"message": "No read replica configured"}, 404
+            return router.snapshot(), 200
+
+    # body field -> (column, label, max length) for a lot's text fields
+    lot_text_fields = {
+        "name": ("prime_location_name", "Lot name", 100),
+        "address": ("address", "Address", 100),
+        "pin_code": ("pin_code", "PIN code", 10),
+    }
+
+    def lot_field_errors(data, partial=False):
+        """Errors for a lot body: every field when creating, only the ones sent when ``partial``."""
+        errors = {}
+        for field, (_, label, limit) in lot_text_fields.items():
+            if partial and field not in data:
+                continue
+            value = data.get(field)
+            if not isinstance(value, str) or not value.strip():
+                errors[field] = f"{label} is required"
+            elif len(value.strip()) > limit:
+                errors[field] = f"{label} must be at most {limit} characters"
+        if not partial or "price_per_hr" in data:
+            price = data.get("price_per_hr")
+            # bool is an int subclass, so true would pass as 1
+            if isinstance(price, bool) or not isinstance(price, (int, float)) or not 0 < price < float("inf"):
+                errors["price_per_hr"] = "Must be a positive number"
+        if not partial or "max_spots" in data:
+            max_spots = data.get("max_spots")
+            if isinstance(max_spots, bool) or not isinstance(max_spots, int) or max_spots < 1:
+                errors["max_spots"] = "Must be a positive whole number"
+        return errors
+
     lot_model = admin_ns.model("ParkingLot", {
         "name": fields.String(required=True, description="Parking lot name"),
         "address": fields.String(required=True, description="Address"),
@@ -768,14 +1185,10 @@ def create_app(test_config=None):
 
     @admin_ns.route("/lots")
     class AdminLotsResource(Resource):
-        @jwt_required()
+        @admin_required
+        @replica_reads
         def get(self):
             """Get all parking lots (admin)"""
-            user_id = int(get_jwt_identity())
-            user = User.query.get(user_id)
-            if not user or not any(r.name == "admin" for r in user.roles):
-                return {"message": "Admin access required"}, 403
-            
             lots = ParkingLot.query.all()
             return {"lots": [{
                 "id": lot.id,
@@ -786,33 +1199,32 @@ def create_app(test_config=None):
                 "max_spots": lot.max_spots
             } for lot in lots]}, 200
         
-        @jwt_required()
+        @admin_required
         @admin_ns.expect(lot_model)
         def post(self):
             """Create a new parking lot (admin only)"""
             try:
-                user_id = int(get_jwt_identity())
-                user = User.query.get(user_id)
-                
-                if not user or not any(r.name == "admin" for r in user.roles):
-                    return {"message": "Admin access required"}, 403
-                
-                data = request.get_json()
+                data = request.get_json(silent=True)
+                if not isinstance(data, dict):
+                    return {"message": "No data provided", "errors": {"general": "Request body is empty"}}, 400
+                errors = lot_field_errors(data)
+                if errors:
+                    return {"message": "Please fix the errors", "errors": errors}, 400
                 
                 lot = ParkingLot(
-                    prime_location_name=data.get("name"),
-                    address=data.get("address"),
-                    pin_code=data.get("pin_code"),
+                    prime_location_name=data["name"].strip(),
+                    address=data["address"].strip(),
+                    pin_code=data["pin_code"].strip(),
                     price_per_hr=data.get("price_per_hr"),
-                    max_spots=data.get("max_spots")
+                    max_spots=data.get("max_spots"),
+                    available_spots=data.get("max_spots"),
+                    occupied_spots=0,
                 )
                 db.session.add(lot)
                 db.session.flush()  # Get lot.id
                 
-                # Create parking spots
-                for i in range(1, lot.max_spots + 1):
-                    spot = ParkingSpot(lot_id=lot.id, spot_no=i, status="A")
-                    db.session.add(spot)
+                # Create parking spots in one INSERT ... SELECT
+                create_spots(lot.id, 1, lot.max_spots)
                 
                 db.session.commit()
                 
@@ -823,17 +1235,111 @@ def create_app(test_config=None):
                 logger.error(f"Error creating lot: {str(e)}")
                 return {"message": "Failed to create parking lot"}, 500
 
+    lot_patch_model = admin_ns.model("ParkingLotPatch", {
+        "name": fields.String(description="Parking lot name"),
+        "address": fields.String(description="Address"),
+        "pin_code": fields.String(description="PIN code"),
+        "price_per_hr": fields.Float(description="Price per hour"),
+        "max_spots": fields.Integer(description="New number of spots; shrinking retires the highest-numbered spots"),
+    })
+
+    @admin_ns.route("/lots/<int:lot_id>")
+    class AdminLotResource(Resource):
+        @admin_required
+        @admin_ns.expect(lot_patch_model)
+        def patch(self, lot_id):
+            """Edit or resize a parking lot (admin only)"""
+            try:
+                lot = ParkingLot.query.get(lot_id)
+                if not lot:
+                    return {"message": "Parking lot not found"}, 404
+                
+                data = request.get_json(silent=True) or {}
+                if not isinstance(data, dict):
+                    return {"message": "Please fix the errors", "errors": {"general": "Send a JSON object"}}, 400
+                errors = lot_field_errors(data, partial=True)
+                if errors:
+                    return {"message": "Please fix the errors", "errors": errors}, 400
+                max_spots = data.get("max_spots")
+                
+                for field, (column, _, _) in lot_text_fields.items():
+                    if field in data:
+                        setattr(lot, column, data[field].strip())
+                if "price_per_hr" in data:
+                    lot.price_per_hr = data["price_per_hr"]
+                added = retired = 0
+                if max_spots is not None and max_spots != lot.max_spots:
+                    added, retired = resize_lot(lot, max_spots)
+                else:
+                    bump_lot_version(lot.id)
+                db.session.commit()
+                if added or retired:
+                    app.extensions["spot_allocator"].forget(lot.id)
+                
+                return {
+                    "message": f"Parking lot '{lot.prime_location_name}' updated",
+                    "max_spots": lot.max_spots,
+                    "spots_added": added,
+                    "spots_retired": retired,
+                }, 200
+                
+            except SpotsInUse as e:
+                db.session.rollback()
+                return {
+                    "message": "Some of those spots still have live reservations",
+                    "errors": {"max_spots": str(e)},
+                    "spot_nos": e.spot_nos[:100],
+                }, 409
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error updating lot: {str(e)}")
+                return {"message": "Failed to update parking lot"}, 500
+
     # Register namespaces
     api.add_namespace(auth_ns, path="/auth")
     api.add_namespace(user_ns, path="/user")
     api.add_namespace(admin_ns, path="/admin")
     api.add_namespace(parking_ns, path="/parking")
 
+    @app.cli.command("reconcile-counters")
+    @click.option("--dry-run", is_flag=True, help="Report drift without fixing it.")
+    def reconcile_counters_command(dry_run):
+        """Rebuild per-lot availability counters from parking_spot."""
+        drifted = reconcile_lot_counters(dry_run=dry_run)
+        for lot_id, stored, actual in drifted:
+            click.echo(f"lot {lot_id}: stored (available, occupied)={stored}, actual={actual}")
+        if not dry_run:
+            db.session.commit()
+        click.echo(f"{len(drifted)} lot(s) {'drifted' if dry_run else 'repaired'}")
+
+    @app.cli.command("init-db")
+    @click.option("--no-sample-data", is_flag=True, help="Skip the sample parking lots.")
+    def init_db_command(no_sample_data):
+        """Create or upgrade the schema and seed roles and default users."""
+        init_database(sample_data=not no_sample_data)
+        click.echo("database ready")
+
+    @app.cli.command("sync-replica")
+    def sync_replica_command():
+        """Copy the primary SQLite database over the replica (for trying replica reads locally)."""
+        if REPLICA_BIND not in db.engines or db.engine.dialect.name != "sqlite":
+            raise click.ClickException("needs REPLICA_DATABASE_URI and SQLite databases")
+        copy_sqlite_database(db.engine, db.engines[REPLICA_BIND])
+        click.echo("replica synced")
+
     # Health check endpoint
     @app.route("/api/health")
     def health_check():
         return {"status": "healthy", "timestamp": datetime.now().isoformat()}, 200
 
+    @app.route("/api/metrics")
+    def metrics():
+        token = app.config["METRICS_TOKEN"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return {"message": "Metrics token required"}, 401
+        body, content_type = render_metrics()
+        return app.response_class(body, content_type=content_type)
+
     @app.route("/")
     def index():
         return """
@@ -847,82 +1353,97 @@ def create_app(test_config=None):
         </html>
         """
 
-    # Database initialization
-    with app.app_context():
-        db.create_all()
-        
-        # Create default roles
-        if not Role.query.filter_by(name="admin").first():
-            admin_role = Role(name="admin", description="Administrator")
-            db.session.add(admin_role)
-            logger.info("Created admin role")
-        
-        if not Role.query.filter_by(name="user").first():
-            user_role = Role(name="user", description="Regular User")
-            db.session.add(user_role)
-            logger.info("Created user role")
-        
+    return app
+
+
+def init_database(sample_data=True):
+    """
+    Create or upgrade the schema and seed roles, default users and sample lots.
+
+    Run once per deploy with ``flask --app app:create_app init-db`` (the
+    Docker image does this before starting gunicorn), not per worker:
+    ``create_app`` itself touches no database. Safe to rerun. Needs an app
+    context.
+    """
+    db.create_all(bind_key=None)  # the replica gets its schema through replication
+    schema_changes = upgrade_schema()
+    if schema_changes:
+        logger.info(f"Upgraded schema: {', '.join(schema_changes)}")
+        if "parking_lot.available_spots" in schema_changes:
+            reconcile_lot_counters()
         db.session.commit()
+    
+    # Create default roles
+    if not Role.query.filter_by(name="admin").first():
+        admin_role = Role(name="admin", description="Administrator")
+        db.session.add(admin_role)
+        logger.info("Created admin role")
+    
+    if not Role.query.filter_by(name="user").first():
+        user_role = Role(name="user", description="Regular User")
+        db.session.add(user_role)
+        logger.info("Created user role")
+    
+    db.session.commit()
+    
+    # Create default admin user
+    if not User.query.filter_by(email="admin@parkapp.com").first():
+        try:
+            create_user_with_hash(
+                username="admin",
+                email="admin@parkapp.com",
+                password="admin123",
+                roles=["admin"]
+            )
+            db.session.commit()
+            logger.info("Created default admin user: admin@parkapp.com / admin123")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not create admin user: {e}")
+    
+    # Create default test user
+    if not User.query.filter_by(email="user@parkapp.com").first():
+        try:
+            create_user_with_hash(
+                username="testuser",
+                email="user@parkapp.com",
+                password="user123",
+                roles=["user"]
+            )
+            db.session.commit()
+            logger.info("Created default test user: user@parkapp.com / user123")
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not create test user: {e}")
+    
+    # Create sample parking lots if none exist
+    if sample_data and ParkingLot.query.count() == 0:
+        sample_lots = [
+            {"name": "Downtown Central Parking", "address": "123 Main Street", "pin_code": "10001", "price": 5.0, "spots": 50},
+            {"name": "Airport Long Term", "address": "Airport Road Terminal 1", "pin_code": "10002", "price": 8.0, "spots": 100},
+            {"name": "Mall Underground Parking", "address": "456 Shopping Center Blvd", "pin_code": "10003", "price": 3.0, "spots": 200},
+        ]
         
-        # Create default admin user
-        if not User.query.filter_by(email="admin@parkapp.com").first():
-            try:
-                create_user_with_hash(
-                    username="admin",
-                    email="admin@parkapp.com",
-                    password="admin123",
-                    roles=["admin"]
-                )
-                db.session.commit()
-                logger.info("Created default admin user: admin@parkapp.com / admin123")
-            except Exception as e:
-                db.session.rollback()
-                logger.warning(f"Could not create admin user: {e}")
-        
-        # Create default test user
-        if not User.query.filter_by(email="user@parkapp.com").first():
-            try:
-                create_user_with_hash(
-                    username="testuser",
-                    email="user@parkapp.com",
-                    password="user123",
-                    roles=["user"]
-                )
-                db.session.commit()
-                logger.info("Created default test user: user@parkapp.com / user123")
-            except Exception as e:
-                db.session.rollback()
-                logger.warning(f"Could not create test user: {e}")
+        for lot_data in sample_lots:
+            lot = ParkingLot(
+                prime_location_name=lot_data["name"],
+                address=lot_data["address"],
+                pin_code=lot_data["pin_code"],
+                price_per_hr=lot_data["price"],
+                max_spots=lot_data["spots"],
+                available_spots=lot_data["spots"],
+                occupied_spots=0,
+            )
+            db.session.add(lot)
+            db.session.flush()
+            create_spots(lot.id, 1, lot_data["spots"])
         
-        # Create sample parking lots if none exist
-        if ParkingLot.query.count() == 0:
-            sample_lots = [
-                {"name": "Downtown Central Parking", "address": "123 Main Street", "pin_code": "10001", "price": 5.0, "spots": 50},
-                {"name": "Airport Long Term", "address": "Airport Road Terminal 1", "pin_code": "10002", "price": 8.0, "spots": 100},
-                {"name": "Mall Underground Parking", "address": "456 Shopping Center Blvd", "pin_code": "10003", "price": 3.0, "spots": 200},
-            ]
-            
-            for lot_data in sample_lots:
-                lot = ParkingLot(
-                    prime_location_name=lot_data["name"],
-                    address=lot_data["address"],
-                    pin_code=lot_data["pin_code"],
-                    price_per_hr=lot_data["price"],
-                    max_spots=lot_data["spots"]
-                )
-                db.session.add(lot)
-                db.session.flush()
-                
-                for i in range(1, lot_data["spots"] + 1):
-                    spot = ParkingSpot(lot_id=lot.id, spot_no=i, status="A")
-                    db.session.add(spot)
-            
-            db.session.commit()
-            logger.info("Created sample parking lots")
-
-    return app
+        db.session.commit()
+        logger.info("Created sample parking lots")
 
 
 if __name__ == "__main__":
     app = create_app()
+    with app.app_context():
+        init_database()
     app.run(host="0.0.0.0", port=5000, debug=True)
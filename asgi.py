@@ -1,8 +1,45 @@
 from asgiref.wsgi import WsgiToAsgi
-from app import create_app
+from app import CORS_ORIGINS, create_app
+from services.fastpath import FastReads
+from services.streams import LOT_EVENTS_PATH, LotEventStream
+
+
+def create_asgi_app(flask_app):
+    """Serve the SSE streams and hot reads natively and hand everything else to Flask."""
+    wsgi = WsgiToAsgi(flask_app)
+    fast_reads = FastReads(flask_app, allowed_origins=CORS_ORIGINS)
+    lot_events = LotEventStream(
+        flask_app,
+        heartbeat=flask_app.config["EVENTS_HEARTBEAT_SECONDS"],
+        allowed_origins=CORS_ORIGINS,
+    )
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await fast_reads.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def asgi_app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = LOT_EVENTS_PATH.match(scope["path"])
+            if match:
+                return await lot_events(scope, receive, send, int(match.group(1)))
+            if await fast_reads(scope, receive, send):
+                return
+        return await wsgi(scope, receive, send)
+
+    return asgi_app
+
 
 app = create_app()
-asgi_app = WsgiToAsgi(app)
+asgi_app = create_asgi_app(app)
 
 if __name__ == "__main__":
     import uvicorn
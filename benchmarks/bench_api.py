@@ -0,0 +1,457 @@
+"""
+End-to-end API benchmark: every /api route under realistic traffic mixes.
+
+Each mix runs for ``--seconds`` (after ``--warmup``) with ``--threads``
+clients. Every client picks operations at random by the mix's weights and
+acts as one of a pool of logged-in users (or the admin). Bookings made in a
+run are what its cancels cancel. Each mix reports requests/s and
+p50/p95/p99 per operation and overall. 409s from booking clashes are
+counted as ``conflicts``, and any other failure as ``errors``.
+
+It drives the app in-process through the Flask test client by default, on
+``--database-uri`` or on a freshly generated small dataset. With
+``--base-url`` it drives a running server instead, which is the way to
+include the gunicorn/uvicorn workers, the async fast path and the response
+cache. The lot event streams are long-lived, so no mix includes them.
+
+    python -m benchmarks.dataset --database-uri sqlite:////tmp/parking.db --scale medium
+    python -m benchmarks.bench_api --database-uri sqlite:////tmp/parking.db --mix mixed booking admin --output api.json
+    python -m benchmarks.bench_api --base-url http://localhost:5000 --mix mixed --threads 32
+    python -m benchmarks.compare before.json api.json
+
+Mixes:
+
+* ``browse``: lots, spot maps and dashboards, with the occasional login
+* ``booking``: reserve, reserve-any, bulk booking and cancel
+* ``admin``: the admin dashboard, reservation feed, lot management and stats
+* ``mixed``: 80% browse, 15% booking, 5% admin traffic
+* ``all``: every operation equally often, to cover every route; any /api
+  route that no operation drives is listed at the end
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import requests
+
+from app import create_app
+from benchmarks.common import make_app, percentiles, print_table, write_results
+from benchmarks.dataset import BENCH_EMAIL, BENCH_PASSWORD, SCALES, generate
+
+ADMIN = ("admin@parkapp.com", "admin123")
+TEST_USER = ("user@parkapp.com", "user123")
+NOT_DRIVEN = {"/api"}  # the Flask-RESTX root; the docs live at /api/docs
+
+OPS = {}
+
+
+def op(method, route, ok=(), conflict=(409,)):
+    """
+    Register an operation: one request to ``route``.
+
+    Statuses in ``ok`` count as success too, and those in ``conflict`` as
+    booking clashes rather than errors.
+    """
+    def register(fn):
+        OPS[fn.__name__] = (method, route, set(ok), set(conflict), fn)
+        return fn
+    return register
+
+
+class FlaskClient:
+    """The app in-process, through the whole WSGI stack."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers=None, json=None):
+        res = self.client.open(path, method=method, headers=headers, json=json)
+        return res.status_code, lambda: res.get_json(silent=True)
+
+
+class HttpClient:
+    """A running server, one keep-alive connection per client."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method, path, headers=None, json=None):
+        res = self.session.request(method, self.base_url + path, headers=headers, json=json, timeout=120)
+        return res.status_code, res.json
+
+
+class Worker:
+    """One simulated client: its own connection, random stream and bookings to cancel."""
+
+    def __init__(self, client, ctx, rng):
+        self.client = client
+        self.ctx = ctx
+        self.rng = rng
+        self.current = None
+        self.recording = False
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.bookings = []  # (headers, reservation id)
+
+    def call(self, method, path, headers=None, json=None):
+        began = time.perf_counter()
+        status, body = self.client.request(method, path, headers, json)
+        if self.recording:
+            self.samples[self.current].append(time.perf_counter() - began)
+            self.statuses[self.current][status] += 1
+        return status, body
+
+    def user(self):
+        return self.rng.choice(self.ctx["users"])
+
+    def lot(self):
+        return self.rng.choice(self.ctx["lots"])
+
+    def plate(self):
+        return f"KA{self.rng.randrange(100):02d}BN{self.rng.randrange(10000):04d}"
+
+    def soon(self, hours):
+        return (datetime.now() + timedelta(hours=hours)).isoformat()
+
+    def book(self, headers, status, body, many=False):
+        if status == 201:
+            data = body()
+            results = data["results"] if many else [data]
+            self.bookings.extend((headers, r["reservation"]["id"]) for r in results if "reservation" in r)
+
+
+@op("GET", "/api/health")
+def health(w):
+    w.call("GET", "/api/health")
+
+
+@op("GET", "/api/metrics")
+def metrics(w):
+    w.call("GET", "/api/metrics", w.ctx["metrics_headers"])
+
+
+@op("GET", "/api/docs")
+def docs(w):
+    w.call("GET", "/api/docs")
+
+
+@op("GET", "/api/swagger.json")
+def swagger(w):
+    w.call("GET", "/api/swagger.json")
+
+
+@op("POST", "/api/auth/register")
+def register(w):
+    name = f"bench-{w.rng.getrandbits(48):012x}"
+    w.call("POST", "/api/auth/register", json={"username": name, "email": f"{name}@bench.parkapp.com",
+                                               "password": BENCH_PASSWORD})
+
+
+@op("POST", "/api/auth/login")
+def login(w):
+    w.call("POST", "/api/auth/login", json={"email": w.rng.choice(w.ctx["emails"]), "password": w.ctx["password"]})
+
+
+@op("POST", "/api/auth/token")
+def token(w):
+    w.call("POST", "/api/auth/token", json={"email": w.rng.choice(w.ctx["emails"]), "password": w.ctx["password"]})
+
+
+@op("GET", "/api/auth/me")
+def me(w):
+    w.call("GET", "/api/auth/me", w.user())
+
+
+@op("GET", "/api/user/")
+def profile(w):
+    w.call("GET", "/api/user/", w.user())
+
+
+@op("GET", "/api/user/role")
+def role(w):
+    w.call("GET", "/api/user/role", w.user())
+
+
+@op("GET", "/api/user/dashboard-data")
+def dashboard(w):
+    w.call("GET", "/api/user/dashboard-data", w.user())
+
+
+@op("GET", "/api/user/dashboard-data")
+def dashboard_history(w):
+    w.call("GET", "/api/user/dashboard-data?status=completed", w.user())
+
+
+@op("GET", "/api/parking/lots")
+def lots(w):
+    w.call("GET", "/api/parking/lots", w.user())
+
+
+@op("GET", "/api/parking/lots/<int:lot_id>/spots")
+def spots(w):
+    w.call("GET", f"/api/parking/lots/{w.lot()}/spots", w.user())
+
+
+@op("GET", "/api/parking/lots/<int:lot_id>/spots")
+def spots_bitmap(w):
+    w.call("GET", f"/api/parking/lots/{w.lot()}/spots?format=bitmap", w.user())
+
+
+@op("GET", "/api/parking/lots/<int:lot_id>/spots")
+def spots_window(w):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=w.rng.randrange(1, 72))
+    window = f"from={start.isoformat()}&to={(start + timedelta(hours=2)).isoformat()}"
+    w.call("GET", f"/api/parking/lots/{w.lot()}/spots?{window}", w.user())
+
+
+@op("POST", "/api/parking/reserve", conflict=(400, 409))  # a taken spot is a 400 here
+def reserve(w):
+    lot_id = w.rng.choice(list(w.ctx["spots"]))
+    start = datetime.now() + timedelta(days=w.rng.randrange(1, 14), hours=w.rng.randrange(24))
+    headers = w.user()
+    status, body = w.call("POST", "/api/parking/reserve", headers, {
+        "spot_id": w.rng.choice(w.ctx["spots"][lot_id]), "vehicle_number": w.plate(),
+        "parking_time": start.isoformat(), "leaving_time": (start + timedelta(hours=w.rng.randrange(1, 4))).isoformat(),
+    })
+    w.book(headers, status, body)
+
+
+@op("POST", "/api/parking/lots/<int:lot_id>/reserve-any")
+def reserve_any(w):
+    headers = w.user()
+    status, body = w.call("POST", f"/api/parking/lots/{w.lot()}/reserve-any", headers, {
+        "vehicle_number": w.plate(), "leaving_time": w.soon(w.rng.randrange(1, 5)),
+    })
+    w.book(headers, status, body)
+
+
+@op("POST", "/api/parking/reserve/bulk")
+def reserve_bulk(w):
+    headers, lot_id = w.user(), w.lot()
+    items = [{"vehicle_number": w.plate(), "lot_id": lot_id, "leaving_time": w.soon(3)} for _ in range(3)]
+    status, body = w.call("POST", "/api/parking/reserve/bulk", headers, {"mode": "best_effort", "items": items})
+    w.book(headers, status, body, many=True)
+
+
+@op("POST", "/api/parking/reservations/<int:reservation_id>/cancel")
+def cancel(w):
+    if w.bookings:  # nothing booked yet: skip rather than time a 404
+        headers, reservation_id = w.bookings.pop(w.rng.randrange(len(w.bookings)))
+        w.call("POST", f"/api/parking/reservations/{reservation_id}/cancel", headers)
+
+
+@op("GET", "/api/admin/dashboard-data")
+def admin_dashboard(w):
+    w.call("GET", "/api/admin/dashboard-data", w.ctx["admin"])
+
+
+@op("GET", "/api/admin/users")
+def admin_users(w):
+    w.call("GET", "/api/admin/users", w.ctx["admin"])
+
+
+@op("GET", "/api/admin/reservations")
+def admin_feed(w):
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30 * w.rng.randrange(6))
+    query = w.rng.choice([
+        "", "status=upcoming", "status=completed", f"lot_id={w.lot()}", f"user_id={w.rng.choice(w.ctx['user_ids'])}",
+        f"from={month.isoformat()}&to={(month + timedelta(days=30)).isoformat()}",
+    ])
+    w.call("GET", f"/api/admin/reservations?{query}", w.ctx["admin"])
+
+
+@op("GET", "/api/admin/lots")
+def admin_lots(w):
+    w.call("GET", "/api/admin/lots", w.ctx["admin"])
+
+
+@op("POST", "/api/admin/lots")
+def admin_create_lot(w):
+    w.call("POST", "/api/admin/lots", w.ctx["admin"], {
+        "name": f"Bench Lot {w.rng.getrandbits(32):08x}", "address": "1 Benchmark Road", "pin_code": "560001",
+        "price_per_hr": 4.0, "max_spots": 20,
+    })
+
+
+@op("PATCH", "/api/admin/lots/<int:lot_id>")
+def admin_edit_lot(w):
+    w.call("PATCH", f"/api/admin/lots/{w.lot()}", w.ctx["admin"], {"price_per_hr": round(2 + w.rng.random() * 10, 1)})
+
+
+@op("GET", "/api/admin/cache-stats")
+def cache_stats(w):
+    w.call("GET", "/api/admin/cache-stats", w.ctx["admin"])
+
+
+@op("GET", "/api/admin/replica-stats", ok=(404,))  # 404 without a replica
+def replica_stats(w):
+    w.call("GET", "/api/admin/replica-stats", w.ctx["admin"])
+
+
+def _blend(parts):
+    weights = defaultdict(float)
+    for mix, share in parts.items():
+        total = sum(MIXES[mix].values())
+        for name, weight in MIXES[mix].items():
+            weights[name] += share * weight / total
+    return dict(weights)
+
+
+MIXES = {
+    "browse": {
+        "lots": 25, "spots": 20, "spots_bitmap": 10, "spots_window": 5, "dashboard": 15, "dashboard_history": 5,
+        "me": 8, "profile": 4, "role": 4, "health": 2, "login": 1.5, "token": 0.5, "register": 0.5,
+    },
+    "booking": {"reserve": 20, "reserve_any": 20, "reserve_bulk": 5, "cancel": 25, "spots": 15, "dashboard": 15},
+    "admin": {
+        "admin_dashboard": 20, "admin_feed": 35, "admin_lots": 15, "admin_users": 2, "admin_edit_lot": 5,
+        "admin_create_lot": 1, "cache_stats": 5, "replica_stats": 2, "metrics": 15,
+    },
+}
+MIXES["mixed"] = _blend({"browse": 80, "booking": 15, "admin": 5})
+MIXES["all"] = {name: 1 for name in OPS}
+
+
+def _login(client, email, password):
+    status, body = client.request("POST", "/api/auth/login", json={"email": email, "password": password})
+    return ({"Authorization": f"Bearer {body()['access_token']}"}, body()["user"]["id"]) if status == 200 else None
+
+
+def discover(client, sessions, rng, metrics_token=None):
+    """Log in the admin and a pool of users, and look up lots and spots to book, through the API."""
+    admin = _login(client, *ADMIN)
+    if admin is None:
+        raise SystemExit(f"cannot log in as {ADMIN[0]}")
+    admin = admin[0]
+    stats = client.request("GET", "/api/admin/dashboard-data", headers=admin)[1]()["stats"]
+    users, emails, user_ids = [], [], []
+    candidates = [BENCH_EMAIL.format(i) for i in rng.sample(range(1, stats["total_users"]), min(sessions, stats["total_users"] - 1))]
+    for email in candidates:
+        session = _login(client, email, BENCH_PASSWORD)
+        if session:
+            users.append(session[0])
+            emails.append(email)
+            user_ids.append(session[1])
+    password = BENCH_PASSWORD
+    if not users:  # not a generated dataset: everyone is the test user
+        session = _login(client, *TEST_USER)
+        users, emails, user_ids, password = [session[0]], [TEST_USER[0]], [session[1]], TEST_USER[1]
+    lot_ids = [lot["id"] for lot in client.request("GET", "/api/parking/lots", headers=admin)[1]()["lots"]]
+    spots = {}
+    for lot_id in rng.sample(lot_ids, min(20, len(lot_ids))):
+        listing = client.request("GET", f"/api/parking/lots/{lot_id}/spots", headers=admin)[1]()
+        spots[lot_id] = [spot["id"] for spot in listing["spots"]]
+    return {
+        "admin": admin, "users": users, "emails": emails, "user_ids": user_ids, "password": password,
+        "lots": lot_ids, "spots": spots, "stats": stats,
+        "metrics_headers": {"Authorization": f"Bearer {metrics_token}"} if metrics_token else None,
+    }
+
+
+def run_mix(mix, make_client, ctx, threads, seconds, warmup, seed):
+    names = list(MIXES[mix])
+    weights = [MIXES[mix][name] for name in names]
+    workers = [Worker(make_client(), ctx, random.Random(seed + i)) for i in range(threads)]
+    record_at = time.perf_counter() + warmup
+    stop = record_at + seconds
+
+    def loop(w):
+        while (now := time.perf_counter()) < stop:
+            w.recording = now >= record_at
+            w.current = w.rng.choices(names, weights)[0]
+            OPS[w.current][4](w)
+
+    pool = [threading.Thread(target=loop, args=(w,)) for w in workers]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    rows, everything = [], []
+    for name in names:
+        samples = [s for w in workers for s in w.samples[name]]
+        if not samples:
+            continue
+        everything.extend(samples)
+        statuses = sum((w.statuses[name] for w in workers), Counter())
+        method, route, ok, conflict, _ = OPS[name]
+        rows.append({
+            "mix": mix, "op": name, "method": method, "route": route, **percentiles(samples),
+            "per_s": round(len(samples) / seconds, 1),
+            "conflicts": sum(statuses[status] for status in conflict),
+            "errors": sum(n for status, n in statuses.items() if status >= 400 and status not in ok | conflict),
+            "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        })
+    rows.append({
+        "mix": mix, "op": "*", "method": "*", "route": "*", **percentiles(everything),
+        "per_s": round(len(everything) / seconds, 1),
+        "conflicts": sum(r["conflicts"] for r in rows), "errors": sum(r["errors"] for r in rows),
+    })
+    return rows
+
+
+def api_routes(app):
+    return {
+        (method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        if rule.rule.startswith("/api") and rule.rule not in NOT_DRIVEN
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--database-uri", help="run in-process on this database (e.g. from benchmarks.dataset)")
+    target.add_argument("--base-url", help="drive a running server instead")
+    parser.add_argument("--mix", nargs="+", choices=MIXES, default=["mixed"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20, help="measured time per mix")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured time before each mix")
+    parser.add_argument("--sessions", type=int, default=32, help="distinct users to act as")
+    parser.add_argument("--cache-type", default="SimpleCache", help="in-process only: the response cache backend")
+    parser.add_argument("--metrics-token", help="METRICS_TOKEN of the server, if it sets one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.base_url:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})  # for its route list only
+        make_client, mode = (lambda: HttpClient(args.base_url)), f"http {args.base_url}"
+    else:
+        app = make_app(args.database_uri, sample_data=False, CACHE_TYPE=args.cache_type)
+        if args.database_uri is None:
+            with app.app_context():
+                generate(**SCALES["small"], seed=args.seed)
+        make_client, mode = (lambda: FlaskClient(app)), "in-process"
+
+    ctx = discover(make_client(), args.sessions, random.Random(args.seed), args.metrics_token)
+    print(f"{mode}: {ctx['stats']['total_users']} users, {len(ctx['lots'])} lots, "
+          f"{ctx['stats']['total_spots']} spots, {ctx['stats']['total_reservations']} reservations; "
+          f"acting as {len(ctx['users'])} users")
+
+    rows = []
+    for mix in args.mix:
+        rows.extend(run_mix(mix, make_client, ctx, args.threads, args.seconds, args.warmup, args.seed))
+        print(f"{mix}: {rows[-1]['per_s']} req/s, p99 {rows[-1]['p99_ms']} ms")
+
+    driven = {(r["method"], r["route"]) for r in rows if r["op"] != "*"}
+    not_driven = sorted(api_routes(app) - driven)
+    print()
+    print_table(rows, ["mix", "op", "n", "per_s", "p50_ms", "p95_ms", "p99_ms", "conflicts", "errors"])
+    if not_driven:
+        print("\nroutes no operation drove:", ", ".join(f"{m} {r}" for m, r in not_driven))
+    write_results(args.output, "api", rows, meta={
+        "mode": mode, "mixes": args.mix, "threads": args.threads, "seconds": args.seconds, "warmup": args.warmup,
+        "sessions": len(ctx["users"]), "seed": args.seed, "dataset": ctx["stats"],
+        "not_driven": [f"{m} {r}" for m, r in not_driven],
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Read endpoints through WsgiToAsgi vs the native async fast path (services/fastpath.py).
+
+Drives the ASGI app in-process with ``--concurrency`` requests in flight at a
+time, for each endpoint, with FAST_READS off (every request goes to Flask on
+a worker thread) and on (served on the event loop with aiosqlite).
+
+    python -m benchmarks.bench_async_reads --requests 2000 --concurrency 1 16 64
+"""
+
+import argparse
+import asyncio
+import time
+
+from asgi import create_asgi_app
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    percentiles,
+    print_table,
+    write_results,
+)
+from extensions import db
+from models.parking_lot import ParkingLot
+
+ENDPOINTS = [
+    ("health", "/api/health", ""),
+    ("lots", "/api/parking/lots", ""),
+    ("spots json", "/api/parking/lots/{lot}/spots", ""),
+    ("spots bitmap", "/api/parking/lots/{lot}/spots", "format=bitmap"),
+]
+
+
+async def request(asgi_app, path, query, headers):
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(), "server": ("bench", 80), "client": ("127.0.0.1", 1),
+        "headers": headers,
+    }
+    await asgi_app(scope, receive, send)
+    return status
+
+
+async def shutdown(asgi_app):
+    """ASGI lifespan shutdown, which closes the async engine's connections."""
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        pass
+
+    await asgi_app({"type": "lifespan"}, receive, send)
+
+
+async def load(asgi_app, path, query, headers, total, concurrency):
+    samples = []
+    remaining = iter(range(total))
+
+    async def client():
+        for _ in remaining:
+            began = time.perf_counter()
+            status = await request(asgi_app, path, query, headers)
+            samples.append(time.perf_counter() - began)
+            assert status == 200, (path, status)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        lot_id = db.session.query(ParkingLot.id).order_by(ParkingLot.max_spots.desc()).first()[0]
+        headers = [(k.lower().encode(), v.encode()) for k, v in auth_headers("user@parkapp.com").items()]
+
+    rows = []
+    for mode, fast in (("WsgiToAsgi", False), ("native", True)):
+        app.config["FAST_READS"] = fast
+        asgi_app = create_asgi_app(app)
+
+        async def run_all(asgi_app, mode):
+            for label, path, query in ENDPOINTS:
+                path = path.format(lot=lot_id)
+                await load(asgi_app, path, query, headers, 50, 4)  # warm up
+                for concurrency in args.concurrency:
+                    samples, elapsed = await load(asgi_app, path, query, headers, args.requests, concurrency)
+                    stats = percentiles(samples)
+                    rows.append({
+                        "endpoint": label, "mode": mode, "concurrency": concurrency,
+                        "req_per_s": round(len(samples) / elapsed), "p50_ms": stats["p50_ms"],
+                        "p99_ms": stats["p99_ms"],
+                    })
+                    print(rows[-1])
+            await shutdown(asgi_app)
+
+        asyncio.run(run_all(asgi_app, mode))
+
+    print()
+    print_table(rows, ["endpoint", "concurrency", "mode", "req_per_s", "p50_ms", "p99_ms"])
+    write_results(args.output, "async_reads", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Booking a fleet: one POST /api/parking/reserve per vehicle vs one bulk request.
+
+    python -m benchmarks.bench_bulk_reservations --fleet 50 200 500
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    print_table,
+    reset_lots,
+    seed_lots,
+    write_results,
+)
+from extensions import db
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+
+
+def fresh_lot(size):
+    db.session.query(Reservation).delete()
+    reset_lots()
+    (lot_id,) = seed_lots(1, size, occupied_every=0)
+    spot_ids = [
+        spot_id for (spot_id,) in
+        db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id).order_by(ParkingSpot.spot_no)
+    ]
+    return lot_id, spot_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fleet", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        headers = auth_headers("user@parkapp.com")
+        start = datetime.now()
+        window = {
+            "parking_time": start.isoformat(),
+            "leaving_time": (start + timedelta(hours=3)).isoformat(),
+        }
+        for size in args.fleet:
+            row = {"vehicles": size}
+
+            _, spot_ids = fresh_lot(size)
+            began = time.perf_counter()
+            for i, spot_id in enumerate(spot_ids):
+                res = client.post("/api/parking/reserve", headers=headers,
+                                  json={"vehicle_number": f"KA01FL{i:04d}", "spot_id": spot_id, **window})
+                assert res.status_code == 201, res.get_json()
+            row["per_item_s"] = round(time.perf_counter() - began, 3)
+
+            for label, key in (("bulk_spots", "spot_id"), ("bulk_lot", "lot_id")):
+                lot_id, spot_ids = fresh_lot(size)
+                targets = spot_ids if key == "spot_id" else [lot_id] * size
+                items = [{"vehicle_number": f"KA01FL{i:04d}", key: target, **window} for i, target in enumerate(targets)]
+                began = time.perf_counter()
+                res = client.post("/api/parking/reserve/bulk", headers=headers, json={"items": items})
+                row[f"{label}_s"] = round(time.perf_counter() - began, 3)
+                assert res.get_json()["created"] == size, res.get_json()
+
+            row["per_item_per_s"] = round(size / row["per_item_s"], 1)
+            row["bulk_spots_per_s"] = round(size / row["bulk_spots_s"], 1)
+            row["speedup"] = round(row["per_item_s"] / row["bulk_spots_s"], 1)
+            rows.append(row)
+            print(row)
+
+    print()
+    print_table(rows, list(rows[0].keys()))
+    write_results(args.output, "bulk_reservations", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Read latency during a login burst: inline hashing vs the bounded hashing pool.
+
+Login threads hammer POST /api/auth/login while reader threads poll
+GET /api/parking/lots, for ``--seconds`` per mode. Modes:
+
+* ``inline pbkdf2``: the old path, werkzeug pbkdf2:sha256 checked on the request thread
+* ``inline argon2``: the tuned argon2 hash, still on the request thread
+* ``pool argon2``: argon2 on ``PASSWORD_HASH_WORKERS`` threads with a queue
+  limit; overflow logins get a 503
+
+    python -m benchmarks.bench_login_mix --logins 16 --readers 4 --seconds 10
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from benchmarks.common import make_app, percentiles, print_table, write_results
+from extensions import db
+from models.user import User
+from services.passwords import HashingPool, create_hashing_pool
+
+EMAIL, PASSWORD = "user@parkapp.com", "user123"
+
+
+class InlinePbkdf2(HashingPool):
+    """What LoginResource used to do: check_password_hash inline, no rehash."""
+
+    def __init__(self):
+        super().__init__(workers=0)
+
+    def _verify(self, stored, password):
+        return check_password_hash(stored, password), None
+
+
+def drive(app, logins, readers, seconds):
+    stop = time.perf_counter() + seconds
+    samples = {"login": [], "read": []}
+    codes = Counter()
+    lock = threading.Lock()
+
+    def loop(kind, call):
+        client = app.test_client()
+        mine, my_codes = [], Counter()
+        while time.perf_counter() < stop:
+            began = time.perf_counter()
+            status = call(client)
+            mine.append(time.perf_counter() - began)
+            my_codes[f"{kind} {status}"] += 1
+        with lock:
+            samples[kind].extend(mine)
+            codes.update(my_codes)
+
+    def login(client):
+        return client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD}).status_code
+
+    def read(client):
+        return client.get("/api/parking/lots").status_code
+
+    threads = [threading.Thread(target=loop, args=("login", login)) for _ in range(logins)]
+    threads += [threading.Thread(target=loop, args=("read", read)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent lot-listing threads")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--pool-workers", type=int, default=2)
+    parser.add_argument("--pool-queue", type=int, default=8)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    modes = [
+        ("inline pbkdf2", InlinePbkdf2(), generate_password_hash(PASSWORD, method="pbkdf2:sha256")),
+        ("inline argon2", create_hashing_pool({**app.config, "PASSWORD_HASH_WORKERS": 0}), None),
+        (f"pool argon2 ({args.pool_workers}+{args.pool_queue})", create_hashing_pool({
+            **app.config, "PASSWORD_HASH_WORKERS": args.pool_workers, "PASSWORD_HASH_QUEUE": args.pool_queue,
+        }), None),
+    ]
+    rows = []
+    for label, pool, stored in modes:
+        app.extensions["password_hasher"] = pool
+        with app.app_context():
+            user = User.query.filter_by(email=EMAIL).first()
+            user.password = stored or pool.hasher.hash(PASSWORD)
+            db.session.commit()
+        samples, codes = drive(app, args.logins, args.readers, args.seconds)
+        for kind in ("read", "login"):
+            rows.append({
+                "mode": label,
+                "kind": kind,
+                **percentiles(samples[kind]),
+                "per_s": round(len(samples[kind]) / args.seconds, 1),
+                "503s": codes.get(f"{kind} 503", 0),
+            })
+            print(rows[-1])
+
+    print()
+    print_table(rows, ["mode", "kind", "n", "per_s", "p50_ms", "p95_ms", "p99_ms", "503s"])
+    write_results(args.output, "login_mix", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Latency of the lot availability endpoints as lot and spot counts grow.
+
+    python -m benchmarks.bench_lot_availability --lots 10 100 300 --spots 100 1000
+
+For every (lots, spots per lot) pair the script seeds a fresh SQLite file and
+times ``GET /api/parking/lots`` and ``GET /api/admin/dashboard-data``. The
+``legacy`` column replays the old per-lot ``filter_by(...).all()`` loop for
+comparison.
+"""
+
+import argparse
+
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    percentiles,
+    print_table,
+    reset_lots,
+    seed_lots,
+    time_calls,
+    write_results,
+)
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+
+
+def legacy_lot_counts():
+    counts = {}
+    for lot in ParkingLot.query.all():
+        spots = ParkingSpot.query.filter_by(lot_id=lot.id).all()
+        counts[lot.id] = (len(spots), sum(1 for s in spots if s.status == "A"))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lots", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--spots", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        headers = auth_headers()
+        for n_lots in args.lots:
+            for n_spots in args.spots:
+                reset_lots()
+                seed_lots(n_lots, n_spots)
+                row = {"lots": n_lots, "spots_per_lot": n_spots}
+                for label, url in (
+                    ("lots", "/api/parking/lots"),
+                    ("admin", "/api/admin/dashboard-data"),
+                ):
+                    stats = percentiles(
+                        time_calls(lambda url=url: client.get(url, headers=headers), args.repeat)
+                    )
+                    row[f"{label}_p50_ms"] = stats["p50_ms"]
+                    row[f"{label}_p95_ms"] = stats["p95_ms"]
+                if not args.skip_legacy:
+                    stats = percentiles(time_calls(legacy_lot_counts, max(1, args.repeat // 4)))
+                    row["legacy_p50_ms"] = stats["p50_ms"]
+                rows.append(row)
+                print(row)
+
+    print()
+    print_table(rows, list(rows[0].keys()))
+    write_results(args.output, "lot_availability", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Creating and resizing big lots: one ORM object per spot vs INSERT ... SELECT.
+
+    python -m benchmarks.bench_lot_materialization --spots 20000 100000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    print_table,
+    reset_lots,
+    write_results,
+)
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+
+
+def legacy_create(n_spots):
+    """What POST /api/admin/lots used to do."""
+    lot = ParkingLot(prime_location_name="Legacy", address="x", pin_code="0", price_per_hr=1.0,
+                     max_spots=n_spots, available_spots=n_spots, occupied_spots=0)
+    db.session.add(lot)
+    db.session.flush()
+    for i in range(1, n_spots + 1):
+        db.session.add(ParkingSpot(lot_id=lot.id, spot_no=i, status="A"))
+    db.session.commit()
+
+
+def measure(fn):
+    """Run ``fn`` and return (seconds, peak MiB of Python allocations)."""
+    tracemalloc.start()
+    began = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - began
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, round(elapsed, 3), round(peak / 2 ** 20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spots", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        headers = auth_headers()
+        for n_spots in args.spots:
+            row = {"spots": n_spots}
+
+            reset_lots()
+            _, row["legacy_create_s"], row["legacy_peak_mib"] = measure(lambda n_spots=n_spots: legacy_create(n_spots))
+
+            reset_lots()
+            body = {"name": "Bulk", "address": "x", "pin_code": "0", "price_per_hr": 1.0, "max_spots": n_spots}
+            res, row["bulk_create_s"], row["bulk_peak_mib"] = measure(
+                lambda body=body: client.post("/api/admin/lots", headers=headers, json=body)
+            )
+            assert res.status_code == 201, res.get_json()
+            lot_id = db.session.query(ParkingLot.id).filter_by(prime_location_name="Bulk").scalar()
+
+            res, row["shrink_half_s"], _ = measure(
+                lambda lot_id=lot_id, n_spots=n_spots: client.patch(f"/api/admin/lots/{lot_id}", headers=headers, json={"max_spots": n_spots // 2})
+            )
+            assert res.get_json()["spots_retired"] == n_spots - n_spots // 2, res.get_json()
+            res, row["grow_double_s"], _ = measure(
+                lambda lot_id=lot_id, n_spots=n_spots: client.patch(f"/api/admin/lots/{lot_id}", headers=headers, json={"max_spots": n_spots * 2})
+            )
+            assert res.get_json()["spots_added"] == n_spots * 2 - n_spots // 2, res.get_json()
+
+            row["create_speedup"] = round(row["legacy_create_s"] / row["bulk_create_s"], 1)
+            rows.append(row)
+            print(row)
+
+    print()
+    print_table(rows, list(rows[0].keys()))
+    write_results(args.output, "lot_materialization", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-request cost of the Prometheus instrumentation (services/metrics.py).
+
+Times Flask requests with METRICS_ENABLED off and on (median over rounds,
+each with freshly built apps in alternating order, so drift and app build
+order hit both the same). ``/api/health`` does almost nothing else, so it
+shows the overhead at its largest. Run it a second time with
+``PROMETHEUS_MULTIPROC_DIR`` set to measure the mmap-file mode gunicorn uses.
+
+    python -m benchmarks.bench_metrics_overhead --requests 5000 --rounds 5
+    PROMETHEUS_MULTIPROC_DIR=$(mktemp -d) python -m benchmarks.bench_metrics_overhead
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.common import auth_headers, make_app, print_table, write_results
+from services.metrics import observe_request
+
+ENDPOINTS = [("health", "/api/health"), ("lots", "/api/parking/lots")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    mode = "multiprocess" if os.environ.get("PROMETHEUS_MULTIPROC_DIR") else "in-process"
+    timings = {(label, enabled): [] for label, _ in ENDPOINTS for enabled in (False, True)}
+    for round_no in range(args.rounds):
+        # a fresh pair of apps per round, built in alternating order
+        for enabled in (False, True) if round_no % 2 == 0 else (True, False):
+            app = make_app(METRICS_ENABLED=enabled)
+            with app.app_context():
+                headers = auth_headers("user@parkapp.com")
+            client = app.test_client()
+            for label, path in ENDPOINTS:
+                for _ in range(100):  # warm up
+                    client.get(path, headers=headers)
+                began = time.perf_counter()
+                for _ in range(args.requests):
+                    client.get(path, headers=headers)
+                timings[(label, enabled)].append((time.perf_counter() - began) / args.requests * 1e6)
+
+    rows = []
+    for label, _ in ENDPOINTS:
+        off, on = statistics.median(timings[(label, False)]), statistics.median(timings[(label, True)])
+        rows.append({
+            "endpoint": label, "mode": mode, "off_us": round(off, 1), "on_us": round(on, 1),
+            "overhead_us": round(on - off, 1), "overhead_pct": round((on - off) / off * 100, 1),
+        })
+        print(rows[-1])
+
+    began = time.perf_counter()
+    for _ in range(100_000):
+        observe_request("GET", "/api/parking/lots", 200, 0.001)
+    print(f"\nobserve_request: {(time.perf_counter() - began) * 10:.2f} us per call")
+
+    print()
+    print_table(rows, ["endpoint", "mode", "off_us", "on_us", "overhead_us", "overhead_pct"])
+    write_results(args.output, "metrics_overhead", rows)
+
+
+if __name__ == "__main__":
+    main()
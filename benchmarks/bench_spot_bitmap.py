@@ -0,0 +1,53 @@
+"""
+Payload size and latency of GET /api/parking/lots/<id>/spots, JSON vs bitmap.
+
+    python -m benchmarks.bench_spot_bitmap --spots 1000 8000 20000
+"""
+
+import argparse
+
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    percentiles,
+    print_table,
+    reset_lots,
+    seed_lots,
+    time_calls,
+    write_results,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spots", type=int, nargs="+", default=[1000, 8000, 20000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    rows = []
+    with app.app_context():
+        headers = auth_headers()
+        for n_spots in args.spots:
+            reset_lots()
+            (lot_id,) = seed_lots(1, n_spots)
+            row = {"spots": n_spots}
+            for fmt in ("json", "bitmap"):
+                url = f"/api/parking/lots/{lot_id}/spots?format={fmt}"
+                row[f"{fmt}_bytes"] = len(client.get(url, headers=headers).data)
+                stats = percentiles(time_calls(lambda url=url: client.get(url, headers=headers), args.repeat))
+                row[f"{fmt}_p50_ms"] = stats["p50_ms"]
+            row["size_ratio"] = round(row["json_bytes"] / row["bitmap_bytes"], 1)
+            row["speedup"] = round(row["json_p50_ms"] / row["bitmap_p50_ms"], 1)
+            rows.append(row)
+            print(row)
+
+    print()
+    print_table(rows, list(rows[0].keys()))
+    write_results(args.output, "spot_bitmap", rows)
+
+
+if __name__ == "__main__":
+    main()
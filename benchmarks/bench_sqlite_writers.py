@@ -0,0 +1,132 @@
+"""
+Many processes writing one SQLite file: default settings vs the production pragmas and write lock.
+
+Starts ``--processes`` interpreters (standing in for gunicorn workers), each
+with ``--threads`` clients. Every client loops over book its own spot ->
+list lots -> cancel for ``--seconds``. Each mode gets a fresh database file,
+since WAL mode sticks to the file. Errors are 5xx answers, which is how
+"database is locked" reaches users.
+
+    python -m benchmarks.bench_sqlite_writers --processes 4 --threads 4 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from threading import Thread
+
+from benchmarks.common import (
+    auth_headers,
+    make_app,
+    percentiles,
+    print_table,
+    write_results,
+)
+from extensions import db
+from models.parking_spot import ParkingSpot
+
+MODES = {
+    "defaults (before)": {"SQLITE_PRAGMAS": {}, "SQLITE_WRITE_LOCK": False},
+    "pragmas": {"SQLITE_WRITE_LOCK": False},
+    "pragmas + write lock": {"SQLITE_WRITE_LOCK": True},
+}
+
+
+def worker(database_uri, overrides, spot_ids, seconds, out):
+    app = make_app(database_uri, **overrides)
+    with app.app_context():
+        headers = auth_headers("user@parkapp.com")
+    stop = time.perf_counter() + seconds
+    samples, codes, cycles = [], Counter(), Counter()
+
+    def call(fn, *args, **kwargs):
+        began = time.perf_counter()
+        res = fn(*args, **kwargs)
+        samples.append(time.perf_counter() - began)
+        codes[res.status_code // 100 * 100] += 1
+        return res
+
+    def client(spot_id):
+        http = app.test_client()
+        while time.perf_counter() < stop:
+            start = datetime.now() + timedelta(days=1)
+            res = call(http.post, "/api/parking/reserve", headers=headers, json={
+                "spot_id": spot_id,
+                "vehicle_number": "KA01AB1234",
+                "parking_time": start.isoformat(),
+                "leaving_time": (start + timedelta(hours=1)).isoformat(),
+            })
+            call(http.get, "/api/parking/lots", headers=headers)
+            if res.status_code != 201:
+                continue
+            reservation_id = res.get_json()["reservation"]["id"]
+            if call(http.post, f"/api/parking/reservations/{reservation_id}/cancel", headers=headers).status_code == 200:
+                cycles["done"] += 1
+
+    threads = [Thread(target=client, args=(spot_id,)) for spot_id in spot_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out.put((samples, dict(codes), cycles["done"]))
+
+
+def run_mode(overrides, processes, threads, seconds):
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="parking-writers-")
+    os.close(fd)
+    os.unlink(path)
+    database_uri = f"sqlite:///{path}"
+    app = make_app(database_uri, **overrides)
+    with app.app_context():
+        spot_ids = [s.id for s in ParkingSpot.query.order_by(ParkingSpot.id).limit(processes * threads)]
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(database_uri, overrides, spot_ids[i * threads:(i + 1) * threads], seconds, out))
+        for i in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    samples = [s for r in results for s in r[0]]
+    codes = sum((Counter(r[1]) for r in results), Counter())
+    cycles = sum(r[2] for r in results)
+    total = sum(codes.values())
+    return {
+        "cycles_per_s": round(cycles / seconds, 1),
+        "requests": total,
+        "errors": codes.get(500, 0),
+        "error_rate_pct": round(codes.get(500, 0) / total * 100, 2) if total else 0,
+        **{k: v for k, v in percentiles(samples).items() if k in ("p50_ms", "p99_ms")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for label, overrides in MODES.items():
+        rows.append({"mode": label, **run_mode(overrides, args.processes, args.threads, args.seconds)})
+        print(rows[-1])
+
+    print()
+    print_table(rows, ["mode", "cycles_per_s", "requests", "errors", "error_rate_pct", "p50_ms", "p99_ms"])
+    write_results(args.output, "sqlite_writers", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Startup cost of ``create_app`` and of importing ``asgi:asgi_app``, with and without DB init.
+
+``legacy`` boots the way every worker used to (``create_app`` followed by
+``init_database``); ``current`` is ``create_app`` alone, with ``flask init-db``
+run once up front. The last rows start ``--workers`` interpreters at once
+against one fresh SQLite file, as gunicorn does, and count the ones that fail.
+
+    python -m benchmarks.bench_startup --repeat 20 --workers 9
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import create_app, init_database
+from benchmarks.common import percentiles, print_table, time_calls, write_results
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+BOOT = """
+import time
+t = time.perf_counter()
+import asgi
+if {init}:
+    from app import init_database
+    with asgi.app.app_context():
+        init_database()
+print(time.perf_counter() - t)
+"""
+
+
+def fresh_db():
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="parking-startup-")
+    os.close(fd)
+    os.unlink(path)
+    return f"sqlite:///{path}"
+
+
+def boot_env(database_uri):
+    return {
+        **os.environ,
+        "DATABASE_URI": database_uri,
+        "CACHE_TYPE": "NullCache",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "PYTHONPATH": ROOT,
+    }
+
+
+def spawn(database_uri, init):
+    return subprocess.Popen(
+        [sys.executable, "-c", BOOT.format(init=init)],
+        cwd=ROOT, env=boot_env(database_uri),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+
+
+def import_asgi_samples(database_uri, init, repeat):
+    samples = []
+    for _ in range(repeat):
+        out, err = spawn(database_uri, init).communicate()
+        if not out.strip():
+            raise RuntimeError(err)
+        samples.append(float(out))
+    return samples
+
+
+def concurrent_boot(workers, init):
+    """Start ``workers`` interpreters at once; returns (wall seconds, failures)."""
+    database_uri = fresh_db()
+    began = time.perf_counter()
+    if not init:
+        app = create_app(test_config={"SQLALCHEMY_DATABASE_URI": database_uri})
+        with app.app_context():
+            init_database()
+    procs = [spawn(database_uri, init) for _ in range(workers)]
+    failures = sum(1 for p in procs if p.wait() != 0)
+    return time.perf_counter() - began, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    database_uri = fresh_db()
+    config = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "CACHE_TYPE": "NullCache",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+    }
+    with create_app(test_config=config).app_context():
+        init_database()
+
+    def legacy():
+        app = create_app(test_config=config)
+        with app.app_context():
+            init_database()
+
+    rows = []
+    for label, fn in (("create_app + init_database", legacy), ("create_app", lambda: create_app(test_config=config))):
+        rows.append({"mode": label, **percentiles(time_calls(fn, args.repeat))})
+        print(rows[-1])
+    for label, init in (("import asgi + init_database", True), ("import asgi", False)):
+        rows.append({"mode": label, **percentiles(import_asgi_samples(database_uri, init, args.repeat))})
+        print(rows[-1])
+    for label, init in (("legacy", True), ("init-db once", False)):
+        wall, failures = concurrent_boot(args.workers, init)
+        rows.append({
+            "mode": f"{args.workers} workers booting, {label}",
+            "wall_s": round(wall, 2),
+            "failed": failures,
+        })
+        print(rows[-1])
+
+    print()
+    print_table(rows, ["mode", "n", "mean_ms", "p50_ms", "p95_ms", "wall_s", "failed"])
+    write_results(args.output, "startup", rows)
+
+
+if __name__ == "__main__":
+    main()
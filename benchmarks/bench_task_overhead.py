@@ -0,0 +1,82 @@
+"""
+Per-task overhead of the Celery jobs: a new Flask app per task vs one per worker process.
+
+Runs ``jobs.sync_spot_occupancy`` (a small task) both ways, outside any app
+context as a worker would, and times the imports the jobs module no longer
+pays up front.
+
+    python -m benchmarks.bench_task_overhead --repeat 30
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+
+from benchmarks.common import (
+    make_app,
+    percentiles,
+    print_table,
+    time_calls,
+    write_results,
+)
+from extensions import db
+from services import worker
+
+
+def import_seconds(modules):
+    """Wall time of a fresh interpreter importing ``modules``, minus a bare interpreter."""
+    def run(code):
+        timer = "import time; t = time.perf_counter(); {}; print(time.perf_counter() - t)"
+        out = subprocess.run([sys.executable, "-c", timer.format(code)], capture_output=True, text=True, check=True)
+        return float(out.stdout.strip() or 0)
+    return run("; ".join(f"import {m}" for m in modules))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    app = make_app()
+    database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+
+    import jobs
+    from services.intervals import sync_spot_occupancy
+
+    def legacy_task():
+        # what every task body used to start with
+        task_app = make_app(database_uri)
+        with task_app.app_context():
+            sync_spot_occupancy()
+            db.session.commit()
+            db.engine.dispose()
+
+    worker.bind_worker_app(app)
+
+    def worker_task():
+        jobs.sync_spot_occupancy.apply().get()
+
+    rows = []
+    for label, fn in (("create_app per task", legacy_task), ("app per process", worker_task)):
+        samples = []
+        # run off the main thread so no app context leaks in
+        thread = threading.Thread(target=lambda fn=fn, samples=samples: samples.extend(time_calls(fn, args.repeat)))
+        thread.start()
+        thread.join()
+        rows.append({"mode": label, **percentiles(samples)})
+        print(rows[-1])
+    rows.append({
+        "mode": "import reportlab + twilio (now lazy)",
+        "mean_ms": round(import_seconds(["reportlab.platypus", "reportlab.lib.styles", "twilio.rest"]) * 1000, 1),
+    })
+    print(rows[-1])
+
+    print()
+    print_table(rows, ["mode", "n", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    write_results(args.output, "task_overhead", rows)
+
+
+if __name__ == "__main__":
+    main()
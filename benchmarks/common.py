@@ -0,0 +1,155 @@
+"""Shared helpers for the benchmark scripts (app setup, seeding, timing, reporting)."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app import create_app, init_database
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from models.user import User
+from services.auth import issue_token
+from services.intervals import interval_indexes
+
+
+def make_app(database_uri=None, sample_data=True, **overrides):
+    """Build an app against a throwaway SQLite file (or the given URI)."""
+    if database_uri is None:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="parking-bench-")
+        os.close(fd)
+        database_uri = f"sqlite:///{path}"
+    config = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "CACHE_TYPE": "NullCache",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "MAIL_SUPPRESS_SEND": True,
+        "JWT_SECRET_KEY": "benchmark-secret-key-benchmark-secret-key",
+        "SECRET_KEY": "benchmark-secret",
+    }
+    config.update(overrides)
+    app = create_app(test_config=config)
+    with app.app_context():
+        init_database(sample_data=sample_data)
+    return app
+
+
+def reset_lots():
+    """Remove every lot and spot so a benchmark starts from a known size."""
+    # new lots reuse the deleted ids at version 0, so drop per-process state too
+    interval_indexes.clear()
+    for (lot_id,) in db.session.query(ParkingLot.id):
+        current_app.extensions["spot_allocator"].forget(lot_id)
+    db.session.query(ParkingSpot).delete()
+    db.session.query(ParkingLot).delete()
+    db.session.commit()
+
+
+def seed_lots(n_lots, spots_per_lot, occupied_every=3):
+    """Bulk-insert ``n_lots`` lots with ``spots_per_lot`` spots each."""
+    occupied = spots_per_lot // occupied_every if occupied_every else 0
+    lot_rows = [
+        {
+            "prime_location_name": f"Bench Lot {i}",
+            "address": f"{i} Benchmark Road",
+            "pin_code": "00000",
+            "price_per_hr": 5.0,
+            "max_spots": spots_per_lot,
+            "available_spots": spots_per_lot - occupied,
+            "occupied_spots": occupied,
+        }
+        for i in range(n_lots)
+    ]
+    db.session.execute(insert(ParkingLot), lot_rows)
+    lot_ids = [lot_id for (lot_id,) in db.session.query(ParkingLot.id).all()]
+    for lot_id in lot_ids:
+        db.session.execute(
+            insert(ParkingSpot),
+            [
+                {
+                    "lot_id": lot_id,
+                    "spot_no": n,
+                    "status": "O" if occupied_every and n % occupied_every == 0 else "A",
+                }
+                for n in range(1, spots_per_lot + 1)
+            ],
+        )
+    db.session.commit()
+    return lot_ids
+
+
+def auth_headers(email="admin@parkapp.com"):
+    """Return an Authorization header for an existing (seeded) user."""
+    user = User.query.filter_by(email=email).first()
+    token = issue_token(user)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def percentiles(samples):
+    """Summarise a list of latencies (seconds) as milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+    }
+
+
+def time_calls(fn, repeat):
+    """Call ``fn`` ``repeat`` times and return the per-call latencies."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def print_table(rows, columns):
+    """Print ``rows`` (list of dicts) as an aligned text table."""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def git_commit():
+    """The checked-out commit (``+dirty`` with local changes), or None outside a git checkout."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}+dirty" if dirty else commit
+
+
+def write_results(path, name, rows, meta=None):
+    """Write benchmark rows as JSON so runs can be diffed (``python -m benchmarks.compare``)."""
+    if not path:
+        return
+    with open(path, "w") as f:
+        json.dump({
+            "benchmark": name, "timestamp": time.time(), "commit": git_commit(), "meta": meta or {}, "results": rows,
+        }, f, indent=2)
+    print(f"results written to {path}")
@@ -0,0 +1,63 @@
+"""
+Compare two result files written with ``--output`` (any benchmark), e.g. before and after a change.
+
+Rows are matched on their text fields (mix, op, endpoint, mode...) and every
+shared numeric field is shown old -> new with the change in percent.
+
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --fields per_s p95_ms p99_ms
+"""
+
+import argparse
+import json
+
+from benchmarks.common import print_table
+
+DEFAULT_FIELDS = ("per_s", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+
+def _key(row):
+    return tuple((k, v) for k, v in row.items() if isinstance(v, str))
+
+
+def compare(old, new, fields=DEFAULT_FIELDS):
+    """One row per matched result row, with ``field: "old -> new (+x%)"`` for each field both have."""
+    before = {_key(row): row for row in old["results"]}
+    rows = []
+    for row in new["results"]:
+        previous = before.get(_key(row))
+        if previous is None:
+            continue
+        out = dict(_key(row))
+        for field in fields:
+            a, b = previous.get(field), row.get(field)
+            if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+                change = f" ({(b - a) / a * 100:+.1f}%)" if a else ""
+                out[field] = f"{a} -> {b}{change}"
+        rows.append(out)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS))
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old["benchmark"] != new["benchmark"]:
+        raise SystemExit(f"different benchmarks: {old['benchmark']} vs {new['benchmark']}")
+    print(f"{old['benchmark']}: {old.get('commit') or '?'} -> {new.get('commit') or '?'}")
+    rows = compare(old, new, args.fields)
+    if not rows:
+        raise SystemExit("no matching rows")
+    columns = [k for k in rows[0] if k not in args.fields] + [f for f in args.fields if any(f in r for r in rows)]
+    print_table(rows, columns)
+
+
+if __name__ == "__main__":
+    main()
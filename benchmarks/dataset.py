@@ -0,0 +1,278 @@
+"""
+Synthetic dataset at production scale, for the API benchmarks (bench_api.py).
+
+Bulk-loads users, lots, spots and reservations into an empty database:
+
+    python -m benchmarks.dataset --database-uri sqlite:////tmp/parking-large.db --scale large
+    python -m benchmarks.dataset --database-uri sqlite:////tmp/p.db --users 20000 --reservations 500000
+
+``--scale large`` is 500k users, 1k lots, 1M spots and 10M reservations.
+The data is built to look like the real thing:
+
+- Every spot has a non-overlapping timeline of bookings spread over the last
+  ``--days-back`` days and the next ``--days-ahead`` days.
+- Status follows the clock: completed (with cost) or cancelled in the past,
+  active now, upcoming later.
+- Spots with an active booking are occupied, and the lot counters match the
+  spots.
+- Users book with a skew, so a few users have far more bookings than most.
+
+Every generated user can log in as ``user<n>@bench.parkapp.com`` with
+``BENCH_PASSWORD``; all of them share one argon2 hash. The default admin and
+test users are there too.
+
+The load inserts straight through the driver in batches, on a separate
+connection with the reservation and spot indexes and the overlap guard
+dropped. The indexes are rebuilt once at the end, and ``upgrade_schema()``
+puts the guard back. Timestamps come
+from a precomputed 15-minute grid, because formatting a datetime per row
+would cost more than inserting it. The same seed gives the same data.
+"""
+
+import argparse
+import random
+import time
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import create_engine, event, func, insert, literal, select, update
+
+from benchmarks.common import make_app, print_table, write_results
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from models.user import Role, User, roles_users
+from services.availability import reconcile_lot_counters
+from services.schema import drop_booking_guard, upgrade_schema
+
+SCALES = {
+    "small": {"users": 1_000, "lots": 20, "spots": 2_000, "reservations": 20_000},
+    "medium": {"users": 50_000, "lots": 200, "spots": 100_000, "reservations": 1_000_000},
+    "large": {"users": 500_000, "lots": 1_000, "spots": 1_000_000, "reservations": 10_000_000},
+}
+
+BENCH_EMAIL = "user{}@bench.parkapp.com"
+BENCH_PASSWORD = "bench123"
+
+SLOTS_PER_DAY = 96  # the 15-minute grid every generated time sits on
+CANCELLED = 0.05  # share of bookings that get cancelled
+
+# how the app's SQLite DateTime columns store values
+SQLITE_DATETIME = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _insert_rows(conn, table, columns, rows, batch_size):
+    """executemany ``rows`` (tuples) into ``table`` in batches, committing each. Returns the count."""
+    mark = {"qmark": "?", "format": "%s", "pyformat": "%s"}[conn.dialect.paramstyle]
+    quote = conn.dialect.identifier_preparer.quote
+    sql = (
+        f"INSERT INTO {quote(table)} ({', '.join(quote(c) for c in columns)}) "
+        f"VALUES ({', '.join([mark] * len(columns))})"
+    )
+    rows, count = iter(rows), 0
+    while batch := list(islice(rows, batch_size)):
+        conn.exec_driver_sql(sql, batch)
+        conn.commit()
+        count += len(batch)
+    return count
+
+
+def _loader_engine():
+    """A plain engine on the app's database: no pool events, and no fsync on SQLite."""
+    engine = create_engine(db.engine.url)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def fast_load(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA cache_size=-262144")
+            cursor.close()
+    return engine
+
+
+def _reservation_rows(spot_ids, spot_lots, n_reservations, first_user, n_users, prices, stamps, now_slot, rng):
+    """
+    Reservation tuples for every spot, an even share each.
+
+    Each spot's bookings sit in equal slices of the grid, one per slice, so
+    they never overlap.
+    """
+    n_spots = len(spot_ids)
+    per_spot, extra = divmod(n_reservations, n_spots)
+    total_slots = len(stamps) - 1
+    if total_slots // (per_spot + 1) < 5:
+        raise ValueError("too many reservations per spot for the time span; raise --days-back")
+    rnd = rng.random
+    plates = [f"KA{i % 100:02d}{chr(65 + i // 100 % 26)}{chr(65 + i // 2600 % 26)}{i % 10000:04d}" for i in range(20_000)]
+    for index, (spot_id, lot_id) in enumerate(zip(spot_ids, spot_lots)):
+        count = per_spot + (index < extra)
+        if not count:
+            continue
+        width = total_slots // count
+        price = prices[lot_id]
+        for j in range(count):
+            length = min(4 + int(rnd() * 29), width - 1)  # 1 to 8 hours
+            start = j * width + int(rnd() * (width - length))
+            end = start + length
+            if end <= now_slot:
+                status = "X" if rnd() < CANCELLED else "C"
+            elif start <= now_slot:
+                status = "A"
+            else:
+                status = "X" if rnd() < CANCELLED else "U"
+            user_id = first_user + int(n_users * rnd() ** 2)  # low ids book the most
+            yield (
+                spot_id, user_id, stamps[start], stamps[start] if status in ("A", "C") else None, stamps[end],
+                round(length * price / 4, 2) if status == "C" else None, plates[user_id % len(plates)], status,
+            )
+
+
+def generate(users, lots, spots, reservations, seed=0, days_back=365, days_ahead=14, batch_size=50_000, log=print):
+    """
+    Load the dataset into the app's database, which must have no lots or reservations yet.
+
+    Needs an app context. Returns one row per stage: ``stage``, ``rows``,
+    ``seconds`` and ``rows_per_s``.
+    """
+    if db.session.scalar(select(func.count(ParkingLot.id))) or db.session.scalar(select(func.count(Reservation.id))):
+        raise ValueError("the database already has lots or reservations; generate into a fresh one")
+    if db.engine.url.database in (None, "", ":memory:"):
+        raise ValueError("needs a database file or server, not an in-memory SQLite database")
+    if spots < lots:
+        raise ValueError("need at least one spot per lot")
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    now -= timedelta(minutes=now.minute % 15)
+    origin = now - timedelta(days=days_back)
+    now_slot = days_back * SLOTS_PER_DAY
+    grid = [origin + timedelta(minutes=15 * k) for k in range((days_back + days_ahead) * SLOTS_PER_DAY + 1)]
+    engine = _loader_engine()
+    if engine.dialect.name == "sqlite":
+        grid = [t.strftime(SQLITE_DATETIME) for t in grid]
+    user_role = db.session.scalar(select(Role.id).where(Role.name == "user"))
+    password = current_app.extensions["password_hasher"].hash(BENCH_PASSWORD)
+    db.session.commit()
+
+    timings = []
+
+    def stage(name, load):
+        began = time.perf_counter()
+        rows = load()
+        seconds = time.perf_counter() - began
+        timings.append({"stage": name, "rows": rows, "seconds": round(seconds, 1),
+                        "rows_per_s": round(rows / seconds) if rows and seconds else None})
+        log(f"{name}: {rows} rows in {seconds:.1f}s")
+
+    with engine.connect() as conn:
+        for table in (Reservation.__table__, ParkingSpot.__table__):
+            for index in table.indexes:
+                index.drop(conn)
+        drop_booking_guard(conn)
+        conn.commit()
+
+        rnd = rng.random
+
+        def load_users():
+            rows = (
+                (f"bench{i}", BENCH_EMAIL.format(i), password, True, uuid.UUID(int=rng.getrandbits(128)).hex,
+                 grid[int(rnd() * now_slot)], "email", 0)
+                for i in range(1, users + 1)
+            )
+            count = _insert_rows(conn, "user", ["username", "email", "password", "active", "fs_uniquifier", "time",
+                                                "notification_preference", "auth_version"], rows, batch_size)
+            conn.execute(insert(roles_users).from_select(
+                ["user_id", "role_id"],
+                select(User.id, literal(user_role)).where(User.email.like(BENCH_EMAIL.format("%"))),
+            ))
+            conn.commit()
+            return count
+
+        def load_lots():
+            sizes = [spots // lots + (i < spots % lots) for i in range(lots)]
+            rows = (
+                (f"Lot {i + 1:04d}", f"{i + 1} Benchmark Road", f"{560001 + i % 100}", round(2 + rnd() * 10, 1),
+                 size, size, 0, 0, grid[0])
+                for i, size in enumerate(sizes)
+            )
+            return _insert_rows(conn, "parking_lot", ["prime_location_name", "address", "pin_code", "price_per_hr",
+                                                      "max_spots", "available_spots", "occupied_spots", "version",
+                                                      "time"], rows, batch_size)
+
+        def load_spots():
+            lot_sizes = conn.execute(select(ParkingLot.id, ParkingLot.max_spots).order_by(ParkingLot.id)).all()
+            rows = ((lot_id, n, "A", grid[0]) for lot_id, size in lot_sizes for n in range(1, size + 1))
+            return _insert_rows(conn, "parking_spot", ["lot_id", "spot_no", "status", "time"], rows, batch_size)
+
+        def load_reservations():
+            first_user = conn.scalar(select(func.min(User.id)).where(User.email.like(BENCH_EMAIL.format("%"))))
+            prices = dict(conn.execute(select(ParkingLot.id, ParkingLot.price_per_hr)).all())
+            # 8 bytes a spot; a cursor left open across the batches would hold back WAL checkpoints
+            spot_ids, spot_lots = array("q"), array("q")
+            for spot_id, lot_id in conn.execute(select(ParkingSpot.id, ParkingSpot.lot_id).order_by(ParkingSpot.id)):
+                spot_ids.append(spot_id)
+                spot_lots.append(lot_id)
+            rows = _reservation_rows(spot_ids, spot_lots, reservations, first_user, users, prices, grid, now_slot, rng)
+            return _insert_rows(conn, "reservation", ["spot_id", "user_id", "parking_time", "checkin_time",
+                                                      "leaving_time", "cost", "vehicle_number", "status"],
+                                rows, batch_size)
+
+        stage("users", load_users)
+        stage("lots", load_lots)
+        stage("spots", load_spots)
+        stage("reservations", load_reservations)
+
+        def build_indexes():
+            # here rather than in upgrade_schema(), to sort with the loader's bigger cache
+            indexes = [index for table in (Reservation.__table__, ParkingSpot.__table__) for index in table.indexes]
+            for index in indexes:
+                index.create(conn)
+            conn.commit()
+            return spots + reservations
+
+        stage("indexes", build_indexes)
+    engine.dispose()
+
+    def finish():
+        upgrade_schema()  # the overlap guard
+        occupied = db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.id.in_(select(Reservation.spot_id).where(Reservation.status == "A")))
+            .values(status="O")
+        ).rowcount
+        reconcile_lot_counters()
+        db.session.commit()
+        return occupied
+
+    stage("occupancy", finish)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-uri", required=True, help="an empty (or new) database")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    for name in ("users", "lots", "spots", "reservations"):
+        parser.add_argument(f"--{name}", type=int, help=f"override the scale's {name}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days-back", type=int, default=365, help="history to spread bookings over")
+    parser.add_argument("--days-ahead", type=int, default=14, help="how far ahead upcoming bookings go")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    sizes = {name: getattr(args, name) or default for name, default in SCALES[args.scale].items()}
+    app = make_app(args.database_uri, sample_data=False)
+    with app.app_context():
+        rows = generate(**sizes, seed=args.seed, days_back=args.days_back, days_ahead=args.days_ahead,
+                        batch_size=args.batch_size)
+    print()
+    print_table(rows, ["stage", "rows", "seconds", "rows_per_s"])
+    write_results(args.output, "dataset", rows, meta={"scale": args.scale, **sizes, "seed": args.seed})
+
+
+if __name__ == "__main__":
+    main()
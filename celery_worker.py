@@ -1,8 +1,11 @@
 from app import create_app
 from extensions import celery
+from services.worker import bind_worker_app
 
-app = create_app()
+# built once here; every task in this process (and prefork child) reuses it
+app = bind_worker_app(create_app())
+
+import jobs  # noqa: F401  registers the tasks
 
 if __name__ == "__main__":
-    with app.app_context():
-        celery.worker_main(["worker", "--loglevel=info"])
+    celery.worker_main(["worker", "--loglevel=info"])
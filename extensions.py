@@ -3,7 +3,9 @@ from flask_caching import Cache
 from flask_mail import Mail
 from celery import Celery
 
-db = SQLAlchemy()
+from services.replica import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 cache = Cache()
 mail = Mail()
 celery = Celery()
@@ -82,14 +82,43 @@ export const authAPI = {
 // User API
 export const userAPI = {
   getRole: () => api.get('/user/role'),
-  getDashboardData: () => api.get('/user/dashboard-data'),
+  getDashboardData: (params = {}) => api.get('/user/dashboard-data', { params }),
+};
+
+// Expand a `?format=bitmap` spots response into the `{ id, spot_no, status }` list
+// the views use. Bit i (LSB first) set means spot i is taken.
+export const decodeSpotBitmap = (data) => {
+  const bits = atob(data.occupied || '');
+  const spots = new Array(data.count);
+  for (let i = 0; i < data.count; i++) {
+    const taken = (bits.charCodeAt(i >> 3) >> (i & 7)) & 1;
+    spots[i] = {
+      id: data.spot_ids ? data.spot_ids[i] : data.first_spot_id + i,
+      spot_no: data.spot_nos ? data.spot_nos[i] : data.first_spot_no + i,
+      status: taken ? 'occupied' : 'available',
+    };
+  }
+  return spots;
 };
 
 // Parking API
 export const parkingAPI = {
   getLots: () => api.get('/parking/lots'),
-  getSpots: (lotId) => api.get(`/parking/lots/${lotId}/spots`),
+  getSpots: (lotId) =>
+    api.get(`/parking/lots/${lotId}/spots`, { params: { format: 'bitmap' } }).then((response) => {
+      response.data.spots = decodeSpotBitmap(response.data);
+      return response;
+    }),
+  // Server-Sent Events stream of spot status changes for one lot
+  lotEvents: (lotId) => {
+    const token = encodeURIComponent(localStorage.getItem('access_token') || '');
+    return new EventSource(`${API_BASE_URL}/parking/lots/${lotId}/events?token=${token}`);
+  },
   reserve: (data) => api.post('/parking/reserve', data),
+  // Let the server pick a free spot in the lot
+  reserveAny: (lotId, data) => api.post(`/parking/lots/${lotId}/reserve-any`, data),
+  // Fleet bookings: items of { vehicle_number, spot_id | lot_id, parking_time, leaving_time }
+  reserveBulk: (items, mode = 'atomic') => api.post('/parking/reserve/bulk', { items, mode }),
   cancelReservation: (id) => api.post(`/parking/reservations/${id}/cancel`),
 };
 
@@ -97,9 +126,11 @@ export const parkingAPI = {
 export const adminAPI = {
   getDashboardData: () => api.get('/admin/dashboard-data'),
   getUsers: () => api.get('/admin/users'),
-  getReservations: () => api.get('/admin/reservations'),
+  getReservations: (params = {}) => api.get('/admin/reservations', { params }),
   getLots: () => api.get('/admin/lots'),
   createLot: (data) => api.post('/admin/lots', data),
+  // Edit details or resize; shrinking answers 409 while retired spots still have live bookings
+  updateLot: (id, data) => api.patch(`/admin/lots/${id}`, data),
 };
 
 export default api;
@@ -1,4 +1,6 @@
 import multiprocessing
+import os
+import shutil
 
 bind = "0.0.0.0:5000"
 workers = multiprocessing.cpu_count() * 2 + 1
@@ -14,3 +16,20 @@ forwarded_allow_ips = "*"
 raw_env = [
     "FLASK_APP=app:create_app()",
 ]
+
+
+# Prometheus multiprocess mode (services/metrics.py): start from an empty
+# directory, and stop counting a worker's live gauges once it exits. The
+# directory is gunicorn's alone; the Celery worker writes to its own.
+def on_starting(server):
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -3,116 +3,150 @@ import io
 import os
 import requests
 import calendar
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter
 from flask_mail import Message
-from twilio.rest import Client
-from sqlalchemy import extract
+from sqlalchemy import select
 from extensions import celery, db, mail
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
 from models.user import User
 from models.reservation import Reservation
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from services.worker import AppContextTask
 
 
-@celery.task(name="jobs.export_user_parking_csv")
+@celery.task(base=AppContextTask, name="jobs.export_user_parking_csv")
 def export_user_parking_csv(user_id, user_email):
     """
     Celery task: Exports all parking spot usage for a user as CSV and emails a download link or file.
     """
-    from app import create_app
+    from models.reservation import Reservation
 
-    app = create_app()
-    with app.app_context():
-        from models.reservation import Reservation
-
-        user_reservations = (
-            Reservation.query.filter_by(user_id=user_id)
-            .order_by(Reservation.parking_time.asc())
-            .all()
+    user_reservations = (
+        Reservation.query.filter_by(user_id=user_id)
+        .order_by(Reservation.parking_time.asc())
+        .all()
+    )
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(
+        [
+            "Reservation ID",
+            "Lot Name",
+            "Spot No",
+            "Parking Time",
+            "Leaving Time",
+            "Vehicle Number",
+            "Cost",
+            "Status",
+        ]
+    )
+    for r in user_reservations:
+        lot_name = (
+            r.spot.parking_lot.prime_location_name
+            if r.spot and r.spot.parking_lot
+            else "-"
         )
-        output = io.StringIO()
-        writer = csv.writer(output)
+        spot_no = r.spot.spot_no if r.spot else "-"
         writer.writerow(
             [
-                "Reservation ID",
-                "Lot Name",
-                "Spot No",
-                "Parking Time",
-                "Leaving Time",
-                "Vehicle Number",
-                "Cost",
-                "Status",
+                r.id,
+                lot_name,
+                spot_no,
+                r.parking_time.strftime("%Y-%m-%d %H:%M")
+                if r.parking_time
+                else "-",
+                r.leaving_time.strftime("%Y-%m-%d %H:%M")
+                if r.leaving_time
+                else "-",
+                r.vehicle_number,
+                r.cost if r.cost is not None else "-",
+                r.status,
             ]
         )
-        for r in user_reservations:
-            lot_name = (
-                r.spot.parking_lot.prime_location_name
-                if r.spot and r.spot.parking_lot
-                else "-"
-            )
-            spot_no = r.spot.spot_no if r.spot else "-"
-            writer.writerow(
-                [
-                    r.id,
-                    lot_name,
-                    spot_no,
-                    r.parking_time.strftime("%Y-%m-%d %H:%M")
-                    if r.parking_time
-                    else "-",
-                    r.leaving_time.strftime("%Y-%m-%d %H:%M")
-                    if r.leaving_time
-                    else "-",
-                    r.vehicle_number,
-                    r.cost if r.cost is not None else "-",
-                    r.status,
-                ]
-            )
-        csv_data = output.getvalue()
-        output.close()
-        # Email the CSV as an attachment
-        msg = Message("Your Parking Spot Usage Export", recipients=[user_email])
-        msg.body = "Attached is your parking spot usage export as requested."
-        msg.attach("parking_spots_export.csv", "text/csv", csv_data)
-        mail.send(msg)
+    csv_data = output.getvalue()
+    output.close()
+    # Email the CSV as an attachment
+    msg = Message("Your Parking Spot Usage Export", recipients=[user_email])
+    msg.body = "Attached is your parking spot usage export as requested."
+    msg.attach("parking_spots_export.csv", "text/csv", csv_data)
+    mail.send(msg)
+
+
+def monthly_activity(month_start, month_end, batch_size=1000):
+    """
+    Yields ``(user, bookings)`` for every user with completed bookings in [month_start, month_end).
+
+    One query for everyone: the completed bookings in the range joined to
+    their user, spot and lot, ordered by user and streamed ``batch_size``
+    rows at a time. ``user`` is ``(id, username, email)`` and ``bookings``
+    the user's rows (``parking_time``, ``cost``, ``spot_no``, ``lot_name``)
+    in time order. Users without bookings never come up.
+    """
+    rows = db.session.execute(
+        select(
+            Reservation.user_id,
+            User.username,
+            User.email,
+            Reservation.parking_time,
+            Reservation.cost,
+            ParkingSpot.spot_no,
+            ParkingLot.prime_location_name.label("lot_name"),
+        )
+        .join(User, User.id == Reservation.user_id)
+        .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        # a plain range on parking_time can use ix_reservation_status_time;
+        # extract("year"/"month") can't
+        .where(
+            Reservation.status == "C",
+            Reservation.parking_time >= month_start,
+            Reservation.parking_time < month_end,
+        )
+        .order_by(Reservation.user_id, Reservation.parking_time),
+        execution_options={"yield_per": batch_size},
+    )
+    for _, group in groupby(rows, key=attrgetter("user_id")):
+        bookings = list(group)
+        first = bookings[0]
+        yield (first.user_id, first.username, first.email), bookings
 
 
 # Celery task for monthly activity report
-@celery.task(name="jobs.send_monthly_activity_report")
+@celery.task(base=AppContextTask, name="jobs.send_monthly_activity_report")
 def send_monthly_activity_report():
     """
-    Celery scheduled task: Sends a monthly HTML activity report to each user via email.
+    Celery scheduled task: Sends a monthly HTML activity report to each user who parked last month via email.
     """
-    from app import create_app
+    # reportlab is slow to import and only this task needs it
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import (
+        Paragraph,
+        SimpleDocTemplate,
+        Spacer,
+        Table,
+        TableStyle,
+    )
 
-    app = create_app()
-    with app.app_context():
-        now = datetime.now()
-        year = now.year
-        month = now.month - 1 if now.month > 1 else 12
-        year = year if now.month > 1 else year - 1
-        month_name = calendar.month_name[month]
-        users = User.query.all()
-        for user in users:
-            # Get all completed reservations for this user in the previous month
-            reservations = Reservation.query.filter(
-                Reservation.user_id == user.id,
-                Reservation.status == "C",
-                extract("year", Reservation.parking_time) == year,
-                extract("month", Reservation.parking_time) == month,
-            ).all()
-            total_bookings = len(reservations)
-            total_spent = sum(r.cost or 0 for r in reservations)
+    now = datetime.now()
+    year = now.year
+    month = now.month - 1 if now.month > 1 else 12
+    year = year if now.month > 1 else year - 1
+    month_name = calendar.month_name[month]
+    month_start = datetime(year, month, 1)
+    month_end = datetime(year + month // 12, month % 12 + 1, 1)
+    sent = 0
+    # one SMTP connection for the whole run (flask-mail reconnects every MAIL_MAX_EMAILS)
+    with mail.connect() as connection:
+        for (user_id, username, email), bookings in monthly_activity(month_start, month_end):
+            total_bookings = len(bookings)
+            total_spent = sum(b.cost or 0 for b in bookings)
             # Most used lot
-            lot_counts = {}
-            for r in reservations:
-                lot = r.spot_id and r.spot and r.spot.parking_lot
-                lot_name = lot.prime_location_name if lot else "Unknown"
-                lot_counts[lot_name] = lot_counts.get(lot_name, 0) + 1
-            most_used_lot = (
-                max(lot_counts, key=lambda k: lot_counts[k]) if lot_counts else "N/A"
-            )
+            most_used_lot = Counter(b.lot_name for b in bookings).most_common(1)[0][0]
 
             # Generate PDF report
             buffer = io.BytesIO()
@@ -125,7 +159,7 @@ def send_monthly_activity_report():
             )
             elements.append(title)
             elements.append(Spacer(1, 12))
-            elements.append(Paragraph(f"Hello {user.username},", styles["Normal"]))
+            elements.append(Paragraph(f"Hello {username},", styles["Normal"]))
             elements.append(
                 Paragraph(
                     f"Here is your parking activity summary for <b>{month_name} {year}</b>:",
@@ -153,44 +187,35 @@ def send_monthly_activity_report():
             )
             elements.append(summary_table)
             elements.append(Spacer(1, 18))
-            if reservations:
-                elements.append(
-                    Paragraph("<b>Booking Details:</b>", styles["Heading4"])
-                )
-                data = [["Date", "Lot", "Spot", "Cost"]]
-                for r in reservations:
-                    data.append(
-                        [
-                            r.parking_time.strftime("%d-%m-%Y")
-                            if r.parking_time
-                            else "-",
-                            r.spot.parking_lot.prime_location_name
-                            if r.spot and r.spot.parking_lot
-                            else "Unknown",
-                            r.spot.spot_no if r.spot else "-",
-                            f"₹{(r.cost or 0):.2f}",
-                        ]
-                    )
-                table = Table(data, hAlign="LEFT")
-                table.setStyle(
-                    TableStyle(
-                        [
-                            ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
-                            ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
-                            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                            ("FONTSIZE", (0, 0), (-1, -1), 9),
-                            ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-                            ("BACKGROUND", (0, 1), (-1, -1), colors.whitesmoke),
-                            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                        ]
-                    )
+            elements.append(
+                Paragraph("<b>Booking Details:</b>", styles["Heading4"])
+            )
+            data = [["Date", "Lot", "Spot", "Cost"]]
+            for b in bookings:
+                data.append(
+                    [
+                        b.parking_time.strftime("%d-%m-%Y"),
+                        b.lot_name,
+                        b.spot_no,
+                        f"₹{(b.cost or 0):.2f}",
+                    ]
                 )
-                elements.append(table)
-            else:
-                elements.append(
-                    Paragraph("No bookings found for this month.", styles["Normal"])
+            table = Table(data, hAlign="LEFT")
+            table.setStyle(
+                TableStyle(
+                    [
+                        ("BACKGROUND", (0, 0), (-1, 0), colors.lightblue),
+                        ("TEXTCOLOR", (0, 0), (-1, 0), colors.black),
+                        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+                        ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+                        ("FONTSIZE", (0, 0), (-1, -1), 9),
+                        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+                        ("BACKGROUND", (0, 1), (-1, -1), colors.whitesmoke),
+                        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                    ]
                 )
+            )
+            elements.append(table)
             elements.append(Spacer(1, 18))
             elements.append(
                 Paragraph("Thank you for using Vehicle Parking App!", styles["Normal"])
@@ -202,61 +227,72 @@ def send_monthly_activity_report():
             # Email with PDF attachment
             html = f"""
                 <h2>Monthly Parking Activity Report - {month_name} {year}</h2>
-                <p>Hello {user.username},</p>
+                <p>Hello {username},</p>
                 <p>Your monthly activity report is attached as a PDF.</p>
                 <p>Thank you for using Vehicle Parking App!</p>
             """
             msg = Message(
                 f"Your {month_name} {year} Parking Activity Report",
-                recipients=[user.email],
+                recipients=[email],
             )
-            msg.body = f"Dear {user.username},\n\nYour monthly activity report is attached as a PDF.\n\nThank you for using Vehicle Parking App!"
+            msg.body = f"Dear {username},\n\nYour monthly activity report is attached as a PDF.\n\nThank you for using Vehicle Parking App!"
             msg.html = html
             msg.attach(
                 f"Parking_Report_{month_name}_{year}.pdf", "application/pdf", pdf
             )
-            mail.send(msg)
+            connection.send(msg)
+            sent += 1
+    return sent
 
 
 # Celery task for sending notifications
-@celery.task(name="jobs.send_notifications")
+@celery.task(base=AppContextTask, name="jobs.send_notifications")
 def send_notifications():
     """
     Celery task: Sends notifications to users who haven't booked a parking spot recently.
     """
-    from app import create_app
+    users = User.query.filter(User.notification_preference.isnot(None)).all()
+    for user in users:
+        seven_days_ago = datetime.now() - timedelta(days=7)
+        recent_reservations = Reservation.query.filter(
+            Reservation.user_id == user.id, Reservation.parking_time > seven_days_ago
+        ).count()
+        if recent_reservations == 0:
+            if (
+                user.last_notified is None
+                or user.last_notified < datetime.now() - timedelta(hours=24)
+            ):
+                if user.notification_preference == "email":
+                    send_email(
+                        user.email,
+                        "Parking Reminder",
+                        "You have not booked a parking spot recently. Please book one if you need it.",
+                    )
+                elif user.notification_preference == "sms":
+                    send_sms(
+                        user.notification_contact,
+                        "Parking Reminder: You have not booked a parking spot recently. Please book one if you need it.",
+                    )
+                elif user.notification_preference == "gchat":
+                    send_gchat(
+                        user.notification_contact,
+                        "Parking Reminder: You have not booked a parking spot recently. Please book one if you need it.",
+                    )
+                user.last_notified = datetime.now()
+                db.session.commit()
 
-    app = create_app()
-    with app.app_context():
-        users = User.query.filter(User.notification_preference.isnot(None)).all()
-        for user in users:
-            seven_days_ago = datetime.now() - timedelta(days=7)
-            recent_reservations = Reservation.query.filter(
-                Reservation.user_id == user.id, Reservation.start_time > seven_days_ago
-            ).count()
-            if recent_reservations == 0:
-                if (
-                    user.last_notified is None
-                    or user.last_notified < datetime.now() - timedelta(hours=24)
-                ):
-                    if user.notification_preference == "email":
-                        send_email(
-                            user.email,
-                            "Parking Reminder",
-                            "You have not booked a parking spot recently. Please book one if you need it.",
-                        )
-                    elif user.notification_preference == "sms":
-                        send_sms(
-                            user.notification_contact,
-                            "Parking Reminder: You have not booked a parking spot recently. Please book one if you need it.",
-                        )
-                    elif user.notification_preference == "gchat":
-                        send_gchat(
-                            user.notification_contact,
-                            "Parking Reminder: You have not booked a parking spot recently. Please book one if you need it.",
-                        )
-                    user.last_notified = datetime.now()
-                    db.session.commit()
+
+# Celery task for keeping spot status in step with booking windows
+@celery.task(base=AppContextTask, name="jobs.sync_spot_occupancy")
+def sync_spot_occupancy():
+    """
+    Celery task: Marks spots occupied when a booking window starts and frees them when it ends.
+    """
+    from services.intervals import sync_spot_occupancy as sync
+
+    occupied, freed = sync()
+    db.session.commit()
+    return {"occupied": occupied, "freed": freed}
 
 
 def send_email(to, subject, body, html=False):
@@ -276,6 +312,8 @@ def send_sms(to, body):
     """
     Sends an SMS.
     """
+    from twilio.rest import Client
+
     account_sid = os.getenv("TWILIO_ACCOUNT_SID")
     auth_token = os.getenv("TWILIO_AUTH_TOKEN")
     from_number = os.getenv("TWILIO_FROM_NUMBER")
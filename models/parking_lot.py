@@ -30,6 +30,14 @@ class ParkingLot(db.Model):  # type: ignore
     max_spots = db.Column(
         db.Integer, nullable=False
     )  # i had a bug where this was 0, so now always check in forms
+    # running totals of free and taken spots, kept in step with parking_spot.status
+    # every status flip updates these in the same transaction (see services/availability.py)
+    # if they ever drift, `flask reconcile-counters` rebuilds them from the spots table
+    available_spots = db.Column(db.Integer, nullable=False, default=0)
+    occupied_spots = db.Column(db.Integer, nullable=False, default=0)
+    # goes up by one on every spot status change or lot edit, never down
+    # the availability endpoints use it for ETags and cache keys
+    version = db.Column(db.Integer, nullable=False, default=0)
     # this connects this table to the parking spot table, so i can get all the spots for a lot
     # this relationship thing, i copied from stackoverflow, not sure if cascade is right, but seems to work
     spots = db.relationship(
@@ -17,14 +17,17 @@ class ParkingSpot(db.Model):  # type: ignore
     # spot_no should be unique per lot, but i think this makes it global unique, hmm, might need to fix
     spot_no = db.Column(db.Integer, nullable=False)
     # this makes sure that each spot number is unique within a lot
+    # lot_id+status is for "free/taken spots in this lot" lookups
     __table_args__ = (
         db.UniqueConstraint("lot_id", "spot_no", name="uix_lotid_spotno"),
+        db.Index("ix_parking_spot_lot_status", "lot_id", "status"),
     )
     # is the spot available or occupied?
-    # status is just 'A' or 'O'
+    # status is just 'A' or 'O', or 'R' for spots retired when a lot shrinks
+    # retired spots stay around for old reservations but never show up as spots
     status = db.Column(
         db.String(1), default="A", nullable=False
-    )  # A = Available, O = Occupied
+    )  # A = Available, O = Occupied, R = Retired
     # this connects this table to the reservation table, so i can see who has reserved this spot
     # reservations relationship, i copied this from flask-sqlalchemy docs, hope it's right
     reservations = db.relationship("Reservation", backref="parking_spot")
@@ -3,6 +3,11 @@ from extensions import db
 # for time stuff
 
 
+# reservation.status codes and the names the api sends back
+STATUS_NAMES = {"U": "upcoming", "A": "active", "C": "completed", "X": "cancelled"}
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+
+
 # this is the data model for a reservation
 class Reservation(db.Model):  # type: ignore
     # the unique id for each reservation, don't touch it
@@ -30,3 +35,15 @@ class Reservation(db.Model):  # type: ignore
     # status: U = upcoming, A = active, C = completed, X = cancelled
     status = db.Column(db.String(1), default="U", nullable=False)
     # removed  'time' field;  parking_time for booking slot
+
+    # every hot query filters on one of these and sorts or ranges on parking_time
+    # user_id+parking_time: dashboards, csv export, monthly report, reminders
+    # status+parking_time: admin feed status filter, revenue, monthly report
+    # spot_id+parking_time: overlap checks for a spot's bookings
+    # parking_time: the admin feed with no filter (sqlite adds id to every index)
+    __table_args__ = (
+        db.Index("ix_reservation_user_time", "user_id", "parking_time"),
+        db.Index("ix_reservation_status_time", "status", "parking_time"),
+        db.Index("ix_reservation_spot_time", "spot_id", "parking_time"),
+        db.Index("ix_reservation_parking_time", "parking_time"),
+    )
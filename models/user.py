@@ -27,6 +27,8 @@ class User(db.Model, UserMixin):  # type: ignore
     notification_preference = db.Column(db.String(10), default="email")
     notification_contact = db.Column(db.String(100))
     last_notified = db.Column(db.DateTime)
+    # bumped whenever roles or active change; tokens carry the value they were issued with
+    auth_version = db.Column(db.Integer, nullable=False, default=0)
     reservations = db.relationship("Reservation", backref="user")
     roles = db.relationship(  # type: ignore[assignment]
         "Role", secondary=roles_users, backref=db.backref("users", lazy="dynamic")
@@ -0,0 +1,2 @@
+# Service layer: query and bookkeeping helpers shared by the API resources,
+# the Celery jobs and the benchmark scripts.
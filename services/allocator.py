@@ -0,0 +1,277 @@
+"""
+Server-side spot allocation for "reserve any spot in this lot".
+
+Each lot has a free list of the spots that are available right now, ordered
+by an allocation policy. Allocating pops the best spot off the list, so two
+requests never get handed the same candidate; the caller still claims it
+with the compare-and-set in ``set_spot_status``, and a candidate that turns
+out to be stale is simply dropped.
+
+``MemoryAllocator`` keeps one heap per lot in the process (tests, a single
+worker). ``RedisAllocator`` keeps a sorted set per lot
+(``parking:lot:<id>:free``) shared by every worker. Both are kept current by
+the committed spot changes (see ``services.events``) and rebuilt from
+``parking_spot`` when a lot is first used, when its list runs dry, and at
+least every ``ALLOCATOR_RECONCILE_SECONDS``.
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+
+
+class LowestNumber:
+    """Fill the lot from spot 1 upwards."""
+
+    needs_history = False
+
+    def score(self, spot_no, last_used):
+        return spot_no
+
+
+class NearestEntrance:
+    """Prefer spots close (by number) to one of the entrance spots."""
+
+    needs_history = False
+
+    def __init__(self, entrances=(1,)):
+        self.entrances = tuple(entrances) or (1,)
+
+    def score(self, spot_no, last_used):
+        return min(abs(spot_no - entrance) for entrance in self.entrances)
+
+
+class SpreadWear:
+    """Hand out the spot that has been free the longest."""
+
+    needs_history = True
+
+    def score(self, spot_no, last_used):
+        return last_used.timestamp() if last_used else 0.0
+
+
+POLICIES = {
+    "lowest_number": LowestNumber,
+    "nearest_entrance": NearestEntrance,
+    "spread_wear": SpreadWear,
+}
+
+
+def make_policy(config):
+    """Build the policy named by ``ALLOCATOR_POLICY``."""
+    name = config.get("ALLOCATOR_POLICY", "lowest_number")
+    if name not in POLICIES:
+        raise ValueError(f"Unknown ALLOCATOR_POLICY {name!r}")
+    if name == "nearest_entrance":
+        return NearestEntrance(config.get("ALLOCATOR_ENTRANCE_SPOTS", (1,)))
+    return POLICIES[name]()
+
+
+def free_spots(lot_id, with_history=False):
+    """``(spot_id, spot_no, last_used)`` for the lot's spots that are free right now."""
+    if not with_history:
+        rows = db.session.execute(
+            select(ParkingSpot.id, ParkingSpot.spot_no)
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == "A")
+        ).all()
+        return [(spot_id, spot_no, None) for spot_id, spot_no in rows]
+    return db.session.execute(
+        select(ParkingSpot.id, ParkingSpot.spot_no, func.max(Reservation.leaving_time))
+        .outerjoin(Reservation, Reservation.spot_id == ParkingSpot.id)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status == "A")
+        .group_by(ParkingSpot.id, ParkingSpot.spot_no)
+    ).all()
+
+
+class MemoryAllocator:
+    """Per-process free lists: one heap per lot with lazy deletion."""
+
+    def __init__(self, policy, reconcile_seconds=30.0):
+        self.policy = policy
+        self.reconcile_seconds = reconcile_seconds
+        self._lock = threading.Lock()
+        self._heaps = {}
+        self._members = {}
+        self._synced = {}
+
+    def _store(self, lot_id, entries):
+        heap = [(score, spot_id) for spot_id, score in entries]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heaps[lot_id] = heap
+            self._members[lot_id] = dict(entries)
+            self._synced[lot_id] = time.monotonic()
+
+    def _is_stale(self, lot_id, min_age):
+        synced = self._synced.get(lot_id)
+        return synced is None or time.monotonic() - synced >= min_age
+
+    def _pop(self, lot_id):
+        with self._lock:
+            heap = self._heaps.get(lot_id, [])
+            members = self._members.get(lot_id, {})
+            while heap:
+                score, spot_id = heapq.heappop(heap)
+                if members.get(spot_id) == score:
+                    del members[spot_id]
+                    return spot_id, score
+        return None
+
+    def _push(self, lot_id, spot_id, score):
+        with self._lock:
+            if lot_id not in self._heaps:
+                return  # not loaded yet; the next reconcile picks it up
+            self._members[lot_id][spot_id] = score
+            heapq.heappush(self._heaps[lot_id], (score, spot_id))
+
+    def _discard(self, lot_id, spot_id):
+        with self._lock:
+            self._members.get(lot_id, {}).pop(spot_id, None)
+
+    def forget(self, lot_id):
+        with self._lock:
+            self._heaps.pop(lot_id, None)
+            self._members.pop(lot_id, None)
+            self._synced.pop(lot_id, None)
+
+    def free_count(self, lot_id):
+        with self._lock:
+            return len(self._members.get(lot_id, ()))
+
+    def reconcile(self, lot_id):
+        """Rebuild the lot's free list from ``parking_spot``."""
+        rows = free_spots(lot_id, with_history=self.policy.needs_history)
+        self._store(lot_id, [
+            (spot_id, self.policy.score(spot_no, last_used)) for spot_id, spot_no, last_used in rows
+        ])
+        return len(rows)
+
+    def release(self, lot_id, spot_id, spot_no):
+        """Put a freed spot back on the list."""
+        self._push(lot_id, spot_id, self.policy.score(spot_no, datetime.now()))
+
+    def allocate(self, lot_id, claim):
+        """
+        Pop candidates until ``claim(spot_id)`` takes one; return its id or None.
+
+        ``claim`` returns True when it took the spot, False when the spot is no
+        longer free (it is dropped from the list) and None when it is free now
+        but can't be used for this booking (it goes back on the list).
+        """
+        if self._is_stale(lot_id, self.reconcile_seconds):
+            self.reconcile(lot_id)
+        skipped = []
+        try:
+            for attempt in range(2):
+                while True:
+                    popped = self._pop(lot_id)
+                    if popped is None:
+                        break
+                    taken = claim(popped[0])
+                    if taken:
+                        return popped[0]
+                    if taken is None:
+                        skipped.append(popped)
+                # ran dry: the list may be behind other workers, check once
+                if attempt or not self._is_stale(lot_id, 1.0):
+                    return None
+                self.reconcile(lot_id)
+            return None
+        finally:
+            for spot_id, score in skipped:
+                self._push(lot_id, spot_id, score)
+
+    def allocate_window(self, index, start, end, claim):
+        """
+        Best spot that ``index`` (a ``LotIntervalIndex``) says is free for the window.
+
+        Bookings that start later can't use the free list, which only holds
+        the spots free right now. Their candidates come from the interval
+        index instead, ranked by the same policy (without wear history for
+        ``SpreadWear``), and are tried in order until ``claim(spot_id)`` is
+        true. Nothing is popped or pushed, so two such requests may pick the
+        same candidate; ``claim`` and the overlap trigger settle it.
+        """
+        ranked = sorted(
+            (self.policy.score(spot_no, None), spot_id)
+            for spot_id, spot_no, is_free in zip(index.spot_ids, index.spot_nos, index.free_flags(start, end))
+            if is_free
+        )
+        for _score, spot_id in ranked:
+            if claim(spot_id):
+                return spot_id
+        return None
+
+    def apply_changes(self, by_lot):
+        """Commit hook: keep the free lists in step with spot status changes."""
+        for lot_id, changes in by_lot.items():
+            for change in changes.values():
+                if change["status"] == "available":
+                    self.release(lot_id, change["id"], change["spot_no"])
+                else:
+                    self._discard(lot_id, change["id"])
+
+
+class RedisAllocator(MemoryAllocator):
+    """Free lists as Redis sorted sets, shared by every worker."""
+
+    def __init__(self, url, policy, reconcile_seconds=30.0):
+        super().__init__(policy, reconcile_seconds=reconcile_seconds)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _key(lot_id):
+        return f"parking:lot:{lot_id}:free"
+
+    def _store(self, lot_id, entries):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key(lot_id))
+        if entries:
+            pipe.zadd(self._key(lot_id), dict(entries))
+        pipe.set(f"{self._key(lot_id)}:synced", time.time())
+        pipe.execute()
+
+    def _is_stale(self, lot_id, min_age):
+        synced = self._redis.get(f"{self._key(lot_id)}:synced")
+        return synced is None or time.time() - float(synced) >= min_age
+
+    def _pop(self, lot_id):
+        popped = self._redis.zpopmin(self._key(lot_id))
+        if not popped:
+            return None
+        member, score = popped[0]
+        return int(member), score
+
+    def _push(self, lot_id, spot_id, score):
+        if self._redis.exists(f"{self._key(lot_id)}:synced"):
+            self._redis.zadd(self._key(lot_id), {spot_id: score})
+
+    def _discard(self, lot_id, spot_id):
+        self._redis.zrem(self._key(lot_id), spot_id)
+
+    def forget(self, lot_id):
+        self._redis.delete(self._key(lot_id), f"{self._key(lot_id)}:synced")
+
+    def free_count(self, lot_id):
+        return self._redis.zcard(self._key(lot_id))
+
+
+def create_allocator(config):
+    """Build the allocator named by ``ALLOCATOR_BACKEND`` ("memory" or "redis")."""
+    kind = config.get("ALLOCATOR_BACKEND", "memory")
+    policy = make_policy(config)
+    reconcile_seconds = config.get("ALLOCATOR_RECONCILE_SECONDS", 30.0)
+    if kind == "redis":
+        return RedisAllocator(config["ALLOCATOR_REDIS_URL"], policy, reconcile_seconds)
+    if kind == "memory":
+        return MemoryAllocator(policy, reconcile_seconds)
+    raise ValueError(f"Unknown ALLOCATOR_BACKEND {kind!r}")
@@ -0,0 +1,125 @@
+"""
+Authorization from JWT claims instead of a user lookup per request.
+
+Tokens carry the user's role names and ``User.auth_version`` at issue time.
+``admin_required`` and the role endpoints read the roles straight from the
+token. Changing a user's roles or ``active`` flag bumps ``auth_version`` in the
+same flush (see ``_bump_changed_users``), and every protected request compares
+the token's stamp with the current one, so older tokens stop working and the
+user logs in again to get the new roles.
+
+The current stamp is cached for ``AUTH_VERSION_CACHE_SECONDS`` and dropped
+once a bump commits. With a shared cache (Redis) that is immediate
+everywhere; with the per-process ``simple`` cache other workers notice within
+the timeout.
+"""
+
+from functools import wraps
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, get_jwt, verify_jwt_in_request
+from sqlalchemy import event, inspect, select
+
+from extensions import cache, db
+from models.user import User
+
+ROLES_CLAIM = "roles"
+VERSION_CLAIM = "ver"
+CHANGED_KEY = "auth_changed_users"
+
+
+def token_claims(user):
+    """The claims ``issue_token`` embeds for ``user``."""
+    return {
+        ROLES_CLAIM: [role.name for role in user.roles],
+        VERSION_CLAIM: user.auth_version or 0,
+    }
+
+
+def issue_token(user):
+    """An access token for ``user`` carrying its roles and auth version."""
+    return create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+
+
+def primary_role(roles):
+    """The role shown to clients: the first one, as before, defaulting to ``user``."""
+    return roles[0] if roles else "user"
+
+
+def current_roles():
+    """Role names from the verified token of the current request."""
+    return get_jwt().get(ROLES_CLAIM, [])
+
+
+def _version_key(user_id):
+    return f"auth:user:{user_id}:version"
+
+
+def stored_auth_version(user_id, session=None):
+    """``User.auth_version`` read from the database, or None if the user is gone or disabled."""
+    row = (session or db.session).execute(
+        select(User.auth_version, User.active).where(User.id == user_id)
+    ).first()
+    return None if row is None or not row.active else row.auth_version or 0
+
+
+def current_auth_version(user_id):
+    """``stored_auth_version`` through the cache."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        stored = stored_auth_version(user_id)
+        # -1 caches "no such user / disabled" so it doesn't hit the database every time
+        version = -1 if stored is None else stored
+        cache.set(key, version, timeout=current_app.config.get("AUTH_VERSION_CACHE_SECONDS", 30))
+    return None if version < 0 else version
+
+
+def stamp_is_current(jwt_payload, version):
+    """Whether a decoded token was issued at the user's current auth ``version``."""
+    # tokens issued before they carried roles have no stamp; the holder logs in again
+    return VERSION_CLAIM in jwt_payload and jwt_payload[VERSION_CLAIM] == version
+
+
+def token_is_stale(jwt_header, jwt_payload):
+    """``token_in_blocklist_loader`` hook: reject tokens minted before the user's last auth change."""
+    if VERSION_CLAIM not in jwt_payload:
+        return True
+    return not stamp_is_current(jwt_payload, current_auth_version(int(jwt_payload["sub"])))
+
+
+def admin_required(f):
+    """Require a valid token whose roles include ``admin``; no database access."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        verify_jwt_in_request()
+        if "admin" not in current_roles():
+            return {"message": "Admin access required"}, 403
+        return f(*args, **kwargs)
+    return decorated
+
+
+def _bump_changed_users(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.roles.history.has_changes() or state.attrs.active.history.has_changes():
+            obj.auth_version = (obj.auth_version or 0) + 1
+            session.info.setdefault(CHANGED_KEY, set()).add(obj.id)
+
+
+def _forget_changed_versions(session):
+    changed = session.info.pop(CHANGED_KEY, None)
+    if changed:
+        cache.delete_many(*(_version_key(user_id) for user_id in changed))
+
+
+def _drop_changed(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(CHANGED_KEY, None)
+
+
+event.listen(db.session, "before_flush", _bump_changed_users)
+event.listen(db.session, "after_commit", _forget_changed_versions)
+event.listen(db.session, "after_soft_rollback", _drop_changed)
@@ -0,0 +1,335 @@
+import base64
+from array import array
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from services.events import record_spot_change
+
+# which ParkingLot counter column tracks spots in each ParkingSpot.status
+STATUS_COUNTERS = {
+    "A": "available_spots",
+    "O": "occupied_spots",
+}
+
+
+def lot_status_counts():
+    """
+    Return ``{lot_id: (available_spots, occupied_spots)}`` computed from ``parking_spot``.
+
+    Uses one grouped aggregate so the cost is a single round trip no matter
+    how many lots or spots exist.
+    """
+    rows = (
+        db.session.query(
+            ParkingSpot.lot_id,
+            func.sum(case((ParkingSpot.status == "A", 1), else_=0)),
+            func.sum(case((ParkingSpot.status == "O", 1), else_=0)),
+        )
+        .group_by(ParkingSpot.lot_id)
+        .all()
+    )
+    return {
+        lot_id: (int(available or 0), int(occupied or 0))
+        for lot_id, available, occupied in rows
+    }
+
+
+def adjust_lot_counters(lot_id, **deltas):
+    """
+    Apply ``deltas`` (e.g. ``available_spots=-1``) to a lot's counters.
+
+    Issued as ``UPDATE ... SET col = col + :delta`` so concurrent writers never
+    overwrite each other, and it joins whatever transaction the session has open.
+    """
+    values = {
+        name: getattr(ParkingLot, name) + delta for name, delta in deltas.items() if delta
+    }
+    if values:
+        db.session.execute(
+            update(ParkingLot).where(ParkingLot.id == lot_id).values(**values)
+        )
+
+
+def set_spot_status(spot, status):
+    """
+    Change ``spot.status`` and move the lot counters in the same transaction.
+
+    The write is a compare-and-set (``UPDATE ... WHERE status = <old>``), so
+    when two transactions race to flip the same spot only one of them moves
+    the counters. Returns False when the spot already had that status or
+    another transaction changed it first (``spot`` is refreshed in that case).
+    """
+    previous = spot.status
+    if previous == status:
+        return False
+    result = db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id == spot.id, ParkingSpot.status == previous)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.refresh(spot)
+        return False
+    set_committed_value(spot, "status", status)
+    deltas = {}
+    if previous in STATUS_COUNTERS:
+        deltas[STATUS_COUNTERS[previous]] = -1
+    if status in STATUS_COUNTERS:
+        deltas[STATUS_COUNTERS[status]] = deltas.get(STATUS_COUNTERS[status], 0) + 1
+    adjust_lot_counters(spot.lot_id, version=1, **deltas)
+    record_spot_change(spot)
+    return True
+
+
+def set_spots_status(spots, status):
+    """
+    Bulk ``set_spot_status``: move every spot in ``spots`` to ``status``.
+
+    Issues one compare-and-set UPDATE per previous status and one counter
+    UPDATE per lot instead of two statements per spot. Returns False when
+    another transaction changed any of the spots first; the caller should
+    roll back.
+    """
+    by_previous = {}
+    for spot in spots:
+        if spot.status != status:
+            by_previous.setdefault(spot.status, []).append(spot)
+    deltas = {}
+    for previous, group in by_previous.items():
+        result = db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.id.in_([spot.id for spot in group]), ParkingSpot.status == previous)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(group):
+            return False
+        for spot in group:
+            lot_deltas = deltas.setdefault(spot.lot_id, {"version": 1})
+            if previous in STATUS_COUNTERS:
+                column = STATUS_COUNTERS[previous]
+                lot_deltas[column] = lot_deltas.get(column, 0) - 1
+            if status in STATUS_COUNTERS:
+                column = STATUS_COUNTERS[status]
+                lot_deltas[column] = lot_deltas.get(column, 0) + 1
+            set_committed_value(spot, "status", status)
+            record_spot_change(spot)
+    for lot_id, lot_deltas in deltas.items():
+        adjust_lot_counters(lot_id, **lot_deltas)
+    return True
+
+
+def bump_lot_version(lot_id):
+    """Mark a lot as changed after editing its details."""
+    adjust_lot_counters(lot_id, version=1)
+
+
+def lots_etag(session=None):
+    """
+    ETag for the lots listing, read from ``parking_lot`` alone.
+
+    Versions only grow, so their sum changes on any spot flip or lot edit,
+    and the count / highest id change when a lot is added or removed.
+    The read helpers here take an optional ``session`` so the async read
+    path (services/fastpath.py) can run them through ``run_sync``.
+    """
+    session = session or db.session
+    count, max_id, total = session.execute(
+        select(
+            func.count(ParkingLot.id),
+            func.coalesce(func.max(ParkingLot.id), 0),
+            func.coalesce(func.sum(ParkingLot.version), 0),
+        )
+    ).one()
+    return f"lots-{count}-{max_id}-{total}"
+
+
+def lot_version(lot_id, session=None):
+    """Current version of one lot, or None if it doesn't exist."""
+    return (session or db.session).execute(
+        select(ParkingLot.version).where(ParkingLot.id == lot_id)
+    ).scalar()
+
+
+def spots_etag(lot_id, version, spot_format):
+    """ETag for one lot's spots listing at ``version``."""
+    return f"lot-{lot_id}-v{version}-{spot_format}"
+
+
+def lots_listing(session=None):
+    """Lots listing body, read from the per-lot counters."""
+    session = session or db.session
+    lots_data = []
+    for lot in session.execute(select(
+        ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.address, ParkingLot.pin_code,
+        ParkingLot.price_per_hr, ParkingLot.available_spots, ParkingLot.occupied_spots,
+    )):
+        available = lot.available_spots
+        total = available + lot.occupied_spots
+        lots_data.append({
+            "id": lot.id,
+            "name": lot.prime_location_name,
+            "address": lot.address,
+            "pin_code": lot.pin_code,
+            "price_per_hr": lot.price_per_hr,
+            "total_spots": total,
+            "available_spots": available,
+            "occupancy": round((total - available) / total * 100, 1) if total > 0 else 0
+        })
+    return {"lots": lots_data}
+
+
+def spots_listing(lot_id, spot_format="json", session=None):
+    """Spots listing body for one lot, or None if the lot doesn't exist."""
+    session = session or db.session
+    lot = session.execute(
+        select(ParkingLot.id, ParkingLot.prime_location_name, ParkingLot.price_per_hr)
+        .where(ParkingLot.id == lot_id)
+    ).first()
+    if not lot:
+        return None
+    lot_data = {
+        "id": lot.id,
+        "name": lot.prime_location_name,
+        "price_per_hr": lot.price_per_hr
+    }
+    if spot_format == "bitmap":
+        return {"lot": lot_data, "format": "bitmap", **spot_bitmap(lot_id, session)}
+    spots = session.execute(
+        select(ParkingSpot.id, ParkingSpot.spot_no, ParkingSpot.status)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R")
+    )
+    return {
+        "lot": lot_data,
+        "spots": [{
+            "id": s.id,
+            "spot_no": s.spot_no,
+            "status": "available" if s.status == "A" else "occupied"
+        } for s in spots]
+    }
+
+
+def reconcile_lot_counters(dry_run=False):
+    """
+    Rebuild every lot's counters from ``parking_spot``.
+
+    Returns a list of ``(lot_id, stored, actual)`` for lots that had drifted;
+    only those rows are rewritten. The caller commits.
+    """
+    actual = lot_status_counts()
+    drifted = []
+    for lot_id, available, occupied in db.session.query(
+        ParkingLot.id, ParkingLot.available_spots, ParkingLot.occupied_spots
+    ):
+        counts = actual.get(lot_id, (0, 0))
+        if (available, occupied) != counts:
+            drifted.append((lot_id, (available, occupied), counts))
+    if drifted and not dry_run:
+        for lot_id, _, (available, occupied) in drifted:
+            db.session.execute(
+                update(ParkingLot)
+                .where(ParkingLot.id == lot_id)
+                .values(
+                    available_spots=available,
+                    occupied_spots=occupied,
+                    version=ParkingLot.version + 1,
+                )
+            )
+    return drifted
+
+
+def pack_bitmap(spot_ids, spot_nos, taken):
+    """
+    Bitmap payload for parallel id / number / taken sequences in spot number order.
+
+    The ``spot_ids``/``spot_nos`` arrays are only included when they can't be
+    derived from the first id and number.
+    """
+    count = len(spot_ids)
+    if not count:
+        return {"count": 0, "first_spot_id": None, "first_spot_no": None,
+                "available": 0, "occupied": ""}
+    bits = bytearray((count + 7) // 8)
+    n_taken = 0
+    for i, is_taken in enumerate(taken):
+        if is_taken:
+            bits[i >> 3] |= 1 << (i & 7)
+            n_taken += 1
+    payload = {
+        "count": count,
+        "first_spot_id": spot_ids[0],
+        "first_spot_no": spot_nos[0],
+        "available": count - n_taken,
+        "occupied": base64.b64encode(bytes(bits)).decode("ascii"),
+    }
+    offset = spot_ids[0] - spot_nos[0]
+    contiguous = spot_nos[-1] - spot_nos[0] == count - 1 and all(
+        spot_id - spot_no == offset for spot_id, spot_no in zip(spot_ids, spot_nos)
+    )
+    if not contiguous:
+        payload["spot_ids"] = list(spot_ids)
+        payload["spot_nos"] = list(spot_nos)
+    return payload
+
+
+def spot_bitmap(lot_id, session=None):
+    """
+    Pack a lot's spot occupancy into a bitset.
+
+    Bit ``i`` (byte ``i >> 3``, bit ``i & 7``, least significant first) is set
+    when the ``i``-th spot, in spot number order, is not available. When spot
+    ids and numbers both run contiguously, which is how lots are created, the
+    i-th spot is ``first_spot_id + i`` / ``first_spot_no + i`` and only the
+    occupied spot numbers are read from the database. Otherwise the explicit
+    ``spot_ids``/``spot_nos`` arrays are included alongside the bits.
+    """
+    session = session or db.session
+    first_no, last_no, count, min_offset, max_offset = session.execute(
+        select(
+            func.min(ParkingSpot.spot_no),
+            func.max(ParkingSpot.spot_no),
+            func.count(ParkingSpot.id),
+            func.min(ParkingSpot.id - ParkingSpot.spot_no),
+            func.max(ParkingSpot.id - ParkingSpot.spot_no),
+        ).where(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R")
+    ).one()
+    if not count:
+        return pack_bitmap([], [], [])
+
+    if min_offset == max_offset and last_no - first_no + 1 == count:
+        bits = bytearray((count + 7) // 8)
+        taken = session.execute(
+            select(ParkingSpot.spot_no).where(
+                ParkingSpot.lot_id == lot_id, ParkingSpot.status == "O"
+            )
+        ).scalars()
+        n_taken = 0
+        for spot_no in taken:
+            i = spot_no - first_no
+            bits[i >> 3] |= 1 << (i & 7)
+            n_taken += 1
+        return {
+            "count": count,
+            "first_spot_id": first_no + min_offset,
+            "first_spot_no": first_no,
+            "available": count - n_taken,
+            "occupied": base64.b64encode(bytes(bits)).decode("ascii"),
+        }
+
+    ids = array("l")
+    numbers = array("l")
+    taken = []
+    for spot_id, spot_no, status in session.execute(
+        select(ParkingSpot.id, ParkingSpot.spot_no, ParkingSpot.status)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R")
+        .order_by(ParkingSpot.spot_no)
+    ):
+        ids.append(spot_id)
+        numbers.append(spot_no)
+        taken.append(status != "A")
+    return pack_bitmap(ids, numbers, taken)
@@ -0,0 +1,159 @@
+"""
+Batch reservations for fleet customers.
+
+``plan_bulk_reservations`` validates a whole list of booking requests and
+picks a spot for each using a few set-based queries (the batch's spots, lots
+and overlapping live bookings, plus one interval index per lot) instead of a
+round of lookups per item. Spots claimed by earlier items in the batch count
+as taken for later ones. Nothing is written; the caller inserts ``rows`` and
+flips ``occupy_spot_ids`` in one transaction.
+"""
+
+from datetime import datetime
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from services.intervals import interval_indexes, live_bookings, parse_client_time
+
+MAX_ITEMS = 500
+MODES = ("atomic", "best_effort")
+
+
+class BulkPlan:
+    def __init__(self, size):
+        self.results = [None] * size
+        self.rows = []
+        self.row_items = []
+        self.occupy_spot_ids = []
+        self.lot_ids = set()
+
+    @property
+    def failed(self):
+        return sum(1 for result in self.results if result["status"] == "error")
+
+    def fail(self, index, errors):
+        self.results[index] = {"index": index, "status": "error", "errors": errors}
+
+
+def _parse_item(item, now):
+    """Return ``(fields, errors)`` for one request item."""
+    if not isinstance(item, dict):
+        return None, {"general": "Each item must be an object"}
+    errors = {}
+    vehicle_number = str(item.get("vehicle_number") or "").strip().upper()
+    if not vehicle_number:
+        errors["vehicle_number"] = "Vehicle number is required"
+    spot_id, lot_id = item.get("spot_id"), item.get("lot_id")
+    for field, value in (("spot_id", spot_id), ("lot_id", lot_id)):
+        # bool is an int subclass; "5" would look like a missing spot
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            errors[field] = "Must be a whole number"
+    if not errors and bool(spot_id) == bool(lot_id):
+        errors["spot_id"] = "Give either a spot_id or a lot_id"
+    try:
+        start = parse_client_time(item["parking_time"]) if item.get("parking_time") else now
+        end = parse_client_time(item["leaving_time"]) if item.get("leaving_time") else None
+    except (TypeError, ValueError):
+        errors["general"] = "Use ISO format for dates"
+    else:
+        if end is None:
+            errors["leaving_time"] = "Leaving time is required"
+        elif end <= max(start, now):
+            errors["leaving_time"] = "Leaving time must be after parking time"
+    if errors:
+        return None, errors
+    return (vehicle_number, spot_id, lot_id, start, end), None
+
+
+def plan_bulk_reservations(user_id, items, policy, now=None):
+    """Validate ``items`` and allocate a spot for every valid one; see the module docstring."""
+    now = now or datetime.now()
+    plan = BulkPlan(len(items))
+    parsed = []
+    for index, item in enumerate(items):
+        fields, errors = _parse_item(item, now)
+        if errors:
+            plan.fail(index, errors)
+        else:
+            parsed.append((index, *fields))
+    if not parsed:
+        return plan
+
+    spot_ids = {spot_id for _, _, spot_id, _, _, _ in parsed if spot_id}
+    spots = {
+        spot.id: spot for spot in ParkingSpot.query.filter(ParkingSpot.id.in_(spot_ids))
+    } if spot_ids else {}
+    lot_ids = {lot_id for _, _, _, lot_id, _, _ in parsed if lot_id}
+    lots = {
+        lot.id: lot for lot in
+        ParkingLot.query.filter(ParkingLot.id.in_(lot_ids | {spot.lot_id for spot in spots.values()}))
+    }
+    window = (min(p[4] for p in parsed), max(p[5] for p in parsed))
+    booked = live_bookings(spot_ids, *window)
+    indexes = {lot_id: interval_indexes.get(lot_id) for lot_id in lot_ids if lot_id in lots}
+    # each lot's spot positions in allocation-policy order, worked out once per batch
+    orders = {
+        lot_id: sorted(range(len(index.spot_ids)), key=lambda i, index=index: (policy.score(index.spot_nos[i], None), i))
+        for lot_id, index in indexes.items()
+    }
+    claimed = {}
+
+    def clashes(spot_id, start, end):
+        taken = claimed.get(spot_id, [])
+        if spot_id in booked:
+            taken = taken + booked[spot_id]
+        return any(taken_from < end and taken_to > start for taken_from, taken_to in taken)
+
+    for index, vehicle_number, spot_id, lot_id, start, end in parsed:
+        if spot_id:
+            spot = spots.get(spot_id)
+            if spot is None:
+                plan.fail(index, {"spot_id": "Parking spot not found"})
+                continue
+            if spot.status not in ("A", "O") or clashes(spot_id, start, end):
+                plan.fail(index, {"spot_id": "Spot is already booked for that time"})
+                continue
+            lot, spot_no = lots[spot.lot_id], spot.spot_no
+        else:
+            lot, lot_index = lots.get(lot_id), indexes.get(lot_id)
+            if lot is None:
+                plan.fail(index, {"lot_id": "Parking lot not found"})
+                continue
+            position = next((
+                i for i in orders[lot_id]
+                if lot_index.is_free(i, start, end) and not clashes(lot_index.spot_ids[i], start, end)
+            ), None)
+            if position is None:
+                plan.fail(index, {"lot_id": "No spots free in this lot for that time"})
+                continue
+            spot_id, spot_no = lot_index.spot_ids[position], lot_index.spot_nos[position]
+
+        claimed.setdefault(spot_id, []).append((start, end))
+        plan.lot_ids.add(lot.id)
+        if start <= now:
+            plan.occupy_spot_ids.append(spot_id)
+        plan.rows.append({
+            "spot_id": spot_id,
+            "user_id": user_id,
+            "vehicle_number": vehicle_number,
+            "parking_time": start,
+            "leaving_time": end,
+            "cost": round((end - start).total_seconds() / 3600 * lot.price_per_hr, 2),
+            "status": "U",
+        })
+        plan.row_items.append(index)
+        plan.results[index] = {
+            "index": index,
+            "status": "created",
+            "reservation": {
+                "lot_id": lot.id,
+                "lot_name": lot.prime_location_name,
+                "spot_id": spot_id,
+                "spot_no": spot_no,
+                "vehicle_number": vehicle_number,
+                "parking_time": start.isoformat(),
+                "leaving_time": end.isoformat(),
+                "estimated_cost": plan.rows[-1]["cost"],
+            },
+        }
+    return plan
@@ -0,0 +1,77 @@
+"""
+Response cache for the parking availability endpoints.
+
+Entries are keyed by the lot version (see ``ParkingLot.version``), which every
+spot flip and lot edit bumps inside its own transaction. The moment a write
+commits, readers compute a new key and miss, so a client never reads stale
+availability after its own reservation, and nothing has to be deleted. A slow
+reader that built its payload from newer data than its key can only ever
+serve data that is fresher than the key claims, never older.
+"""
+
+import os
+import threading
+
+from extensions import cache
+from services.metrics import count_cache
+
+
+class CacheStats:
+    """Per-process hit/miss counters, broken down by cache family."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, family, hit):
+        count_cache(family, hit)
+        with self._lock:
+            counts = self._counts.setdefault(family, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            families = {name: dict(counts) for name, counts in self._counts.items()}
+        for counts in families.values():
+            total = counts["hits"] + counts["misses"]
+            counts["hit_ratio"] = round(counts["hits"] / total, 4) if total else 0.0
+        return {"pid": os.getpid(), "families": families}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def _direct(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def _cached(family, key, build, timeout, call):
+    call = call or _direct
+    payload = call(cache.get, key)
+    if payload is not None:
+        stats.record(family, hit=True)
+        return payload
+    stats.record(family, hit=False)
+    payload = build()
+    if payload is not None:
+        call(cache.set, key, payload, timeout=timeout)
+    return payload
+
+
+def cached_lots(etag, build, timeout=None, call=None):
+    """
+    Return the lots listing payload for ``etag``, calling ``build()`` on a miss.
+
+    ``call(fn, *args, **kwargs)`` runs the cache client's get and set; the
+    async fast path passes one that moves them off the event loop.
+    """
+    return _cached("lots", f"parking:lots:{etag}", build, timeout, call)
+
+
+def cached_spots(lot_id, version, build, variant="json", timeout=None, call=None):
+    """Return a lot's spots payload at ``version``; ``build()`` returning None is not cached."""
+    return _cached("spots", f"parking:lot:{lot_id}:spots:v{version}:{variant}", build, timeout, call)
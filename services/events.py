@@ -0,0 +1,201 @@
+"""
+Spot status change events for the per-lot SSE streams.
+
+``set_spot_status`` queues a delta on the session; once the transaction
+commits, the deltas are published on ``parking:lot:<id>:events`` through the
+app's broker. Each worker process keeps one hub that fans messages out to its
+SSE subscribers. Subscribers are plain asyncio queues on the ASGI event loop,
+so an idle stream costs a coroutine and a queue, not a thread.
+
+Callables in ``app.extensions["spot_change_listeners"]`` get the same
+committed deltas, grouped as ``{lot_id: {spot_id: change}}``.
+
+``InProcessBroker`` delivers within the process (tests, single worker).
+``RedisBroker`` publishes through Redis pub/sub and keeps one pattern
+subscription per worker feeding the local hub, so every gunicorn worker sees
+every lot's changes over a single Redis connection.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from flask import current_app
+from sqlalchemy import event
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PATTERN = "parking:lot:*:events"
+PENDING_KEY = "spot_events"
+RESYNC_KEY = "lot_resyncs"
+
+
+def lot_channel(lot_id):
+    return f"parking:lot:{lot_id}:events"
+
+
+class InProcessBroker:
+    """Fans published messages out to asyncio subscribers in this process."""
+
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        """Hand ``message`` to every local subscriber; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                pass  # the subscriber's loop has shut down
+
+    @staticmethod
+    def _offer(queue, message):
+        if queue.full():
+            # a stalled client: drop the backlog and tell it to refetch
+            while not queue.empty():
+                queue.get_nowait()
+            message = json.dumps({"type": "resync"})
+        queue.put_nowait(message)
+
+    async def start(self):
+        """Hook for brokers that need a listener on the event loop."""
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        await self.start()
+        entry = (asyncio.get_running_loop(), asyncio.Queue(self.max_queue))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subs = self._subscribers.get(channel)
+                if subs is not None:
+                    subs.discard(entry)
+                    if not subs:
+                        del self._subscribers[channel]
+
+
+class RedisBroker(InProcessBroker):
+    """Publishes through Redis; one pattern subscription per process feeds the local hub."""
+
+    def __init__(self, url, max_queue=256):
+        super().__init__(max_queue=max_queue)
+        import redis
+
+        self.url = url
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def publish(self, channel, message):
+        self._redis.publish(channel, message)
+
+    async def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PATTERN)
+                    async for item in pubsub.listen():
+                        if item["type"] == "pmessage":
+                            self.deliver(item["channel"].decode(), item["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event listener lost Redis connection: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+def create_broker(config):
+    """Build the broker named by ``EVENTS_BROKER`` ("memory" or "redis")."""
+    kind = config.get("EVENTS_BROKER", "memory")
+    if kind == "redis":
+        return RedisBroker(config["EVENTS_REDIS_URL"])
+    if kind == "memory":
+        return InProcessBroker()
+    raise ValueError(f"Unknown EVENTS_BROKER {kind!r}")
+
+
+def record_spot_change(spot):
+    """Queue a spot delta to be published once the current transaction commits."""
+    db.session.info.setdefault(PENDING_KEY, []).append(
+        (spot.lot_id, {
+            "id": spot.id,
+            "spot_no": spot.spot_no,
+            "status": "available" if spot.status == "A" else "occupied",
+        })
+    )
+
+
+def record_lot_resync(lot_id):
+    """Tell the lot's subscribers to refetch once the current transaction commits (bulk changes)."""
+    db.session.info.setdefault(RESYNC_KEY, set()).add(lot_id)
+
+
+def _publish_pending(session):
+    resyncs = session.info.pop(RESYNC_KEY, None)
+    if resyncs:
+        _publish({lot_id: {"type": "resync", "lot_id": lot_id} for lot_id in resyncs})
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    by_lot = {}
+    for lot_id, change in pending:
+        by_lot.setdefault(lot_id, {})[change["id"]] = change
+    for listener in current_app.extensions.get("spot_change_listeners", ()):
+        try:
+            listener(by_lot)
+        except Exception as e:
+            logger.error(f"Spot change listener {listener!r} failed: {e}")
+    _publish({
+        lot_id: {"type": "spots", "lot_id": lot_id, "spots": list(changes.values())}
+        for lot_id, changes in by_lot.items()
+        if lot_id not in (resyncs or ())
+    })
+
+
+def _publish(messages):
+    broker = current_app.extensions.get("spot_events")
+    if broker is None:
+        return
+    for lot_id, message in messages.items():
+        try:
+            broker.publish(lot_channel(lot_id), json.dumps(message))
+        except Exception as e:
+            logger.error(f"Could not publish spot events for lot {lot_id}: {e}")
+
+
+def _drop_pending(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+        session.info.pop(RESYNC_KEY, None)
+
+
+event.listen(db.session, "after_commit", _publish_pending)
+event.listen(db.session, "after_soft_rollback", _drop_pending)
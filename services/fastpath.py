@@ -0,0 +1,276 @@
+"""
+Native async handlers for the hot read endpoints.
+
+``asgi.py`` offers every request to ``FastReads`` before handing it to Flask
+through ``WsgiToAsgi`` (which runs each request on a worker thread). It
+serves ``GET /api/health``, ``/api/parking/lots`` and
+``/api/parking/lots/<id>/spots`` (json or bitmap, without a ``from``/``to``
+window) on the event loop, over an async SQLAlchemy engine (``aiosqlite`` or
+``asyncpg``). The queries are the same helpers the Flask resources use, run
+through ``AsyncSession.run_sync``, so bodies, ETags and cache entries match.
+With a networked cache (Redis, memcached) the synchronous cache client is
+called on a worker thread, so a slow cache doesn't stall the loop and every
+other connection it serves (SSE streams included).
+
+Anything it can't answer the ordinary way (missing, invalid or stale token,
+unknown lot, a time window, bad arguments, an error) falls through to the
+Flask route, which gives the usual response. With a read replica configured
+(services/replica.py) the listings are read from its async twin whenever the
+replica router allows it, the same way ``replica_reads`` routes the Flask
+views; the token check always reads the primary. It is off by default
+(``FAST_READS=false``, everything goes to Flask): benchmarks/bench_async_reads.py
+showed it ahead on throughput but behind on p99 with many requests in flight.
+With no async driver installed or an in-memory SQLite database, only
+``/api/health`` is served here.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from flask_jwt_extended import decode_token
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.util import await_only
+from werkzeug.http import parse_etags
+
+from extensions import db
+from services import cache as response_cache
+from services.auth import stamp_is_current, stored_auth_version
+from services.availability import (
+    lot_version,
+    lots_etag,
+    lots_listing,
+    spots_etag,
+    spots_listing,
+)
+from services.metrics import IN_PROGRESS, instrument_engine, observe_request
+from services.querystats import track, untrack
+from services.replica import REPLICA_BIND
+from services.sqlite import configure_sqlite
+from services.streams import bearer_token, request_header
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/api/health"
+LOTS_PATH = re.compile(r"^/api/parking/lots/?$")
+SPOTS_PATH = re.compile(r"^/api/parking/lots/(\d+)/spots/?$")
+# the Flask route templates, so metrics from both paths land in the same series
+LOTS_ROUTE = "/api/parking/lots"
+SPOTS_ROUTE = "/api/parking/lots/<int:lot_id>/spots"
+
+# sync backend -> (async drivername, module that has to be importable)
+ASYNC_DRIVERS = {
+    "sqlite": ("sqlite+aiosqlite", "aiosqlite"),
+    "postgresql": ("postgresql+asyncpg", "asyncpg"),
+}
+
+# CACHE_TYPEs whose client stays in the process; any other one does network I/O
+LOCAL_CACHES = {"null", "nullcache", "simple", "simplecache"}
+
+
+def async_database_url(url):
+    """The async twin of a sync engine URL, or None if there's no usable async driver."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        # a second engine would open a different, empty in-memory database
+        return None
+    drivername, module = ASYNC_DRIVERS[backend]
+    if importlib.util.find_spec(module) is None:
+        return None
+    return url.set(drivername=drivername)
+
+
+def _on_thread(fn, *args, **kwargs):
+    """Inside ``run_sync``: run blocking ``fn`` on a worker thread, serving other requests meanwhile."""
+    return await_only(asyncio.to_thread(fn, *args, **kwargs))
+
+
+class FastReads:
+    """ASGI front for the read endpoints; ``await fast_reads(scope, receive, send)`` is False when Flask should answer."""
+
+    def __init__(self, flask_app, allowed_origins=()):
+        self.flask_app = flask_app
+        self.allowed_origins = set(allowed_origins)
+        self.enabled = flask_app.config.get("FAST_READS", False)
+        cache_type = str(flask_app.config.get("CACHE_TYPE", "null")).rsplit(".", 1)[-1].lower()
+        self.cache_call = None if cache_type in LOCAL_CACHES else _on_thread
+        self.metrics = flask_app.config.get("METRICS_ENABLED", True)
+        self.query_monitor = flask_app.extensions.get("query_monitor")
+        self.engine = self.replica_engine = None
+        self.router = flask_app.extensions.get("replica_router")
+        if self.enabled:
+            with flask_app.app_context():
+                url = async_database_url(db.engine.url)
+                replica_url = async_database_url(db.engines[REPLICA_BIND].url) if self.router else None
+            if url is not None:
+                self.engine = self._create_engine(url, "async")
+                self.sessions = async_sessionmaker(self.engine)
+            if url is not None and replica_url is not None:
+                self.replica_engine = self._create_engine(replica_url, "async_replica")
+                self.router.watch(self.replica_engine.sync_engine)
+                # plain sessions: they're only used inside ``run_sync``, on the primary session's greenlet
+                self.replica_sessions = sessionmaker(self.replica_engine.sync_engine)
+
+    def _create_engine(self, url, name):
+        engine = create_async_engine(url)
+        configure_sqlite(engine.sync_engine, self.flask_app.config, write_lock=False)
+        if self.metrics:
+            instrument_engine(engine.sync_engine, name)
+        if self.query_monitor is not None:
+            self.query_monitor.instrument(engine.sync_engine)
+        return engine
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] != "GET":
+            return False
+        path = scope["path"]
+        if path == HEALTH_PATH:
+            started = time.perf_counter()
+            await self._reply(scope, send, 200, {"status": "healthy", "timestamp": datetime.now().isoformat()})
+            self._observe(HEALTH_PATH, 200, started)
+            return True
+        if self.engine is None:
+            return False
+        if LOTS_PATH.match(path):
+            template, route, args = LOTS_ROUTE, self._lots, ()
+        else:
+            match = SPOTS_PATH.match(path)
+            if not match:
+                return False
+            template, route, args = SPOTS_ROUTE, self._spots, (int(match.group(1)),)
+        started = time.perf_counter()
+        if self.metrics:
+            IN_PROGRESS.inc()
+        try:
+            try:
+                async with self.sessions() as session:
+                    reply = await session.run_sync(self._handle, scope, template, route, *args)
+            except Exception as e:
+                logger.warning(f"Fast read of {path} failed, handing it to Flask: {e}")
+                return False
+            if reply is None:
+                return False
+            status, body, etag = reply
+            await self._reply(scope, send, status, body, etag)
+            self._observe(template, status, started)
+            return True
+        finally:
+            if self.metrics:
+                IN_PROGRESS.dec()
+
+    def _observe(self, template, status, started):
+        if self.metrics:
+            observe_request("GET", template, status, time.perf_counter() - started)
+
+    def _handle(self, session, scope, template, route, *args):
+        """Runs inside ``run_sync``: ``_serve`` with its SQL counted like a Flask request's."""
+        if self.query_monitor is None:
+            return self._serve(session, scope, route, *args)
+        stats, token = track(template)
+        try:
+            reply = self._serve(session, scope, route, *args)
+        finally:
+            untrack(token)
+        if reply is not None:  # otherwise Flask answers it and reports its own
+            self.query_monitor.report(stats)
+        return reply
+
+    def _serve(self, session, scope, route, *args):
+        """Auth check, then the route, with the Flask app context pushed."""
+        with self.flask_app.app_context():
+            user_id = self._authorized(session, scope)
+            if user_id is None:
+                return None
+            if self.replica_engine is not None and self._use_replica(user_id):
+                failures = self.router.failures
+                try:
+                    with self.replica_sessions() as replica:
+                        return route(replica, scope, *args)
+                except Exception:
+                    if self.router.failures == failures:
+                        raise
+            return route(session, scope, *args)
+
+    def _use_replica(self, user_id):
+        # lag and health are read from the router's last background check; the
+        # stickiness lookup is a cache read, so it goes off the loop like the payloads
+        if self.cache_call is None:
+            sticky = self.router.is_sticky(user_id)
+        else:
+            sticky = self.cache_call(self.router.is_sticky, user_id)
+        return self.router.use_replica(user_id, sticky=sticky)
+
+    def _authorized(self, session, scope):
+        """The user id of a valid, current access token, else None."""
+        token = bearer_token(scope)
+        if not token:
+            return None
+        try:
+            claims = decode_token(token)
+        except Exception:
+            return None
+        if claims.get("type") != "access":
+            return None
+        if not stamp_is_current(claims, stored_auth_version(int(claims["sub"]), session)):
+            return None
+        return claims["sub"]
+
+    def _lots(self, session, scope):
+        etag = lots_etag(session)
+        if _if_none_match(scope).contains_weak(etag):
+            return 304, None, etag
+        return 200, response_cache.cached_lots(etag, lambda: lots_listing(session), call=self.cache_call), etag
+
+    def _spots(self, session, scope, lot_id):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if query.get("from") or query.get("to"):
+            return None  # windows read the interval index; Flask has it
+        spot_format = query.get("format", ["json"])[0]
+        if spot_format not in ("json", "bitmap"):
+            return None
+        version = lot_version(lot_id, session)
+        if version is None:
+            return None
+        etag = spots_etag(lot_id, version, spot_format)
+        if _if_none_match(scope).contains_weak(etag):
+            return 304, None, etag
+        payload = response_cache.cached_spots(
+            lot_id, version, lambda: spots_listing(lot_id, spot_format, session), variant=spot_format,
+            call=self.cache_call,
+        )
+        if payload is None:
+            return None
+        return 200, payload, etag
+
+    async def _reply(self, scope, send, status, body, etag=None):
+        headers = []
+        if body is not None:
+            headers.append((b"content-type", b"application/json"))
+        if etag is not None:
+            headers += [(b"etag", f'"{etag}"'.encode()), (b"cache-control", b"no-cache")]
+        origin = request_header(scope, b"origin")
+        if origin in self.allowed_origins:
+            headers += [(b"access-control-allow-origin", origin.encode()),
+                        (b"access-control-allow-credentials", b"true"),
+                        (b"vary", b"Origin")]
+        payload = b"" if body is None else json.dumps(body).encode() + b"\n"
+        headers.append((b"content-length", str(len(payload)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": payload})
+
+    async def aclose(self):
+        for engine in (self.engine, self.replica_engine):
+            if engine is not None:
+                await engine.dispose()
+
+
+def _if_none_match(scope):
+    return parse_etags(request_header(scope, b"if-none-match"))
@@ -0,0 +1,196 @@
+"""
+Time-window availability.
+
+A spot is free for ``[start, end)`` when none of its live bookings (status
+upcoming or active) overlaps that window. ``LotIntervalIndex`` keeps, per
+spot, the live bookings sorted by start together with a running maximum of
+their end times, so "is this spot free for the window" is one binary search:
+the bookings that start before ``end`` are a prefix of the list, and one of
+them overlaps exactly when the largest end time in that prefix is after
+``start``.
+
+Indexes are cached per process and keyed by the lot version, which every
+booking change bumps, so a lot's index is rebuilt only after it changes.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import and_, exists, select
+
+from extensions import db
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from services.availability import lot_version, set_spot_status
+
+# reservation statuses that hold a spot for their window
+LIVE_STATUSES = ("U", "A")
+OPEN_ENDED = datetime.max
+
+
+def parse_client_time(value):
+    """
+    Parse an ISO timestamp from a client into the naive local time the database stores.
+
+    A trailing ``Z`` or explicit offset is converted to local time rather than dropped.
+    Raises ValueError on anything unparseable, including values that aren't strings.
+    """
+    if not isinstance(value, str):
+        # ValueError, not TypeError: callers turn it into a 400 like any bad timestamp
+        raise ValueError(f"expected an ISO timestamp string, got {type(value).__name__}")  # noqa: TRY004
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def live_booking_overlaps(start, end):
+    """SQL condition: a live reservation overlapping ``[start, end)``."""
+    return and_(
+        Reservation.status.in_(LIVE_STATUSES),
+        Reservation.parking_time < end,
+        (Reservation.leaving_time > start) | Reservation.leaving_time.is_(None),
+    )
+
+
+def spot_has_overlap(spot_id, start, end, exclude_reservation_id=None):
+    """True if ``spot_id`` has a live booking overlapping ``[start, end)``."""
+    condition = and_(Reservation.spot_id == spot_id, live_booking_overlaps(start, end))
+    if exclude_reservation_id is not None:
+        condition = and_(condition, Reservation.id != exclude_reservation_id)
+    return db.session.execute(select(exists().where(condition))).scalar()
+
+
+def live_bookings(spot_ids, start, end):
+    """``{spot_id: [(start, end), ...]}`` of live bookings on ``spot_ids`` overlapping ``[start, end)``."""
+    if not spot_ids:
+        return {}
+    rows = db.session.execute(
+        select(Reservation.spot_id, Reservation.parking_time, Reservation.leaving_time)
+        .where(Reservation.spot_id.in_(spot_ids), live_booking_overlaps(start, end))
+    ).all()
+    bookings = {}
+    for spot_id, booked_from, booked_to in rows:
+        bookings.setdefault(spot_id, []).append((booked_from, booked_to or OPEN_ENDED))
+    return bookings
+
+
+class LotIntervalIndex:
+    """Per-spot sorted bookings for one lot; answers window queries in O(log n) per spot."""
+
+    def __init__(self, spots, bookings):
+        # spots: (id, spot_no, status) ordered by spot_no
+        # bookings: (spot_id, start, end) ordered by start
+        self.spot_ids = [spot_id for spot_id, _, _ in spots]
+        self.spot_nos = [spot_no for _, spot_no, _ in spots]
+        self.bookable = [status in ("A", "O") for _, _, status in spots]
+        self._starts = {}
+        self._max_ends = {}
+        for spot_id, start, end in bookings:
+            end = end or OPEN_ENDED
+            starts = self._starts.setdefault(spot_id, [])
+            max_ends = self._max_ends.setdefault(spot_id, [])
+            starts.append(start)
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    @classmethod
+    def load(cls, lot_id, since=None):
+        """Build the index for ``lot_id`` from the database."""
+        since = since or datetime.now()
+        spots = db.session.execute(
+            select(ParkingSpot.id, ParkingSpot.spot_no, ParkingSpot.status)
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R")
+            .order_by(ParkingSpot.spot_no)
+        ).all()
+        bookings = db.session.execute(
+            select(Reservation.spot_id, Reservation.parking_time, Reservation.leaving_time)
+            .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+            .where(
+                ParkingSpot.lot_id == lot_id,
+                Reservation.status.in_(LIVE_STATUSES),
+                (Reservation.leaving_time > since) | Reservation.leaving_time.is_(None),
+            )
+            .order_by(Reservation.parking_time)
+        ).all()
+        return cls(spots, bookings)
+
+    def is_free(self, position, start, end):
+        """Is the spot at ``position`` (spot number order) free for ``[start, end)``?"""
+        if not self.bookable[position]:
+            return False
+        starts = self._starts.get(self.spot_ids[position])
+        if not starts:
+            return True
+        i = bisect_left(starts, end)
+        return i == 0 or self._max_ends[self.spot_ids[position]][i - 1] <= start
+
+    def free_flags(self, start, end):
+        """One bool per spot, in spot number order."""
+        return [self.is_free(i, start, end) for i in range(len(self.spot_ids))]
+
+    def free_spot_ids(self, start, end):
+        return [
+            spot_id
+            for i, spot_id in enumerate(self.spot_ids)
+            if self.is_free(i, start, end)
+        ]
+
+
+class IntervalIndexCache:
+    """Process-wide LRU of ``LotIntervalIndex`` keyed by (lot id, lot version)."""
+
+    def __init__(self, max_lots=256):
+        self.max_lots = max_lots
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, lot_id):
+        """Index for the lot's current version, or None if the lot doesn't exist."""
+        version = lot_version(lot_id)
+        if version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(lot_id)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(lot_id)
+                return entry[1]
+        index = LotIntervalIndex.load(lot_id)
+        with self._lock:
+            self._entries[lot_id] = (version, index)
+            self._entries.move_to_end(lot_id)
+            while len(self._entries) > self.max_lots:
+                self._entries.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+interval_indexes = IntervalIndexCache()
+
+
+def sync_spot_occupancy(now=None):
+    """
+    Flip ``parking_spot.status`` to match the bookings that cover ``now``.
+
+    Reservations only mark a spot occupied immediately when their window has
+    already started; this catches up the ones whose window has since started
+    or ended. Returns ``(occupied, freed)`` counts. The caller commits.
+    """
+    now = now or datetime.now()
+    covering = exists().where(
+        Reservation.spot_id == ParkingSpot.id,
+        Reservation.status.in_(LIVE_STATUSES),
+        Reservation.parking_time <= now,
+        (Reservation.leaving_time > now) | Reservation.leaving_time.is_(None),
+    )
+    to_occupy = ParkingSpot.query.filter(ParkingSpot.status == "A", covering).all()
+    to_free = ParkingSpot.query.filter(ParkingSpot.status == "O", ~covering).all()
+    for spot in to_occupy:
+        set_spot_status(spot, "O")
+    for spot in to_free:
+        set_spot_status(spot, "A")
+    return len(to_occupy), len(to_free)
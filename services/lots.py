@@ -0,0 +1,120 @@
+"""
+Creating and resizing lots' spots with set-based statements.
+
+Spot rows are generated inside the database (``INSERT ... SELECT`` over a
+recursive number series) rather than as one ORM object per spot, so a lot
+of 100k spots costs one statement and no Python-side rows.
+
+Shrinking a lot retires its highest-numbered spots (status ``"R"``) instead
+of deleting them, so past reservations keep their spot. Retired spots are
+left out of listings and availability, and growing the lot again brings
+them back before new numbers are added. The active spots are always
+``1..max_spots``.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, insert, literal, select, update
+
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from services.availability import adjust_lot_counters
+from services.events import record_lot_resync
+from services.intervals import LIVE_STATUSES
+
+RETIRED = "R"
+
+
+class SpotsInUse(Exception):
+    """Raised when a shrink would retire spots that still have live reservations."""
+
+    def __init__(self, spot_nos):
+        super().__init__(f"{len(spot_nos)} spot(s) still have live reservations")
+        self.spot_nos = spot_nos
+
+
+def create_spots(lot_id, first_no, last_no):
+    """Insert available spots ``first_no..last_no`` for a lot in one statement. Returns the count."""
+    if last_no < first_no:
+        return 0
+    numbers = select(literal(first_no).label("n")).cte("numbers", recursive=True)
+    numbers = numbers.union_all(select(numbers.c.n + 1).where(numbers.c.n < last_no))
+    db.session.execute(
+        insert(ParkingSpot).from_select(
+            ["lot_id", "spot_no", "status", "time"],
+            select(literal(lot_id), numbers.c.n, literal("A"), literal(datetime.now())),
+        )
+    )
+    return last_no - first_no + 1
+
+
+def _live_booking(now):
+    return exists().where(
+        Reservation.spot_id == ParkingSpot.id,
+        Reservation.status.in_(LIVE_STATUSES),
+        (Reservation.leaving_time > now) | Reservation.leaving_time.is_(None),
+    )
+
+
+def resize_lot(lot, max_spots, now=None):
+    """
+    Grow or shrink ``lot`` to ``max_spots`` active spots.
+
+    Growing revives retired spots first, then inserts new numbers. Shrinking
+    retires ``max_spots+1..`` and raises ``SpotsInUse`` if any of them has a
+    live reservation. Counters and the version move in the same transaction;
+    returns ``(added, retired)``. The caller commits.
+    """
+    now = now or datetime.now()
+    added = retired = 0
+    deltas = {}
+    if max_spots > lot.max_spots:
+        revived = db.session.execute(
+            update(ParkingSpot)
+            .where(
+                ParkingSpot.lot_id == lot.id,
+                ParkingSpot.status == RETIRED,
+                ParkingSpot.spot_no <= max_spots,
+            )
+            .values(status="A")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        highest = db.session.execute(
+            select(func.coalesce(func.max(ParkingSpot.spot_no), 0)).where(ParkingSpot.lot_id == lot.id)
+        ).scalar()
+        added = revived + create_spots(lot.id, highest + 1, max_spots)
+        deltas["available_spots"] = added
+    elif max_spots < lot.max_spots:
+        beyond = and_(
+            ParkingSpot.lot_id == lot.id,
+            ParkingSpot.spot_no > max_spots,
+            ParkingSpot.status != RETIRED,
+        )
+        in_use = db.session.execute(
+            select(ParkingSpot.spot_no).where(beyond, _live_booking(now)).order_by(ParkingSpot.spot_no)
+        ).scalars().all()
+        if in_use:
+            raise SpotsInUse(in_use)
+        counts = dict(db.session.execute(
+            select(ParkingSpot.status, func.count()).where(beyond).group_by(ParkingSpot.status)
+        ).all())
+        # re-checks for live bookings in the same statement, so one that
+        # slipped in after the read above shows up as a short rowcount
+        retired = db.session.execute(
+            update(ParkingSpot)
+            .where(beyond, ~_live_booking(now))
+            .values(status=RETIRED)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if retired != sum(counts.values()):
+            raise SpotsInUse([])
+        deltas["available_spots"] = -counts.get("A", 0)
+        deltas["occupied_spots"] = -counts.get("O", 0)
+    db.session.execute(
+        update(ParkingLot).where(ParkingLot.id == lot.id).values(max_spots=max_spots)
+    )
+    adjust_lot_counters(lot.id, version=1, **deltas)
+    record_lot_resync(lot.id)
+    return added, retired
@@ -0,0 +1,263 @@
+"""
+Prometheus metrics, served at ``/api/metrics``.
+
+- ``http_request_duration_seconds`` (histogram) and ``http_requests_total``
+  per namespace, route template (``/api/parking/lots/<int:lot_id>/spots``,
+  never the raw path) and method, the counter also per status. Requests the
+  async fast path answers (services/fastpath.py) are recorded under the same
+  templates as the Flask routes they stand in for.
+- ``http_requests_in_progress``.
+- ``db_pool_checkouts_total``, ``db_pool_checked_out``, ``db_pool_overflow``
+  and ``db_pool_wait_seconds`` per engine (``primary``, ``replica``, and
+  ``async`` / ``async_replica`` for the fast path).
+- ``cache_requests_total`` per response cache family and ``hit``/``miss``;
+  the hit ratio is ``rate(...{result="hit"}) / rate(...)``.
+- ``celery_task_duration_seconds`` per task and final state.
+- ``http_request_db_statements`` and ``http_request_db_seconds`` per route,
+  plus ``db_n_plus_one_total`` and ``db_slow_queries_total``, from
+  services/querystats.py.
+
+Gunicorn runs several worker processes and Celery its own, so in production
+each process writes its samples to mmap'd files under
+``PROMETHEUS_MULTIPROC_DIR`` and ``/api/metrics`` (in whichever worker
+answers) adds them up. Gunicorn and the Celery worker each get their own
+directory, since each empties it on start (``gunicorn_config.py`` and
+``worker_init`` below) and their pids can collide across containers; the web
+side lists the worker's in ``PROMETHEUS_SCRAPE_DIRS`` (comma-separated) so a
+scrape sums both. Without ``PROMETHEUS_MULTIPROC_DIR`` every process reports
+only its own numbers, which is fine for ``flask run`` and tests.
+
+Recording is a dict lookup and a couple of increments per request; label
+children are cached so the request path never builds label sets.
+"""
+
+import glob
+import os
+import time
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+)
+from flask import request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+# this process group's directory plus the other groups' a scrape sums in
+SCRAPE_DIRS = [MULTIPROC_DIR] if MULTIPROC_DIR else []
+SCRAPE_DIRS += [path.strip() for path in os.environ.get("PROMETHEUS_SCRAPE_DIRS", "").split(",") if path.strip()]
+SCRAPE_DIRS = list(dict.fromkeys(SCRAPE_DIRS))
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency", ["namespace", "route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter("http_requests", "Requests answered", ["namespace", "route", "method", "status"])
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled", multiprocess_mode="livesum")
+
+POOL_CHECKOUTS = Counter("db_pool_checkouts", "Connections handed out by the pool", ["engine"])
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", ["engine"], multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size", ["engine"], multiprocess_mode="livesum")
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent getting a connection from the pool", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements run per request", ["namespace", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", ["namespace", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+N_PLUS_ONE = Counter("db_n_plus_one", "Requests that repeated one SELECT shape past the threshold", ["namespace", "route"])
+SLOW_QUERIES = Counter("db_slow_queries", "Statements slower than SLOW_QUERY_MS", ["namespace", "route"])
+
+CACHE_REQUESTS = Counter("cache_requests", "Response cache lookups", ["family", "result"])
+
+TASK_SECONDS = Histogram(
+    "celery_task_duration_seconds", "Celery task run time", ["task", "state"],
+    buckets=(0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+STARTED_KEY = "metrics.started"
+UNMATCHED = "<unmatched>"  # 404s and the like, so junk paths don't each get a series
+
+_timers = {}
+_counters = {}
+_cache_counters = {}
+_query_children = {}
+_task_started = {}
+
+
+def namespace_of(route):
+    """``parking`` for ``/api/parking/...``; ``other`` outside the API."""
+    parts = route.split("/", 3)
+    return parts[2] if len(parts) > 2 and parts[1] == "api" else "other"
+
+
+def observe_request(method, route, status, seconds):
+    """Record one answered request under its route template."""
+    timer = _timers.get((route, method))
+    if timer is None:
+        timer = _timers[(route, method)] = REQUEST_SECONDS.labels(namespace_of(route), route, method)
+    timer.observe(seconds)
+    counter = _counters.get((route, method, status))
+    if counter is None:
+        counter = _counters[(route, method, status)] = REQUESTS.labels(namespace_of(route), route, method, str(status))
+    counter.inc()
+
+
+def observe_queries(route, statements, seconds, n_plus_one, slow):
+    """Record one request's SQL statement count and time (services/querystats.py)."""
+    children = _query_children.get(route)
+    if children is None:
+        labels = (namespace_of(route), route)
+        children = _query_children[route] = (
+            DB_STATEMENTS.labels(*labels), DB_SECONDS.labels(*labels),
+            N_PLUS_ONE.labels(*labels), SLOW_QUERIES.labels(*labels),
+        )
+    statements_hist, seconds_hist, n_plus_one_count, slow_count = children
+    statements_hist.observe(statements)
+    seconds_hist.observe(seconds)
+    if n_plus_one:
+        n_plus_one_count.inc()
+    if slow:
+        slow_count.inc(slow)
+
+
+def count_cache(family, hit):
+    counter = _cache_counters.get((family, hit))
+    if counter is None:
+        counter = _cache_counters[(family, hit)] = CACHE_REQUESTS.labels(family, "hit" if hit else "miss")
+    counter.inc()
+
+
+def _request_started():
+    request.environ[STARTED_KEY] = time.perf_counter()
+    IN_PROGRESS.inc()
+
+
+def _request_answered(response):
+    started = request.environ.get(STARTED_KEY)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED
+        observe_request(request.method, route, response.status_code, time.perf_counter() - started)
+    return response
+
+
+def _request_done(exc):
+    if request.environ.pop(STARTED_KEY, None) is not None:
+        IN_PROGRESS.dec()
+
+
+def instrument_engine(engine, name):
+    """Pool checkout counts, connections in use and overflow, and time spent waiting for a connection."""
+    checkouts, checked_out = POOL_CHECKOUTS.labels(name), POOL_CHECKED_OUT.labels(name)
+    overflow, wait = POOL_OVERFLOW.labels(name), POOL_WAIT.labels(name)
+
+    def pool_overflow():
+        if hasattr(engine.pool, "overflow"):  # QueuePool; SQLite memory/static pools have none
+            overflow.set(max(engine.pool.overflow(), 0))
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+        checked_out.inc()
+        pool_overflow()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+        pool_overflow()
+
+    def time_connects(pool):
+        # the pool has no "before checkout" event, so time the call the engine makes
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                wait.observe(time.perf_counter() - started)
+
+        pool.connect = timed_connect
+
+    time_connects(engine.pool)
+    # dispose() swaps in a fresh pool
+    event.listen(engine, "engine_disposed", lambda engine: time_connects(engine.pool))
+
+
+def init_metrics(app, engines):
+    """Record request metrics for ``app`` and pool metrics for ``engines`` (``{name: engine}``)."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    # first, so the time includes the other hooks (token checks and so on)
+    app.before_request_funcs.setdefault(None, []).insert(0, _request_started)
+    app.after_request(_request_answered)
+    app.teardown_request(_request_done)
+    for name, engine in engines.items():
+        instrument_engine(engine, name)
+
+
+class _ScrapeDirsCollector:
+    """``MultiProcessCollector`` over the sample files of every directory in ``SCRAPE_DIRS``."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def collect(self):
+        files = [f for path in self.paths for f in glob.glob(os.path.join(path, "*.db"))]
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def render_metrics():
+    """``(body, content type)`` for a scrape, summed over every process when running multiprocess."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        registry.register(_ScrapeDirsCollector(SCRAPE_DIRS))
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+@task_prerun.connect
+def _task_started_at(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@worker_init.connect
+def _worker_starting(**kwargs):
+    # the worker's own directory: start it empty, as gunicorn does its own
+    if MULTIPROC_DIR:
+        for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+
+@worker_process_shutdown.connect
+def _worker_process_gone(**kwargs):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,52 @@
+"""
+Keyset ("seek") pagination.
+
+A cursor is the sort key of the last row on the previous page, so every page
+is an index range scan starting right where the last one ended, no matter how
+deep the client has paged. OFFSET would read and discard every earlier row.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(parking_time, row_id):
+    raw = json.dumps([parking_time.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parking_time, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(parking_time), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def seek_page(query, time_column, id_column, cursor, limit):
+    """
+    Return ``(rows, next_cursor)`` for ``query`` ordered newest first by (time, id).
+
+    ``query`` must select the time and id columns as ``parking_time`` and ``id``.
+    """
+    if cursor:
+        parking_time, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(time_column, id_column) < tuple_(parking_time, row_id))
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].parking_time, rows[-1].id)
+    return rows, next_cursor
+
+
+def page_limit(value, default=50, maximum=500):
+    """Parse a ``limit`` query parameter, clamped to ``1..maximum``."""
+    if value in (None, ""):
+        return default
+    return max(1, min(int(value), maximum))
@@ -0,0 +1,118 @@
+"""
+Password hashing on a small bounded pool, off the request threads' CPU budget.
+
+Login and registration hand their hashing to ``HashingPool`` instead of
+running it inline. At most ``workers`` hashes run at once per process, at
+most ``max_queue`` more wait, and anything beyond that fails fast with
+``HashingBusy`` (the endpoints answer 503 with ``Retry-After``), so a login
+burst can't take every CPU away from the read endpoints. argon2-cffi and
+hashlib's pbkdf2 both release the GIL, so plain threads are enough.
+
+New hashes are argon2id with the ``ARGON2_*`` parameters. Verifying an older
+werkzeug ``pbkdf2:sha256`` hash, or an argon2 hash with outdated parameters,
+returns a fresh hash to store, so accounts migrate as their owners log in.
+``workers=0`` hashes inline on the caller's thread (tests, CLI, benchmarks).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool and its queue are full, or a hash waited too long."""
+
+
+class HashingPool:
+    def __init__(self, workers=2, max_queue=8, timeout=10.0, hasher=None):
+        self.hasher = hasher or PasswordHasher()
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash") if workers else None
+        self._slots = threading.BoundedSemaphore(workers + max_queue) if workers else None
+        self._lock = threading.Lock()
+        self._counts = {"hashed": 0, "rejected": 0, "rehashed": 0}
+        self._in_flight = 0
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"workers": self.workers, "in_flight": self._in_flight, **self._counts}
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def run(self, fn, *args):
+        """Run ``fn(*args)`` on the pool and wait for it; raises ``HashingBusy`` when full."""
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise HashingBusy("password hashing pool is saturated")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            self._count("rejected")
+            raise HashingBusy("password hashing took too long") from None
+
+    def hash(self, password):
+        """A new argon2id hash of ``password``."""
+        self._count("hashed")
+        return self.run(self.hasher.hash, password)
+
+    def verify(self, stored, password):
+        """
+        Check ``password`` against ``stored``.
+
+        Returns ``(ok, new_hash)``; ``new_hash`` is set when the stored hash
+        should be replaced (legacy scheme or outdated argon2 parameters).
+        """
+        ok, new_hash = self.run(self._verify, stored, password)
+        if new_hash:
+            self._count("rehashed")
+        return ok, new_hash
+
+    def _verify(self, stored, password):
+        if stored.startswith("$argon2"):
+            try:
+                self.hasher.verify(stored, password)
+            except (VerificationError, InvalidHashError):
+                return False, None
+            return True, self.hasher.hash(password) if self.hasher.check_needs_rehash(stored) else None
+        try:
+            ok = check_password_hash(stored, password)
+        except ValueError:
+            ok = False
+        return ok, self.hasher.hash(password) if ok else None
+
+
+def create_hashing_pool(config):
+    """Build the pool and argon2 parameters from ``PASSWORD_HASH_*`` and ``ARGON2_*`` settings."""
+    hasher = PasswordHasher(
+        time_cost=config.get("ARGON2_TIME_COST", 2),
+        memory_cost=config.get("ARGON2_MEMORY_COST", 19456),
+        parallelism=config.get("ARGON2_PARALLELISM", 1),
+    )
+    return HashingPool(
+        workers=config.get("PASSWORD_HASH_WORKERS", 2),
+        max_queue=config.get("PASSWORD_HASH_QUEUE", 8),
+        timeout=config.get("PASSWORD_HASH_TIMEOUT", 10.0),
+        hasher=hasher,
+    )
@@ -0,0 +1,188 @@
+"""
+Per-request SQL statistics: statement count and DB time, slow-query log, N+1 detection.
+
+``QueryMonitor`` listens on the engines and adds every statement to the
+``QueryStats`` collectors active in the current context: one per Flask
+request (``init_query_stats``), one per fast-path read (services/fastpath.py),
+and any ``max_queries`` block in the tests. Statements are grouped by shape,
+their SQL with literals and bound parameters replaced by ``?`` and ``IN``
+lists collapsed.
+
+When a request finishes it logs a warning if it ran more than
+``QUERY_BUDGET`` statements, or ran one SELECT shape at least
+``N_PLUS_ONE_THRESHOLD`` times (the usual sign of a lookup per row in a
+loop). Any statement slower than ``SLOW_QUERY_MS`` is logged with its shape
+and route as it finishes. With metrics on, the per-request numbers also go to
+Prometheus (services/metrics.py).
+
+``max_queries(n)`` is the test helper: a context manager or decorator that
+fails when the code inside runs more than ``n`` statements, listing them.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from functools import lru_cache
+
+from flask import request
+from sqlalchemy import event
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# the collectors statements are added to; a tuple so nested blocks each get their own
+_collectors = ContextVar("query_collectors", default=())
+
+STARTED_KEY = "query_started"
+STATS_KEY = "querystats"
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|\$\d+|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement):
+    """The statement's shape: literals and parameters as ``?``, ``IN`` lists as ``(?...)``, one line."""
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Statements seen in one request (or test block)."""
+
+    def __init__(self, route=None):
+        self.route = route
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.slow = 0
+
+    def record(self, shape, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[shape] += 1
+
+    def repeated(self, threshold):
+        """``(shape, times)`` for every SELECT shape run at least ``threshold`` times, most first."""
+        # repeated INSERTs are a batching question (SQLite returns ids row by row), not N+1 lookups
+        return [
+            (shape, n) for shape, n in self.shapes.most_common()
+            if n >= threshold and shape.startswith(("SELECT", "WITH"))
+        ]
+
+
+def track(route=None):
+    """Start collecting into a new ``QueryStats``; returns ``(stats, token)`` for ``untrack``."""
+    stats = QueryStats(route)
+    return stats, _collectors.set(_collectors.get() + (stats,))
+
+
+def untrack(token):
+    _collectors.reset(token)
+
+
+class QueryMonitor:
+    """Engine listeners plus the per-request report, with one app's settings."""
+
+    def __init__(self, slow_ms=200.0, budget=50, n_plus_one=5, record_metrics=True):
+        self.slow_seconds = slow_ms / 1000
+        self.budget = budget
+        self.n_plus_one = n_plus_one
+        self.record_metrics = record_metrics
+
+    def instrument(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._failed)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(STARTED_KEY, []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info[STARTED_KEY].pop()
+        collectors = _collectors.get()
+        elapsed = time.perf_counter() - started
+        if not collectors and elapsed < self.slow_seconds:
+            return
+        shape = normalize_sql(statement)
+        for stats in collectors:
+            stats.record(shape, elapsed)
+        if elapsed >= self.slow_seconds:
+            route = collectors[0].route if collectors else None
+            for stats in collectors:
+                stats.slow += 1
+            logger.warning(f"Slow query ({elapsed * 1000:.0f} ms) on {route or '-'}: {shape}")
+
+    def _failed(self, context):
+        if context.connection is not None and context.connection.info.get(STARTED_KEY):
+            context.connection.info[STARTED_KEY].pop()
+
+    def report(self, stats):
+        """Log budget overruns and N+1 shapes for a finished request, and record its metrics."""
+        route = stats.route or "-"
+        if stats.count > self.budget:
+            logger.warning(
+                f"{route} ran {stats.count} statements ({stats.seconds * 1000:.1f} ms), budget is {self.budget}"
+            )
+        repeated = stats.repeated(self.n_plus_one)
+        for shape, times in repeated:
+            logger.warning(f"Possible N+1 on {route}: {times}x {shape}")
+        if self.record_metrics and stats.route:
+            metrics.observe_queries(stats.route, stats.count, stats.seconds, len(repeated), stats.slow)
+
+
+def init_query_stats(app, engines):
+    """Collect and report query stats for every request to ``app``, on ``engines``."""
+    if not app.config.get("QUERY_STATS_ENABLED", True):
+        return None
+    monitor = QueryMonitor(
+        slow_ms=app.config.get("SLOW_QUERY_MS", 200),
+        budget=app.config.get("QUERY_BUDGET", 50),
+        n_plus_one=app.config.get("N_PLUS_ONE_THRESHOLD", 5),
+        record_metrics=app.config.get("METRICS_ENABLED", True),
+    )
+    for engine in engines:
+        monitor.instrument(engine)
+
+    @app.before_request
+    def start_query_stats():
+        route = request.url_rule.rule if request.url_rule is not None else None
+        request.environ[STATS_KEY] = track(route)
+
+    @app.teardown_request
+    def report_query_stats(exc):
+        tracked = request.environ.pop(STATS_KEY, None)
+        if tracked is not None:
+            stats, token = tracked
+            untrack(token)
+            monitor.report(stats)
+
+    return monitor
+
+
+class _QueryCeiling(ContextDecorator):
+    def __init__(self, limit):
+        self.limit = limit
+        self.stats = None
+
+    def __enter__(self):
+        self.stats, self._token = track()
+        return self.stats
+
+    def __exit__(self, exc_type, exc, tb):
+        untrack(self._token)
+        if exc_type is None and self.stats.count > self.limit:
+            shapes = "\n".join(f"  {n}x {shape}" for shape, n in self.stats.shapes.most_common())
+            raise AssertionError(f"{self.stats.count} statements, ceiling is {self.limit}:\n{shapes}")
+        return False
+
+
+def max_queries(limit):
+    """Fail the block (or decorated test) if it runs more than ``limit`` SQL statements."""
+    return _QueryCeiling(limit)
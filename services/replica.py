@@ -0,0 +1,273 @@
+"""
+Routing read-only requests to a read replica.
+
+With ``REPLICA_DATABASE_URI`` set, the replica is a Flask-SQLAlchemy bind
+(``db.engines["replica"]``) and views wrapped in ``replica_reads`` run their
+queries against it through ``RoutingSession``. Flushes and INSERT/UPDATE/
+DELETE statements always go to the primary, and so does the token check that
+runs before the view.
+
+Reads stay on the primary when:
+
+- the user committed a write in the last ``REPLICA_STICKY_SECONDS``, so they
+  see their own booking right away (kept in the shared cache, so with the
+  per-process ``simple`` cache it only holds within one worker);
+- the replica is more than ``REPLICA_MAX_LAG_SECONDS`` behind. Every
+  ``REPLICA_CHECK_SECONDS`` a background thread reads a cheap watermark (sum
+  of lot versions, newest reservation and user ids) from both databases; the
+  lag is how long ago the primary first showed a watermark the replica hasn't
+  reached yet. Requests only read the last result, so the check never runs
+  on a request's (or the event loop's) time, and the replica isn't used
+  until the first check has passed;
+- the replica is down or a query on it failed. It is left alone for
+  ``REPLICA_RETRY_SECONDS``, and a view that failed on it is rerun on the
+  primary.
+
+Replication itself is the database's job (Postgres streaming replication,
+litestream, ...). For trying it out with two SQLite files, ``flask
+sync-replica`` copies the primary into the replica.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import current_app, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import column, event, func, select, table
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = "replica"
+ROUTE_KEY = "replica_engine"
+WROTE_KEY = "wrote_to_primary"
+
+# changes with every booking, cancellation, lot edit and sign-up
+WATERMARK = select(
+    select(func.coalesce(func.sum(column("version")), 0)).select_from(table("parking_lot")).scalar_subquery(),
+    select(func.coalesce(func.max(column("id")), 0)).select_from(table("reservation")).scalar_subquery(),
+    select(func.coalesce(func.max(column("id")), 0)).select_from(table("user")).scalar_subquery(),
+)
+
+
+class RoutingSession(Session):
+    """``db.session`` class: reads go to the engine a ``replica_reads`` view put in ``info``."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        writing = self._flushing or getattr(clause, "is_dml", False)
+        if writing:
+            self.info[WROTE_KEY] = True
+        elif bind is None and self.info.get(ROUTE_KEY) is not None:
+            return self.info[ROUTE_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _writer_identity():
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:  # no token on this request (login, register)
+        return None
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_writer(session):
+    if not session.info.pop(WROTE_KEY, False):
+        return
+    router = current_app.extensions.get("replica_router")
+    user_id = _writer_identity()
+    if router is not None and user_id is not None:
+        router.stick(user_id)
+
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def _forget_write(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(WROTE_KEY, None)
+
+
+class ReplicaRouter:
+    """Decides per request whether the replica may answer, and tracks its lag and health."""
+
+    def __init__(self, primary, replica, cache, sticky_seconds=5, max_lag_seconds=2.0,
+                 check_seconds=1.0, retry_seconds=10.0):
+        self.primary = primary
+        self.replica = replica
+        self.cache = cache
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self.lag = 0.0
+        self.failures = 0
+        self._healthy = False
+        self._down = False
+        self._next_check = 0.0
+        self._samples = deque(maxlen=1000)  # (seen at, primary watermark) the replica hasn't reached
+        self._checking = threading.Lock()
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._counts = {"replica": 0, "sticky": 0, "fallback": 0}
+        self.watch(replica)
+
+    def watch(self, engine):
+        """Mark the replica down as soon as a query on ``engine`` loses its connection or fails."""
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.mark_down(context.original_exception)
+
+    def mark_down(self, error):
+        with self._lock:
+            self.failures += 1
+            was_down, self._down = self._down, True
+            self._healthy = False
+            self._samples.clear()
+            self._next_check = time.monotonic() + self.retry_seconds
+        if not was_down:
+            logger.warning(f"Read replica unavailable, reading from the primary for {self.retry_seconds}s: {error}")
+
+    def _check(self, now):
+        try:
+            with self.primary.connect() as conn:
+                primary_mark = tuple(conn.execute(WATERMARK).one())
+            with self.replica.connect() as conn:
+                replica_mark = tuple(conn.execute(WATERMARK).one())
+        except Exception as e:
+            self.mark_down(e)
+            return
+        with self._lock:
+            self._down = False
+            if replica_mark == primary_mark:
+                self._samples.clear()
+            else:
+                self._samples.append((now, primary_mark))
+                while self._samples and all(r >= p for r, p in zip(replica_mark, self._samples[0][1])):
+                    self._samples.popleft()
+            self.lag = now - self._samples[0][0] if self._samples else 0.0
+            if self._healthy and self.lag > self.max_lag:
+                logger.warning(f"Read replica is {self.lag:.1f}s behind, reading from the primary")
+            self._healthy = self.lag <= self.max_lag
+            self._next_check = now + self.check_seconds
+
+    def refresh(self):
+        """Check the replica's lag and health now (blocking: it queries both databases)."""
+        with self._checking:
+            self._check(time.monotonic())
+
+    def _refresh_forever(self):
+        while True:
+            # mark_down pushes _next_check out to the retry time
+            time.sleep(max(self._next_check - time.monotonic(), 0.01))
+            if time.monotonic() >= self._next_check:
+                self.refresh()
+
+    def _ensure_refresher(self):
+        # started lazily, so each forked worker gets its own thread
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._refresh_forever, name="replica-lag", daemon=True)
+                self._refresher.start()
+
+    def available(self):
+        """Whether the replica is up and close enough behind, as of the last background check."""
+        self._ensure_refresher()
+        return self._healthy
+
+    def _sticky_key(self, user_id):
+        return f"replica:sticky:{user_id}"
+
+    def stick(self, user_id):
+        """Keep ``user_id`` on the primary for ``sticky_seconds`` after a write."""
+        self.cache.set(self._sticky_key(user_id), 1, timeout=self.sticky_seconds)
+
+    def is_sticky(self, user_id):
+        """Whether ``user_id`` wrote in the last ``sticky_seconds``; a cache read."""
+        return user_id is not None and bool(self.cache.get(self._sticky_key(user_id)))
+
+    def use_replica(self, user_id, sticky=None):
+        """Whether ``user_id``'s reads may go to the replica right now; pass ``sticky`` if already looked up."""
+        if sticky is None:
+            sticky = self.is_sticky(user_id)
+        if sticky:
+            outcome = "sticky"
+        elif self.available():
+            outcome = "replica"
+        else:
+            outcome = "fallback"
+        with self._lock:
+            self._counts[outcome] += 1
+        return outcome == "replica"
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "healthy": self._healthy,
+                "lag_seconds": round(self.lag, 3),
+                "failures": self.failures,
+                "reads": dict(self._counts),
+            }
+
+
+def replica_reads(view):
+    """
+    Run a read-only view against the replica when the router allows it.
+
+    Goes under ``jwt_required`` / ``admin_required``, which check the token
+    against the primary first. If the replica fails during the view, the view
+    runs again on the primary.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        router = current_app.extensions.get("replica_router")
+        if router is None or not router.use_replica(get_jwt_identity()):
+            return view(*args, **kwargs)
+        session = current_app.extensions["sqlalchemy"].session
+        failures = router.failures
+        session.info[ROUTE_KEY] = router.replica
+        try:
+            result = view(*args, **kwargs)
+        except Exception:
+            if router.failures == failures:
+                raise
+            result = None
+        finally:
+            session.info.pop(ROUTE_KEY, None)
+        if router.failures != failures:
+            session.rollback()
+            return view(*args, **kwargs)
+        return result
+    return decorated
+
+
+def create_replica_router(config, engines, cache):
+    """A ``ReplicaRouter`` over the ``replica`` bind, or None when no replica is configured."""
+    if REPLICA_BIND not in engines:
+        return None
+    return ReplicaRouter(
+        engines[None],
+        engines[REPLICA_BIND],
+        cache,
+        sticky_seconds=config.get("REPLICA_STICKY_SECONDS", 5),
+        max_lag_seconds=config.get("REPLICA_MAX_LAG_SECONDS", 2.0),
+        check_seconds=config.get("REPLICA_CHECK_SECONDS", 1.0),
+        retry_seconds=config.get("REPLICA_RETRY_SECONDS", 10.0),
+    )
+
+
+def copy_sqlite_database(source, target):
+    """Copy the SQLite database behind engine ``source`` over ``target``'s, with the backup API."""
+    src, dst = source.raw_connection(), target.raw_connection()
+    try:
+        src.driver_connection.backup(dst.driver_connection)
+    finally:
+        dst.close()
+        src.close()
@@ -0,0 +1,137 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+# columns added after the first release; create_all() won't add these to
+# existing tables, so upgrade_schema() adds them with ALTER TABLE.
+ADDED_COLUMNS = {
+    "parking_lot": [
+        ("available_spots", "INTEGER NOT NULL DEFAULT 0"),
+        ("occupied_spots", "INTEGER NOT NULL DEFAULT 0"),
+        ("version", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+    "user": [
+        ("auth_version", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+}
+
+# at most one live (upcoming/active) reservation per spot and time window,
+# enforced by the database so two workers can't both book the same slot.
+# sqlite gets triggers; postgres gets an exclusion constraint on the range.
+_SQLITE_OVERLAP = """
+    SELECT RAISE(ABORT, 'reservation overlaps a live booking for this spot')
+    WHERE EXISTS (
+        SELECT 1 FROM reservation r
+        WHERE r.spot_id = NEW.spot_id
+          AND r.id IS NOT NEW.id
+          AND r.status IN ('U', 'A')
+          AND r.parking_time < COALESCE(NEW.leaving_time, '9999-12-31')
+          AND (r.leaving_time IS NULL OR r.leaving_time > NEW.parking_time)
+    );
+"""
+BOOKING_GUARD = {
+    "sqlite": [
+        (
+            "CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_insert "
+            "BEFORE INSERT ON reservation WHEN NEW.status IN ('U', 'A') "
+            f"BEGIN {_SQLITE_OVERLAP} END"
+        ),
+        (
+            "CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_update "
+            "BEFORE UPDATE OF spot_id, parking_time, leaving_time, status ON reservation "
+            "WHEN NEW.status IN ('U', 'A') "
+            f"BEGIN {_SQLITE_OVERLAP} END"
+        ),
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        (
+            "ALTER TABLE reservation ADD CONSTRAINT reservation_no_overlap EXCLUDE USING gist ("
+            "spot_id WITH =, "
+            "tsrange(parking_time, COALESCE(leaving_time, 'infinity'::timestamp)) WITH &&"
+            ") WHERE (status IN ('U', 'A'))"
+        ),
+    ],
+}
+BOOKING_GUARD_NAMES = {
+    "sqlite": ("reservation_no_overlap_insert", "sqlite_master", "name"),
+    "postgresql": ("reservation_no_overlap", "pg_constraint", "conname"),
+}
+
+
+def install_booking_guard():
+    """
+    Create the no-overlap guard on ``reservation`` if this database supports one.
+
+    Returns True when it was created now. Existing overlapping rows make the
+    postgres constraint fail to build; that is logged and left for cleanup.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in BOOKING_GUARD or not inspect(db.engine).has_table("reservation"):
+        return False
+    name, catalog, column = BOOKING_GUARD_NAMES[dialect]
+    exists = db.session.execute(
+        text(f"SELECT 1 FROM {catalog} WHERE {column} = :name"), {"name": name}
+    ).first()
+    if exists:
+        return False
+    try:
+        with db.session.begin_nested():
+            for statement in BOOKING_GUARD[dialect]:
+                db.session.execute(text(statement))
+    except DBAPIError as e:
+        logger.warning(f"Could not install reservation overlap guard: {e}")
+        return False
+    return True
+
+
+def drop_booking_guard(connection):
+    """
+    Remove the no-overlap guard, for bulk loads that are overlap-free by construction.
+
+    ``upgrade_schema()`` puts it back (postgres then checks the loaded rows).
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for trigger in ("reservation_no_overlap_insert", "reservation_no_overlap_update"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    elif dialect == "postgresql":
+        connection.execute(text("ALTER TABLE reservation DROP CONSTRAINT IF EXISTS reservation_no_overlap"))
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models.
+
+    Adds missing columns, any declared index the database doesn't have yet and
+    the reservation overlap guard.
+    Returns the names of what was added (``table.column`` or the index name).
+    The caller commits.
+    """
+    inspector = inspect(db.engine)
+    quote = db.engine.dialect.identifier_preparer.quote
+    added = []
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        for name, ddl in columns:
+            if name not in existing:
+                db.session.execute(text(f"ALTER TABLE {quote(table)} ADD COLUMN {name} {ddl}"))
+                added.append(f"{table}.{name}")
+    for table in db.metadata.sorted_tables:
+        if not table.indexes or not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.session.connection())
+                added.append(index.name)
+    if install_booking_guard():
+        added.append("reservation_no_overlap")
+    return added
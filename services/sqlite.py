@@ -0,0 +1,88 @@
+"""
+SQLite tuning for running many gunicorn workers against one database file.
+
+``configure_sqlite`` sets ``SQLITE_PRAGMAS`` on every new connection: WAL so
+readers and the writer stop blocking each other, a ``busy_timeout`` so a
+writer waits for the lock instead of failing with "database is locked",
+``synchronous=NORMAL`` (durable across crashes of the app in WAL mode, one
+fsync per checkpoint instead of per commit) and larger page cache / mmap.
+
+With ``SQLITE_WRITE_LOCK`` on, writes inside one process also queue on a
+lock: a connection takes it before its first INSERT/UPDATE/DELETE and gives
+it back once that transaction is over (when the connection goes back to the
+pool or begins its next transaction; the ``commit`` event fires before the
+database has actually committed). Threads then wait their turn on the lock
+instead of all spinning in SQLite's busy handler, which backs off with
+sleeps and grows unfair under load. Other processes still contend through
+SQLite's own file locks. Does nothing for other databases.
+"""
+
+import logging
+import threading
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+HOLDS_LOCK = "sqlite_write_lock"
+
+
+class WriteLock:
+    """One writer per process; ``timeout`` seconds before a writer goes ahead without it."""
+
+    def __init__(self, timeout=30.0):
+        self._lock = threading.Lock()
+        self.timeout = timeout
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get(HOLDS_LOCK) or not _is_write(context, statement):
+            return
+        if self._lock.acquire(timeout=self.timeout):
+            conn.info[HOLDS_LOCK] = True
+        else:
+            logger.warning("Waited too long for the SQLite write lock; writing without it")
+
+    def release_on_begin(self, conn):
+        if conn.info.pop(HOLDS_LOCK, False):
+            self._lock.release()
+
+    def release_on_checkin(self, dbapi_connection, connection_record):
+        if connection_record.info.pop(HOLDS_LOCK, False):
+            self._lock.release()
+
+
+def _is_write(context, statement):
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        return True
+    return statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE", "REPLAC")
+
+
+def configure_sqlite(engine, config, write_lock=None):
+    """
+    Install the pragmas (and the write lock, if enabled) on a SQLite ``engine``.
+
+    Returns True if ``engine`` is SQLite. ``write_lock`` overrides
+    ``SQLITE_WRITE_LOCK``; read-only engines pass False.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    pragmas = dict(config.get("SQLITE_PRAGMAS") or {})
+    if engine.url.database in (None, "", ":memory:"):
+        pragmas.pop("journal_mode", None)  # no WAL for in-memory databases
+
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    if write_lock is None:
+        write_lock = config.get("SQLITE_WRITE_LOCK", False)
+    if write_lock:
+        lock = WriteLock(config.get("SQLITE_WRITE_LOCK_TIMEOUT", 30.0))
+        event.listen(engine, "before_cursor_execute", lock.before_cursor_execute)
+        event.listen(engine, "begin", lock.release_on_begin)
+        event.listen(engine.pool, "checkin", lock.release_on_checkin)
+    return True
@@ -0,0 +1,119 @@
+"""
+Native ASGI handler for ``GET /api/parking/lots/<id>/events`` (Server-Sent Events).
+
+It runs on the event loop instead of going through ``WsgiToAsgi``, which
+would pin a thread per open stream. Browsers' ``EventSource`` can't send
+headers, so the JWT may also be passed as ``?token=``.
+"""
+
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+from flask_jwt_extended import decode_token
+
+from extensions import db
+from models.parking_lot import ParkingLot
+from services.auth import token_is_stale
+from services.events import lot_channel
+
+LOT_EVENTS_PATH = re.compile(r"^/api/parking/lots/(\d+)/events/?$")
+
+
+def request_header(scope, name):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def bearer_token(scope, allow_query=False):
+    """The JWT from the Authorization header, or from ``?token=`` when ``allow_query``."""
+    auth = request_header(scope, b"authorization")
+    if auth and auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+    if not allow_query:
+        return None
+    tokens = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return tokens[0] if tokens else None
+
+
+class LotEventStream:
+    """ASGI endpoint streaming one lot's spot deltas to a client."""
+
+    def __init__(self, flask_app, heartbeat=15.0, allowed_origins=()):
+        self.flask_app = flask_app
+        self.heartbeat = heartbeat
+        self.allowed_origins = set(allowed_origins)
+
+    def _authorize(self, token, lot_id):
+        """Returns an HTTP status: 200, 401 or 404. Runs off the event loop."""
+        with self.flask_app.app_context():
+            try:
+                claims = decode_token(token)
+            except Exception:
+                return 401
+            if token_is_stale(None, claims):
+                return 401
+            return 200 if db.session.get(ParkingLot, lot_id) is not None else 404
+
+    async def _reply(self, send, status, body, headers):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers + [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+    async def __call__(self, scope, receive, send, lot_id):
+        headers = []
+        origin = request_header(scope, b"origin")
+        if origin in self.allowed_origins:
+            headers += [(b"access-control-allow-origin", origin.encode()),
+                        (b"access-control-allow-credentials", b"true")]
+
+        token = bearer_token(scope, allow_query=True)
+        status = await asyncio.to_thread(self._authorize, token, lot_id) if token else 401
+        if status != 200:
+            message = "Parking lot not found" if status == 404 else "Missing or invalid token"
+            await self._reply(send, status, {"message": message}, headers)
+            return
+
+        broker = self.flask_app.extensions["spot_events"]
+        async with broker.subscribe(lot_channel(lot_id)) as queue:
+            await send({"type": "http.response.start", "status": 200, "headers": headers + [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ]})
+            await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+
+            disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+            next_message = None
+            try:
+                while True:
+                    if next_message is None:
+                        next_message = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        {next_message, disconnected}, timeout=self.heartbeat,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected in done:
+                        break
+                    if next_message in done:
+                        chunk = f"data: {next_message.result()}\n\n"
+                        next_message = None
+                    else:
+                        chunk = ": keepalive\n\n"
+                    await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+            except OSError:
+                pass  # client went away mid-write
+            finally:
+                disconnected.cancel()
+                if next_message is not None:
+                    next_message.cancel()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
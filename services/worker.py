@@ -0,0 +1,65 @@
+"""
+One Flask app per Celery worker process.
+
+Tasks in ``jobs.py`` use ``AppContextTask`` as their base: each run pushes an
+app context on the process's app instead of calling ``create_app()`` (which
+registers every namespace and extension) per task.
+
+``celery_worker.py`` builds the app once in the parent and binds it here.
+Prefork children inherit it, so ``worker_process_init`` only has to drop
+the inherited database connections so each child opens its own. A process
+that never had an app bound (``celery -A jobs``) builds one on first use.
+"""
+
+import threading
+
+from celery import Task
+from celery.signals import worker_process_init
+from flask import has_app_context
+
+from extensions import db
+
+_app = None
+_lock = threading.Lock()
+
+
+def bind_worker_app(app):
+    """Use ``app`` for every task run in this process."""
+    global _app
+    _app = app
+    return app
+
+
+def worker_app():
+    """The process's Flask app, built on first use."""
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                from app import create_app
+
+                _app = create_app()
+    return _app
+
+
+class AppContextTask(Task):
+    """Runs the task inside the worker process's app context."""
+
+    abstract = True
+
+    def __call__(self, *args, **kwargs):
+        if has_app_context():
+            # eager calls from a request or a test already have one
+            return super().__call__(*args, **kwargs)
+        with worker_app().app_context():
+            try:
+                return super().__call__(*args, **kwargs)
+            finally:
+                db.session.remove()
+
+
+@worker_process_init.connect
+def _reset_inherited_connections(**kwargs):
+    if _app is not None:
+        with _app.app_context():
+            db.engine.dispose(close=False)
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import sys
 import os
@@ -5,9 +6,8 @@ import os
 # Add the project root to the python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from app import create_app
+from app import create_app, init_database
 from extensions import db as _db
-from security import user_datastore
 
 
 @pytest.fixture
@@ -27,17 +27,28 @@ def app():
     app = create_app(test_config=test_config)
 
     with app.app_context():
-        _db.create_all()
-        # Seed roles
-        if not user_datastore.find_role("user"):
-            user_datastore.create_role(name="user", description="User")
-        if not user_datastore.find_role("admin"):
-            user_datastore.create_role(name="admin", description="Administrator")
-        _db.session.commit()
+        init_database()
 
         yield app
         _db.session.remove()
-        _db.drop_all()
+        _db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on a SQLite file, so each thread (or async engine) gets its own connection."""
+    app = create_app(test_config={
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'parking.db'}",
+        "CACHE_TYPE": "NullCache",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "JWT_SECRET_KEY": "test-secret",
+        "SECRET_KEY": "test-secret",
+    })
+    with app.app_context():
+        init_database()
+    return app
 
 
 @pytest.fixture
@@ -54,3 +65,82 @@ def runner(app):
 def db(app):
     with app.app_context():
         yield _db
+
+
+def _login(client, email, password):
+    res = client.post("/api/auth/login", json={"email": email, "password": password})
+    return {"Authorization": f"Bearer {res.get_json()['access_token']}"}
+
+
+@pytest.fixture
+def user_headers(client):
+    return _login(client, "user@parkapp.com", "user123")
+
+
+@pytest.fixture
+def admin_headers(client):
+    return _login(client, "admin@parkapp.com", "admin123")
+
+
+class AsgiClient:
+    """Drives ``asgi.create_asgi_app(flask_app)`` in-process, one GET at a time."""
+
+    def __init__(self, flask_app):
+        from asgi import create_asgi_app
+
+        self.app = create_asgi_app(flask_app)
+        self.closed = False
+
+    async def request(self, path, headers=None, query=""):
+        """One GET through the ASGI app; returns (status, headers, body)."""
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": query.encode(), "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        await self.app(scope, receive, send)
+        start = sent[0]
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+    def get(self, path, headers=None, query=""):
+        return asyncio.run(self.request(path, headers, query))
+
+    def shutdown(self):
+        """ASGI lifespan shutdown, which closes the async engines; returns the message types sent back."""
+        messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.app({"type": "lifespan"}, receive, send))
+        self.closed = True
+        return sent
+
+
+@pytest.fixture
+def asgi_client():
+    """``asgi_client(flask_app)`` returns an ``AsgiClient``; any left open are shut down after the test."""
+    clients = []
+
+    def make(flask_app):
+        clients.append(AsgiClient(flask_app))
+        return clients[-1]
+
+    yield make
+    for client in clients:
+        if not client.closed:
+            client.shutdown()
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from benchmarks import bench_api
+from benchmarks.common import make_app
+from benchmarks.dataset import generate
+from extensions import db
+from models.parking_lot import ParkingLot
+from models.reservation import Reservation
+from models.user import User
+from services.availability import reconcile_lot_counters
+
+
+@pytest.fixture
+def bench_app(tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'bench.db'}", sample_data=False)
+    with app.app_context():
+        generate(users=40, lots=3, spots=30, reservations=600, log=lambda message: None)
+    return app
+
+
+def test_generated_dataset_is_consistent(bench_app):
+    with bench_app.app_context():
+        assert db.session.scalar(select(func.count(User.id))) == 42  # plus the admin and test user
+        assert db.session.scalar(select(func.sum(ParkingLot.max_spots))) == 30
+        assert db.session.scalar(select(func.count(Reservation.id))) == 600
+        assert reconcile_lot_counters(dry_run=True) == []
+
+        other = aliased(Reservation)
+        overlapping = select(func.count()).select_from(Reservation).join(other, and_(
+            other.spot_id == Reservation.spot_id, other.id > Reservation.id,
+            other.parking_time < Reservation.leaving_time, Reservation.parking_time < other.leaving_time,
+        ))
+        assert db.session.scalar(overlapping) == 0
+
+        # the overlap guard is back after the load
+        live = Reservation.query.filter_by(status="U").first()
+        db.session.add(Reservation(spot_id=live.spot_id, user_id=live.user_id, parking_time=live.parking_time,
+                                   leaving_time=live.leaving_time, vehicle_number="KA01AB0000", status="U"))
+        with pytest.raises(IntegrityError):
+            db.session.flush()
+        db.session.rollback()
+
+    login = bench_app.test_client().post("/api/auth/login", json={"email": "user7@bench.parkapp.com", "password": "bench123"})
+    assert login.status_code == 200
+
+
+def test_every_api_operation_runs_cleanly(bench_app):
+    ctx = bench_api.discover(bench_api.FlaskClient(bench_app), 3, random.Random(0))
+    worker = bench_api.Worker(bench_api.FlaskClient(bench_app), ctx, random.Random(0))
+    worker.recording = True
+    for name, (method, route, ok, conflict, run) in bench_api.OPS.items():  # bookings come before the cancel
+        worker.current = name
+        run(worker)
+        assert set(worker.statuses[name]) <= {200, 201} | ok | conflict, (name, worker.statuses[name])
+    driven = {(op[0], op[1]) for op in bench_api.OPS.values()}
+    assert bench_api.api_routes(bench_app) <= driven
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+
+
+def _stream_scope(lot_id, token):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": f"/api/parking/lots/{lot_id}/events",
+        "query_string": f"token={token}".encode(),
+        "headers": [],
+    }
+
+
+def test_lot_event_stream_pushes_spot_deltas(app, client, db, user_headers):
+    from asgi import create_asgi_app
+
+    asgi_app = create_asgi_app(app)
+    broker = app.extensions["spot_events"]
+    lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=4).first()
+    token = user_headers["Authorization"].split()[1]
+
+    async def scenario():
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        stream = asyncio.ensure_future(asgi_app(_stream_scope(lot.id, token), receive, send))
+        while broker.subscriber_count() == 0:
+            await asyncio.sleep(0.01)
+
+        start = datetime.now()
+        res = await asyncio.to_thread(client.post, "/api/parking/reserve", headers=user_headers, json={
+            "spot_id": spot.id,
+            "vehicle_number": "KA01AB1234",
+            "parking_time": start.isoformat(),
+            "leaving_time": (start + timedelta(hours=1)).isoformat(),
+        })
+        assert res.status_code == 201
+
+        while not any(m.get("body", b"").startswith(b"data:") for m in sent):
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        await asyncio.wait_for(stream, 2)
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream") in sent[0]["headers"]
+    data = next(m["body"] for m in sent if m.get("body", b"").startswith(b"data:"))
+    event = json.loads(data[len(b"data: "):])
+    assert event == {
+        "type": "spots",
+        "lot_id": lot.id,
+        "spots": [{"id": spot.id, "spot_no": 4, "status": "occupied"}],
+    }
+    assert broker.subscriber_count() == 0
+
+
+def test_lot_event_stream_requires_token(app, db):
+    from asgi import create_asgi_app
+
+    asgi_app = create_asgi_app(app)
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(_stream_scope(1, "not-a-jwt"), receive, send))
+    assert sent[0]["status"] == 401
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from models.parking_lot import ParkingLot
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def fast(file_app, asgi_client):
+    file_app.config["FAST_READS"] = True
+    asgi = asgi_client(file_app)
+    client = file_app.test_client()
+    login = client.post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+    with file_app.app_context():
+        lot_id = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first().id
+    yield asgi, client, headers, lot_id
+    assert asgi.shutdown() == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+@pytest.mark.parametrize("path,query", [
+    ("/api/parking/lots", ""),
+    ("/api/parking/lots/{lot}/spots", ""),
+    ("/api/parking/lots/{lot}/spots", "format=bitmap"),
+])
+def test_fast_reads_match_flask(fast, monkeypatch, path, query):
+    asgi, client, headers, lot_id = fast
+    path = path.format(lot=lot_id)
+    # only the fast path may answer: a fall-through would hit this
+    monkeypatch.setattr("asgiref.wsgi.WsgiToAsgi.__call__", lambda *a: pytest.fail("fell through to Flask"))
+    status, fast_headers, body = asgi.get(path, headers, query)
+    flask_res = client.get(f"{path}?{query}", headers=headers)
+    assert status == 200
+    assert json.loads(body) == flask_res.get_json()
+    assert fast_headers["etag"] == flask_res.headers["ETag"]
+
+    status, _, body = asgi.get(path, {**headers, "If-None-Match": fast_headers["etag"]}, query)
+    assert (status, body) == (304, b"")
+
+
+def test_fast_reads_hand_everything_else_to_flask(fast):
+    asgi, _, headers, lot_id = fast
+    assert asgi.get("/api/parking/lots")[0] == 401
+    assert asgi.get("/api/parking/lots/999/spots", headers)[0] == 404
+    assert asgi.get(f"/api/parking/lots/{lot_id}/spots", headers, "format=xml")[0] == 400
+    status, _, body = asgi.get(
+        f"/api/parking/lots/{lot_id}/spots", headers,
+        "from=2030-01-01T10:00:00&to=2030-01-01T12:00:00",
+    )
+    assert status == 200 and json.loads(body)["window"]["from"] == "2030-01-01T10:00:00"
+
+
+def test_networked_cache_is_called_off_the_event_loop(file_app, asgi_client, monkeypatch):
+    import time
+
+    from extensions import cache
+
+    # detected as a networked cache; the client itself stays the test's NullCache
+    file_app.config.update(FAST_READS=True, CACHE_TYPE="RedisCache")
+    asgi = asgi_client(file_app)
+    login = file_app.test_client().post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+
+    def stalled_get(key):
+        time.sleep(0.5)  # a Redis that takes its time
+
+    monkeypatch.setattr(cache, "get", stalled_get)
+
+    async def health_during_a_stalled_read():
+        started = time.perf_counter()
+        lots = asyncio.create_task(asgi.request("/api/parking/lots", headers))
+        await asyncio.sleep(0.1)
+        status, _, _ = await asgi.request("/api/health")
+        answered = time.perf_counter() - started
+        return status, answered, (await lots)[0]
+
+    health, answered, lots = asyncio.run(health_during_a_stalled_read())
+    assert (health, lots) == (200, 200)
+    assert answered < 0.4  # not held up behind the 0.5s cache call
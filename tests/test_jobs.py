@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from models.user import User
+
+
+def test_tasks_run_in_the_worker_app(app, db, monkeypatch):
+    import jobs
+    from services import worker
+
+    monkeypatch.setattr(worker, "_app", app)
+    monkeypatch.setattr("app.create_app", lambda *a, **kw: pytest.fail("task built a new app"))
+
+    spot = ParkingSpot.query.first()
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    db.session.add(Reservation(
+        spot_id=spot.id, user_id=user.id, vehicle_number="KA01AB1234",
+        parking_time=datetime.now() - timedelta(minutes=5), leaving_time=datetime.now() + timedelta(hours=1),
+        cost=5.0, status="U",
+    ))
+    db.session.commit()
+
+    # a fresh thread has no app context, like a worker process running a task
+    with ThreadPoolExecutor(1) as pool:
+        result = pool.submit(lambda: jobs.sync_spot_occupancy.apply().get()).result()
+    assert result == {"occupied": 1, "freed": 0}
+    db.session.refresh(spot)
+    assert spot.status == "O"
+
+
+def test_monthly_report_streams_one_query_for_all_users(app, db, monkeypatch):
+    import jobs
+    from extensions import mail
+    from services.querystats import max_queries
+
+    monkeypatch.setattr(app.extensions["mail"], "default_sender", "reports@parkapp.com")
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    first_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month = (first_of_month - timedelta(days=1)).replace(day=1)
+    spots = ParkingSpot.query.order_by(ParkingSpot.id).limit(2).all()
+    for spot, day, status in [
+        (spots[0], 2, "C"), (spots[0], 5, "C"), (spots[1], 9, "C"),
+        (spots[1], 12, "X"),  # cancelled
+    ]:
+        start = last_month.replace(day=day, hour=9)
+        db.session.add(Reservation(
+            spot_id=spot.id, user_id=user.id, vehicle_number="KA01AB1234", parking_time=start,
+            checkin_time=start, leaving_time=start + timedelta(hours=2), cost=10.0, status=status,
+        ))
+    # this month's booking belongs to next month's report
+    db.session.add(Reservation(
+        spot_id=spots[0].id, user_id=user.id, vehicle_number="KA01AB1234", parking_time=first_of_month,
+        leaving_time=first_of_month + timedelta(hours=1), cost=5.0, status="C",
+    ))
+    db.session.commit()
+
+    (user_row, bookings), = jobs.monthly_activity(last_month, first_of_month)
+    assert user_row == (user.id, user.username, user.email)
+    assert [b.parking_time.day for b in bookings] == [2, 5, 9]
+    assert {b.lot_name for b in bookings} == {spots[0].parking_lot.prime_location_name}
+
+    # the admin parked nowhere and gets no report
+    with mail.record_messages() as outbox, max_queries(1):
+        assert jobs.send_monthly_activity_report.run() == 1
+    (msg,) = outbox
+    assert msg.recipients == [user.email]
+    (attachment,) = msg.attachments
+    assert attachment.content_type == "application/pdf"
+    assert attachment.data.startswith(b"%PDF")
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _sample(text, name, **labels):
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                return sample.value
+    return 0.0
+
+
+def _scrape(client):
+    res = client.get("/api/metrics")
+    assert res.status_code == 200 and res.content_type.startswith("text/plain")
+    return res.get_data(as_text=True)
+
+
+def test_metrics_count_requests_per_route_template(client, user_headers):
+    spots = "/api/parking/lots/<int:lot_id>/spots"
+    before = _scrape(client)
+    for lot_id in (1, 2):
+        assert client.get(f"/api/parking/lots/{lot_id}/spots", headers=user_headers).status_code == 200
+    client.get("/api/no/such/thing")
+    after = _scrape(client)
+
+    def delta(name, **labels):
+        return _sample(after, name, **labels) - _sample(before, name, **labels)
+
+    assert delta("http_requests_total", route=spots, method="GET", status="200", namespace="parking") == 2
+    assert delta("http_request_duration_seconds_count", route=spots, method="GET") == 2
+    assert delta("http_requests_total", route="<unmatched>", status="404") == 1
+    assert delta("cache_requests_total", family="spots", result="miss") == 2
+    assert "/api/parking/lots/1/spots" not in after
+
+
+def test_metrics_token(app, client):
+    app.config["METRICS_TOKEN"] = "scrape-me"
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+
+
+def test_celery_task_durations_are_recorded(app, client):
+    from jobs import sync_spot_occupancy
+
+    labels = {"task": "jobs.sync_spot_occupancy", "state": "SUCCESS"}
+    before = _sample(_scrape(client), "celery_task_duration_seconds_count", **labels)
+    sync_spot_occupancy.apply()
+    assert _sample(_scrape(client), "celery_task_duration_seconds_count", **labels) == before + 1
+
+
+def test_fast_path_requests_share_the_flask_series(file_app, asgi_client):
+    pytest.importorskip("aiosqlite")
+    file_app.config["FAST_READS"] = True
+    asgi = asgi_client(file_app)
+    client = file_app.test_client()
+    login = client.post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+    labels = {"route": "/api/parking/lots", "method": "GET", "status": "200"}
+    before = _scrape(client)
+    assert asgi.get("/api/parking/lots", headers)[0] == 200  # native
+    assert client.get("/api/parking/lots", headers=headers).status_code == 200  # Flask
+    asgi.shutdown()
+    after = _scrape(client)
+    assert _sample(after, "http_requests_total", **labels) == _sample(before, "http_requests_total", **labels) + 2
+    for engine in ("primary", "async"):
+        assert _sample(after, "db_pool_checkouts_total", engine=engine) > _sample(before, "db_pool_checkouts_total", engine=engine)
+        assert _sample(after, "db_pool_wait_seconds_count", engine=engine) > 0
+
+
+def test_metrics_add_up_across_processes(tmp_path, monkeypatch):
+    web, celery = str(tmp_path / "web"), str(tmp_path / "worker")
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": web, "PROMETHEUS_SCRAPE_DIRS": celery}
+    worker = textwrap.dedent("""
+        import sys
+        from app import create_app
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "CACHE_TYPE": "NullCache"})
+        client = app.test_client()
+        for _ in range(int(sys.argv[1])):
+            client.get("/api/health")
+        if len(sys.argv) > 2:
+            print(client.get("/api/metrics").get_data(as_text=True))
+    """)
+
+    def run(*args, directory=web):
+        return subprocess.run(
+            [sys.executable, "-c", worker, *args], cwd=ROOT, env={**env, "PROMETHEUS_MULTIPROC_DIR": directory},
+            capture_output=True, text=True, check=True,
+        ).stdout
+
+    run("3")
+    run("4")
+    run("5", directory=celery)
+    text = run("0", "scrape")
+    assert _sample(text, "http_requests_total", route="/api/health", status="200") == 12
+
+    # gunicorn starting over empties its own directory, not the worker's
+    import gunicorn_config
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", web)
+    gunicorn_config.on_starting(None)
+    assert os.listdir(web) == [] and os.listdir(celery)
+    text = run("0", "scrape")
+    assert _sample(text, "http_requests_total", route="/api/health", status="200") == 5
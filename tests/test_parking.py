@@ -0,0 +1,401 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from services.availability import set_spot_status
+
+
+def _downtown():
+    return ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+
+
+def _reserve(client, headers, spot_id, hours_from_now=0):
+    start = datetime.now() + timedelta(hours=hours_from_now)
+    return client.post(
+        "/api/parking/reserve",
+        headers=headers,
+        json={
+            "spot_id": spot_id,
+            "vehicle_number": "ka01ab1234",
+            "parking_time": start.isoformat(),
+            "leaving_time": (start + timedelta(hours=2)).isoformat(),
+        },
+    )
+
+
+def test_lots_listing_counts_availability(client, db, user_headers):
+    lot = _downtown()
+    for spot in ParkingSpot.query.filter_by(lot_id=lot.id).limit(5).all():
+        set_spot_status(spot, "O")
+    db.session.commit()
+
+    res = client.get("/api/parking/lots", headers=user_headers)
+    assert res.status_code == 200
+    lots = {lot["id"]: lot for lot in res.get_json()["lots"]}
+    assert lots[lot.id]["total_spots"] == 50
+    assert lots[lot.id]["available_spots"] == 45
+    assert lots[lot.id]["occupancy"] == 10.0
+
+
+def test_admin_dashboard_aggregates(client, db, admin_headers):
+    res = client.get("/api/admin/dashboard-data", headers=admin_headers)
+    assert res.status_code == 200
+    stats = res.get_json()["stats"]
+    assert stats["total_lots"] == 3
+    assert stats["total_spots"] == 350
+    assert stats["total_available"] == 350
+    assert stats["total_revenue"] == 0
+
+
+def test_reserve_and_cancel_move_lot_counters(client, db, user_headers):
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+
+    res = _reserve(client, user_headers, spot.id)
+    assert res.status_code == 201
+    db.session.refresh(lot)
+    assert (lot.available_spots, lot.occupied_spots) == (49, 1)
+
+    reservation_id = res.get_json()["reservation"]["id"]
+    res = client.post(f"/api/parking/reservations/{reservation_id}/cancel", headers=user_headers)
+    assert res.status_code == 200
+    db.session.refresh(lot)
+    assert (lot.available_spots, lot.occupied_spots) == (50, 0)
+
+
+def test_reconcile_counters_command_repairs_drift(runner, db):
+    lot = _downtown()
+    lot.available_spots = 7
+    lot.occupied_spots = 3
+    db.session.commit()
+
+    result = runner.invoke(args=["reconcile-counters", "--dry-run"])
+    assert "1 lot(s) drifted" in result.output
+    db.session.refresh(lot)
+    assert lot.available_spots == 7
+
+    result = runner.invoke(args=["reconcile-counters"])
+    assert "1 lot(s) repaired" in result.output
+    db.session.refresh(lot)
+    assert (lot.available_spots, lot.occupied_spots) == (50, 0)
+
+
+def test_cached_listings_invalidate_on_reservation(app, client, db, user_headers, admin_headers):
+    from extensions import cache
+    from services import cache as response_cache
+
+    cache.init_app(app, config={"CACHE_TYPE": "SimpleCache"})
+    response_cache.stats.reset()
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+
+    def lot_available():
+        lots = client.get("/api/parking/lots", headers=user_headers).get_json()["lots"]
+        return next(entry["available_spots"] for entry in lots if entry["id"] == lot.id)
+
+    def spot_status():
+        spots = client.get(f"/api/parking/lots/{lot.id}/spots", headers=user_headers).get_json()
+        return next(s["status"] for s in spots["spots"] if s["id"] == spot.id)
+
+    assert lot_available() == 50
+    assert lot_available() == 50
+    assert spot_status() == "available"
+    assert spot_status() == "available"
+
+    assert _reserve(client, user_headers, spot.id).status_code == 201
+    assert lot_available() == 49
+    assert spot_status() == "occupied"
+
+    families = client.get("/api/admin/cache-stats", headers=admin_headers).get_json()["families"]
+    assert families["lots"] == {"hits": 1, "misses": 2, "hit_ratio": 0.3333}
+    assert families["spots"]["hits"] == 1
+    assert families["spots"]["misses"] == 2
+
+
+def _decode_bits(encoded, count):
+    import base64
+
+    raw = base64.b64decode(encoded)
+    return [bool(raw[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+def test_spots_bitmap_format(client, db, user_headers):
+    lot = _downtown()
+    taken = {3, 8, 50}
+    for spot in ParkingSpot.query.filter(ParkingSpot.lot_id == lot.id, ParkingSpot.spot_no.in_(taken)).all():
+        set_spot_status(spot, "O")
+    db.session.commit()
+
+    res = client.get(f"/api/parking/lots/{lot.id}/spots?format=bitmap", headers=user_headers)
+    assert res.status_code == 200
+    data = res.get_json()
+    first = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+    assert data["format"] == "bitmap"
+    assert data["lot"]["id"] == lot.id
+    assert (data["count"], data["available"]) == (50, 47)
+    assert (data["first_spot_id"], data["first_spot_no"]) == (first.id, 1)
+    assert "spot_ids" not in data
+    bits = _decode_bits(data["occupied"], data["count"])
+    assert {i + 1 for i, b in enumerate(bits) if b} == taken
+
+
+def test_spots_bitmap_lists_ids_when_not_contiguous(client, db, user_headers):
+    lot = _downtown()
+    extra = ParkingSpot(lot_id=lot.id, spot_no=60, status="O")
+    db.session.add(extra)
+    db.session.commit()
+
+    data = client.get(f"/api/parking/lots/{lot.id}/spots?format=bitmap", headers=user_headers).get_json()
+    assert data["count"] == 51
+    assert data["spot_nos"][-1] == 60
+    assert data["spot_ids"][-1] == extra.id
+    assert _decode_bits(data["occupied"], 51)[-1] is True
+
+    res = client.get(f"/api/parking/lots/{lot.id}/spots?format=xml", headers=user_headers)
+    assert res.status_code == 400
+
+
+def test_availability_etags_answer_not_modified(client, db, user_headers):
+    lot = _downtown()
+    spots_url = f"/api/parking/lots/{lot.id}/spots"
+
+    lots_res = client.get("/api/parking/lots", headers=user_headers)
+    spots_res = client.get(spots_url, headers=user_headers)
+    lots_etag, spots_etag = lots_res.headers["ETag"], spots_res.headers["ETag"]
+    assert spots_etag != client.get(spots_url + "?format=bitmap", headers=user_headers).headers["ETag"]
+
+    res = client.get("/api/parking/lots", headers={**user_headers, "If-None-Match": lots_etag})
+    assert res.status_code == 304
+    assert res.data == b""
+    res = client.get(spots_url, headers={**user_headers, "If-None-Match": f"W/{spots_etag}"})
+    assert res.status_code == 304
+
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=2).first()
+    assert _reserve(client, user_headers, spot.id).status_code == 201
+
+    res = client.get("/api/parking/lots", headers={**user_headers, "If-None-Match": lots_etag})
+    assert res.status_code == 200
+    res = client.get(spots_url, headers={**user_headers, "If-None-Match": spots_etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != spots_etag
+
+
+def test_future_booking_keeps_spot_available_now(client, db, user_headers):
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+
+    assert _reserve(client, user_headers, spot.id, hours_from_now=24).status_code == 201
+    db.session.refresh(spot)
+    db.session.refresh(lot)
+    assert spot.status == "A"
+    assert lot.available_spots == 50
+
+    # a later window on the same spot is fine, an overlapping one isn't
+    assert _reserve(client, user_headers, spot.id, hours_from_now=2).status_code == 201
+    assert _reserve(client, user_headers, spot.id, hours_from_now=25).status_code == 400
+
+
+def test_spots_for_time_window(client, db, user_headers):
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=3).first()
+    assert _reserve(client, user_headers, spot.id, hours_from_now=24).status_code == 201
+
+    def window(hours, **params):
+        start = datetime.now() + timedelta(hours=hours)
+        query = {"from": start.isoformat(), "to": (start + timedelta(hours=1)).isoformat(), **params}
+        return client.get(f"/api/parking/lots/{lot.id}/spots", headers=user_headers, query_string=query)
+
+    spots = {s["spot_no"]: s["status"] for s in window(25).get_json()["spots"]}
+    assert spots[3] == "occupied"
+    assert list(spots.values()).count("available") == 49
+    spots = {s["spot_no"]: s["status"] for s in window(1).get_json()["spots"]}
+    assert spots[3] == "available"
+
+    body = window(25, format="bitmap").get_json()
+    assert _decode_bits(body["occupied"], body["count"]) == [i == 2 for i in range(50)]
+
+    res = client.get(f"/api/parking/lots/{lot.id}/spots", headers=user_headers, query_string={"from": "2030-01-01T10:00"})
+    assert res.status_code == 400
+    # ended bookings aren't in the index, so a past window would show booked spots as free
+    res = window(-3)
+    assert res.status_code == 400
+    assert res.get_json()["errors"]["to"] == "This time window is already over"
+
+
+def test_sync_spot_occupancy_follows_booking_windows(client, db, user_headers):
+    from services.intervals import sync_spot_occupancy
+
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+    assert _reserve(client, user_headers, spot.id, hours_from_now=1).status_code == 201
+
+    assert sync_spot_occupancy(now=datetime.now() + timedelta(hours=2)) == (1, 0)
+    db.session.commit()
+    db.session.refresh(lot)
+    assert spot.status == "O"
+    assert lot.occupied_spots == 1
+
+    assert sync_spot_occupancy(now=datetime.now() + timedelta(hours=4)) == (0, 1)
+    db.session.commit()
+    assert spot.status == "A"
+
+
+def _reserve_any(client, headers, lot_id, hours=2, **fields):
+    body = {"vehicle_number": "ka01ab1234", "leaving_time": (datetime.now() + timedelta(hours=hours)).isoformat()}
+    return client.post(f"/api/parking/lots/{lot_id}/reserve-any", headers=headers, json={**body, **fields})
+
+
+def test_reserve_any_allocates_and_recycles_spots(client, db, user_headers):
+    lot = _downtown()
+    first = _reserve_any(client, user_headers, lot.id)
+    second = _reserve_any(client, user_headers, lot.id)
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert [r.get_json()["reservation"]["spot_no"] for r in (first, second)] == [1, 2]
+    db.session.refresh(lot)
+    assert lot.occupied_spots == 2
+
+    reservation_id = first.get_json()["reservation"]["id"]
+    assert client.post(f"/api/parking/reservations/{reservation_id}/cancel", headers=user_headers).status_code == 200
+    assert _reserve_any(client, user_headers, lot.id).get_json()["reservation"]["spot_no"] == 1
+
+
+def test_reserve_any_skips_spots_booked_later_in_the_window(client, db, user_headers):
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+    assert _reserve(client, user_headers, spot.id, hours_from_now=5).status_code == 201
+
+    long_stay = _reserve_any(client, user_headers, lot.id, hours=8)
+    assert long_stay.get_json()["reservation"]["spot_no"] == 2
+    short_stay = _reserve_any(client, user_headers, lot.id, hours=1)
+    assert short_stay.get_json()["reservation"]["spot_no"] == 1
+
+    later = (datetime.now() + timedelta(hours=5, minutes=30)).isoformat()
+    res = _reserve_any(client, user_headers, lot.id, hours=6, parking_time=later)
+    assert res.get_json()["reservation"]["spot_no"] == 3
+
+
+def test_reserve_any_full_lot(client, db, user_headers):
+    lot = _downtown()
+    for spot in ParkingSpot.query.filter_by(lot_id=lot.id).all():
+        set_spot_status(spot, "O")
+    db.session.commit()
+    assert _reserve_any(client, user_headers, lot.id).status_code == 409
+    assert _reserve_any(client, user_headers, 9999).status_code == 404
+
+
+def test_reserve_any_rejects_badly_typed_input(client, db, user_headers):
+    lot = _downtown()
+    url = f"/api/parking/lots/{lot.id}/reserve-any"
+    assert client.post(url, headers=user_headers, json=["ka01ab1234"]).status_code == 400
+    res = _reserve_any(client, user_headers, lot.id, vehicle_number=1234)
+    assert res.status_code == 400
+    assert res.get_json()["errors"] == {"vehicle_number": "Must be a string"}
+    assert _reserve_any(client, user_headers, lot.id, parking_time=["now"]).status_code == 400
+
+
+def test_future_window_skips_a_candidate_the_claim_rejects(db):
+    from services.allocator import LowestNumber, MemoryAllocator
+    from services.intervals import LotIntervalIndex
+
+    lot = _downtown()
+    spots = {s.spot_no: s for s in ParkingSpot.query.filter_by(lot_id=lot.id)}
+    start = datetime.now() + timedelta(hours=3)
+    index = LotIntervalIndex.load(lot.id)
+    tried = []
+
+    def claim(spot_id):
+        tried.append(spot_id)
+        return spot_id != spots[1].id  # spot 1 was booked since the index loaded
+
+    allocator = MemoryAllocator(LowestNumber())
+    assert allocator.allocate_window(index, start, start + timedelta(hours=1), claim) == spots[2].id
+    assert tried == [spots[1].id, spots[2].id]
+    assert allocator.free_count(lot.id) == 0  # the free list isn't touched
+
+
+def test_allocator_policies(db):
+    from services.allocator import MemoryAllocator, NearestEntrance, SpreadWear
+
+    lot = _downtown()
+    spots = {s.spot_no: s for s in ParkingSpot.query.filter_by(lot_id=lot.id)}
+
+    def take_any(spot_id):
+        return True
+
+    allocator = MemoryAllocator(NearestEntrance(entrances=(20, 40)))
+    assert {allocator.allocate(lot.id, take_any) for _ in range(2)} == {spots[20].id, spots[40].id}
+
+    allocator = MemoryAllocator(SpreadWear())
+    allocator.reconcile(lot.id)
+    allocator.release(lot.id, spots[1].id, 1)  # just freed, goes to the back
+    picked = [allocator.allocate(lot.id, take_any) for _ in range(50)]
+    assert picked[-1] == spots[1].id
+    assert allocator.allocate(lot.id, take_any) is None
+
+
+def test_admin_creates_lot_spots_in_bulk(client, db, admin_headers, user_headers):
+    res = client.post("/api/admin/lots", headers=admin_headers, json={
+        "name": "Stadium", "address": "1 Arena Way", "pin_code": "10009", "price_per_hr": 4.0, "max_spots": 1000,
+    })
+    assert res.status_code == 201
+    lot = ParkingLot.query.filter_by(prime_location_name="Stadium").first()
+    assert (lot.available_spots, lot.occupied_spots) == (1000, 0)
+
+    body = client.get(f"/api/parking/lots/{lot.id}/spots?format=bitmap", headers=user_headers).get_json()
+    assert (body["count"], body["first_spot_no"], body["available"]) == (1000, 1, 1000)
+    assert "spot_ids" not in body
+
+
+def test_admin_resizes_lot(client, db, admin_headers, user_headers):
+    lot = _downtown()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=45).first()
+    booking = _reserve(client, user_headers, spot.id, hours_from_now=24).get_json()["reservation"]
+
+    res = client.patch(f"/api/admin/lots/{lot.id}", headers=admin_headers, json={"max_spots": 40})
+    assert res.status_code == 409
+    assert res.get_json()["spot_nos"] == [45]
+
+    client.post(f"/api/parking/reservations/{booking['id']}/cancel", headers=user_headers)
+    set_spot_status(ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=50).first(), "O")
+    db.session.commit()
+    res = client.patch(f"/api/admin/lots/{lot.id}", headers=admin_headers, json={"max_spots": 40})
+    assert res.status_code == 200
+    assert res.get_json()["spots_retired"] == 10
+    db.session.refresh(lot)
+    assert (lot.max_spots, lot.available_spots, lot.occupied_spots) == (40, 40, 0)
+    spots = client.get(f"/api/parking/lots/{lot.id}/spots", headers=user_headers).get_json()["spots"]
+    assert sorted(s["spot_no"] for s in spots) == list(range(1, 41))
+    assert _reserve(client, user_headers, spot.id).status_code == 400
+
+    res = client.patch(f"/api/admin/lots/{lot.id}", headers=admin_headers, json={"max_spots": 60, "price_per_hr": 6.0})
+    assert res.get_json()["spots_added"] == 20
+    db.session.refresh(lot)
+    assert (lot.max_spots, lot.available_spots, lot.price_per_hr) == (60, 60, 6.0)
+    assert db.session.get(ParkingSpot, spot.id).status == "A"
+    assert ParkingSpot.query.filter_by(lot_id=lot.id).count() == 60
+
+    assert client.patch(f"/api/admin/lots/{lot.id}", headers=user_headers, json={"max_spots": 1}).status_code == 403
+
+
+@pytest.mark.parametrize("body,field", [
+    ({"name": None}, "name"),
+    ({"address": "   "}, "address"),
+    ({"pin_code": 560001}, "pin_code"),
+    ({"price_per_hr": "abc"}, "price_per_hr"),
+    ({"price_per_hr": 0}, "price_per_hr"),
+    ({"max_spots": True}, "max_spots"),
+    ({"max_spots": 2.5}, "max_spots"),
+])
+def test_admin_lot_fields_are_validated(client, db, admin_headers, body, field):
+    lot = _downtown()
+    res = client.patch(f"/api/admin/lots/{lot.id}", headers=admin_headers, json=body)
+    assert res.status_code == 400
+    assert list(res.get_json()["errors"]) == [field]
+
+    create = {"name": "Stadium", "address": "1 Arena Way", "pin_code": "10009", "price_per_hr": 4.0, "max_spots": 10}
+    res = client.post("/api/admin/lots", headers=admin_headers, json={**create, **body})
+    assert res.status_code == 400
+    assert list(res.get_json()["errors"]) == [field]
+    assert not ParkingLot.query.filter_by(prime_location_name="Stadium").count()
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models.user import User
+from services.passwords import HashingBusy, HashingPool
+
+
+def test_legacy_pbkdf2_password_is_rehashed_on_login(client, db):
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    user.password = generate_password_hash("user123", method="pbkdf2:sha256:1000")
+    db.session.commit()
+
+    body = {"email": "user@parkapp.com", "password": "user123"}
+    assert client.post("/api/auth/login", json=body).status_code == 200
+    db.session.refresh(user)
+    assert user.password.startswith("$argon2id$")
+    assert client.post("/api/auth/login", json=body).status_code == 200
+    assert client.post("/api/auth/login", json={**body, "password": "wrong"}).status_code == 401
+
+
+def test_saturated_pool_fails_fast():
+    pool = HashingPool(workers=1, max_queue=1, timeout=5)
+    release = threading.Event()
+    blockers = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+    for t in blockers:
+        t.start()
+    while pool.snapshot()["in_flight"] < 2:
+        time.sleep(0.001)
+    try:
+        with pytest.raises(HashingBusy):
+            pool.run(lambda: None)
+    finally:
+        release.set()
+        for t in blockers:
+            t.join()
+    assert pool.snapshot()["rejected"] == 1
+    assert pool.run(lambda: "ok") == "ok"
+
+
+def test_login_answers_503_when_hashing_is_saturated(app, client, monkeypatch):
+    def busy(*args):
+        raise HashingBusy("full")
+
+    monkeypatch.setattr(app.extensions["password_hasher"], "run", busy)
+    res = client.post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
@@ -0,0 +1,81 @@
+"""
+Per-endpoint SQL statement ceilings.
+
+Each case runs one request inside ``max_queries``; an endpoint that starts
+running more statements than its ceiling (a lookup per row, a lost eager
+load) fails here with the statements it ran. The user already has a few
+bookings, so per-row queries on the dashboards and feeds would show up.
+Counts are with the response cache off (the test app uses NullCache), so
+every request also pays for the token version check.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.parking_lot import ParkingLot
+from services.querystats import max_queries
+
+BOOKINGS = 3
+
+
+def _later(hours):
+    return (datetime.now() + timedelta(hours=hours)).isoformat()
+
+
+def _fleet(lot_id, n):
+    return [{"vehicle_number": f"KA01FL{i:04d}", "lot_id": lot_id, "leaving_time": _later(2)} for i in range(n)]
+
+
+# (who, method, path, body, ceiling); {lot} is the lot the bookings are in
+CASES = [
+    ("user", "GET", "/api/auth/me", None, 2),
+    ("user", "GET", "/api/user/", None, 2),
+    ("user", "GET", "/api/user/role", None, 1),
+    ("user", "GET", "/api/user/dashboard-data", None, 3),
+    ("user", "GET", "/api/parking/lots", None, 3),
+    ("user", "GET", "/api/parking/lots/{lot}/spots", None, 4),
+    ("user", "GET", "/api/parking/lots/{lot}/spots?format=bitmap", None, 5),
+    ("user", "GET", "/api/parking/lots/{lot}/spots?from=2030-01-01T09:00:00&to=2030-01-01T11:00:00", None, 6),
+    ("user", "POST", "/api/parking/lots/{lot}/reserve-any",
+     lambda lot: {"vehicle_number": "KA01AB9999", "leaving_time": _later(2)}, 12),
+    ("user", "POST", "/api/parking/reserve/bulk", lambda lot: {"items": _fleet(lot, 10)}, 17),
+    ("user", "POST", "/api/parking/reservations/{reservation}/cancel", None, 8),
+    ("admin", "GET", "/api/admin/dashboard-data", None, 5),
+    ("admin", "GET", "/api/admin/users", None, 3),
+    ("admin", "GET", "/api/admin/reservations", None, 2),
+    ("admin", "GET", "/api/admin/lots", None, 2),
+    ("admin", "PATCH", "/api/admin/lots/{lot}", lambda lot: {"max_spots": 60}, 8),
+    ("admin", "POST", "/api/admin/lots", lambda lot: {
+        "name": "Budget Lot", "address": "1 Test Road", "pin_code": "560001", "price_per_hr": 20, "max_spots": 5,
+    }, 4),
+]
+
+
+@pytest.fixture
+def booked(client, db, user_headers):
+    """The lot and one reservation id, after the user has made ``BOOKINGS`` bookings."""
+    lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+    ids = []
+    for i in range(BOOKINGS):
+        res = client.post(f"/api/parking/lots/{lot.id}/reserve-any", headers=user_headers,
+                          json={"vehicle_number": f"KA01AB{i:04d}", "leaving_time": _later(1 + i)})
+        assert res.status_code == 201
+        ids.append(res.get_json()["reservation"]["id"])
+    return {"lot": lot.id, "reservation": ids[0]}
+
+
+@pytest.mark.parametrize("who,method,path,body,ceiling", CASES, ids=[f"{c[1]} {c[2]}" for c in CASES])
+def test_endpoint_stays_within_its_query_ceiling(client, user_headers, admin_headers, booked,
+                                                 who, method, path, body, ceiling):
+    headers = user_headers if who == "user" else admin_headers
+    json = body(booked["lot"]) if body else None
+    with max_queries(ceiling):
+        res = client.open(path.format(**booked), method=method, headers=headers, json=json)
+    assert res.status_code < 300, res.get_json()
+
+
+def test_login_stays_within_its_query_ceiling(client):
+    with max_queries(2):
+        res = client.post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    assert res.status_code == 200
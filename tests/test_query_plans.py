@@ -0,0 +1,122 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot reservation and spot queries.
+
+Each test records the SELECTs an endpoint actually runs and asks SQLite how
+it would execute them; a bare ``SCAN reservation`` or ``SCAN parking_spot``
+(a full table scan with no index) fails the test.
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from models.user import User
+
+WATCHED_TABLES = ("reservation", "parking_spot")
+
+
+@contextmanager
+def captured_selects(db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def full_scans(db, statements):
+    """Return ``(plan line, sql)`` for every unindexed scan of a watched table."""
+    bad = []
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                detail = row[-1]
+                match = re.match(r"SCAN (\w+)", detail)
+                if match and match.group(1) in WATCHED_TABLES and "INDEX" not in detail:
+                    bad.append((detail, statement))
+    return bad
+
+
+def assert_indexed(db, statements):
+    assert statements, "no queries captured"
+    bad = full_scans(db, statements)
+    assert not bad, "full table scans:\n" + "\n".join(f"{d}: {sql}" for d, sql in bad)
+
+
+@pytest.fixture
+def lot_id(db):
+    return ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first().id
+
+
+def test_parking_endpoints_use_indexes(client, db, user_headers, lot_id):
+    with captured_selects(db) as statements:
+        client.get("/api/parking/lots", headers=user_headers)
+        client.get(f"/api/parking/lots/{lot_id}/spots", headers=user_headers)
+        client.get(f"/api/parking/lots/{lot_id}/spots?format=bitmap", headers=user_headers)
+        leaving = (datetime.now() + timedelta(hours=2)).isoformat()
+        client.post(f"/api/parking/lots/{lot_id}/reserve-any", headers=user_headers,
+                    json={"vehicle_number": "KA01AB1234", "leaving_time": leaving})
+        client.post("/api/parking/reserve/bulk", headers=user_headers, json={"items": [
+            {"vehicle_number": "KA01AB1235", "lot_id": lot_id, "leaving_time": leaving},
+            {"vehicle_number": "KA01AB1236", "spot_id": 10, "leaving_time": leaving},
+        ]})
+    assert_indexed(db, statements)
+
+
+def test_dashboards_and_admin_feed_use_indexes(client, db, user_headers, admin_headers, lot_id):
+    cursor = "WyIyMDI2LTAzLTAxVDA5OjAwOjAwIiwgNV0"
+    with captured_selects(db) as statements:
+        client.get("/api/user/dashboard-data", headers=user_headers)
+        client.get("/api/user/dashboard-data?status=upcoming", headers=user_headers)
+        client.get(f"/api/user/dashboard-data?cursor={cursor}", headers=user_headers)
+        client.get("/api/admin/dashboard-data", headers=admin_headers)
+        for query in (
+            "",
+            f"cursor={cursor}",
+            "status=completed",
+            f"lot_id={lot_id}",
+            "user_id=2",
+            "from=2026-01-01T00:00:00&to=2026-02-01T00:00:00",
+        ):
+            client.get(f"/api/admin/reservations?{query}", headers=admin_headers)
+        client.patch(f"/api/admin/lots/{lot_id}", headers=admin_headers, json={"max_spots": 45})
+        client.patch(f"/api/admin/lots/{lot_id}", headers=admin_headers, json={"max_spots": 55})
+    assert_indexed(db, statements)
+
+
+def test_job_queries_use_indexes(db):
+    """The query shapes used by jobs.py (CSV export, monthly report, reminders)."""
+    import jobs
+
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    month_start = datetime(2026, 2, 1)
+    with captured_selects(db) as statements:
+        Reservation.query.filter_by(user_id=user.id).order_by(Reservation.parking_time.asc()).all()
+        list(jobs.monthly_activity(month_start, datetime(2026, 3, 1)))
+        Reservation.query.filter(
+            Reservation.user_id == user.id,
+            Reservation.parking_time > datetime.now() - timedelta(days=7),
+        ).count()
+        db.session.query(func.count(ParkingSpot.id)).filter(
+            ParkingSpot.lot_id == 1, ParkingSpot.status == "A"
+        ).scalar()
+    assert_indexed(db, statements)
+
+
+def test_plan_check_catches_full_scans(db):
+    with captured_selects(db) as statements:
+        Reservation.query.filter(Reservation.vehicle_number == "KA01AB1234").all()
+    assert full_scans(db, statements)
@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from services.querystats import max_queries, normalize_sql, track, untrack
+
+
+def test_normalize_sql_groups_statements_by_shape():
+    assert normalize_sql("SELECT * FROM spot WHERE id = 12 AND status = 'A'") == \
+        "SELECT * FROM spot WHERE id = ? AND status = ?"
+    assert normalize_sql("SELECT *\n  FROM spot WHERE id IN (?, ?, ?)") == "SELECT * FROM spot WHERE id IN (?...)"
+    assert normalize_sql("SELECT * FROM spot WHERE id = %(id_1)s") == normalize_sql("SELECT * FROM spot WHERE id = $1")
+
+
+def test_repeated_lookups_are_reported_as_n_plus_one(app, db, caplog):
+    monitor = app.extensions["query_monitor"]
+    stats, token = track("/api/test")
+    try:
+        for spot in ParkingSpot.query.limit(8).all():
+            db.session.get(ParkingLot, spot.lot_id, populate_existing=True)  # one lookup per row
+    finally:
+        untrack(token)
+    caplog.set_level(logging.WARNING, logger="services.querystats")
+    monitor.report(stats)
+    assert "Possible N+1 on /api/test: " in caplog.text
+    assert "8x SELECT parking_lot.id" in caplog.text
+
+
+def test_slow_queries_are_logged_with_their_route(app, client, user_headers, caplog, monkeypatch):
+    monkeypatch.setattr(app.extensions["query_monitor"], "slow_seconds", 0)
+    caplog.set_level(logging.WARNING, logger="services.querystats")
+    client.get("/api/user/role", headers=user_headers)
+    assert "on /api/user/role: SELECT user.auth_version" in caplog.text
+
+
+def test_max_queries_fails_past_the_ceiling(db):
+    with pytest.raises(AssertionError, match="2 statements, ceiling is 1"), max_queries(1):
+        ParkingLot.query.all()
+        ParkingLot.query.count()
+
+    @max_queries(1)
+    def one_lookup():
+        return ParkingLot.query.first()
+
+    assert one_lookup() is not None
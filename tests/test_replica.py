@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app, init_database
+from extensions import db
+from models.parking_lot import ParkingLot
+
+
+def _make_app(tmp_path, **config):
+    app = create_app(test_config={
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'primary.db'}",
+        "REPLICA_DATABASE_URI": f"sqlite:///{tmp_path / 'replica.db'}",
+        "REPLICA_CHECK_SECONDS": 3600,  # the tests refresh the router themselves
+        "REPLICA_MAX_LAG_SECONDS": 60,
+        "CACHE_TYPE": "SimpleCache",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "JWT_SECRET_KEY": "test-secret",
+        "SECRET_KEY": "test-secret",
+        **config,
+    })
+    with app.app_context():
+        init_database()
+    return app
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = _make_app(tmp_path)
+    assert "replica synced" in app.test_cli_runner().invoke(args=["sync-replica"]).output
+    app.extensions["replica_router"].refresh()
+    return app
+
+
+def _headers(client, email, password):
+    res = client.post("/api/auth/login", json={"email": email, "password": password})
+    return {"Authorization": f"Bearer {res.get_json()['access_token']}"}
+
+
+def _on_replica(app, sql):
+    with app.app_context(), db.engines["replica"].begin() as conn:
+        conn.execute(text(sql))
+
+
+def _book(client, headers, app):
+    with app.app_context():
+        spot = ParkingLot.query.first().spots[0]
+    start = datetime.now() + timedelta(days=1)
+    res = client.post("/api/parking/reserve", headers=headers, json={
+        "spot_id": spot.id, "vehicle_number": "KA01AB1234",
+        "parking_time": start.isoformat(), "leaving_time": (start + timedelta(hours=1)).isoformat(),
+    })
+    assert res.status_code == 201
+    return res.get_json()["reservation"]["id"]
+
+
+def _admin_feed_ids(client, headers):
+    return [r["id"] for r in client.get("/api/admin/reservations", headers=headers).get_json()["reservations"]]
+
+
+def test_read_endpoints_use_the_replica(replica_app):
+    client = replica_app.test_client()
+    headers = _headers(client, "admin@parkapp.com", "admin123")
+    _on_replica(replica_app, "UPDATE parking_lot SET prime_location_name = 'On the replica' WHERE id = 1")
+
+    names = [lot["name"] for lot in client.get("/api/admin/lots", headers=headers).get_json()["lots"]]
+    assert "On the replica" in names
+    assert client.get("/api/admin/replica-stats", headers=headers).get_json()["reads"]["replica"] == 1
+
+
+def test_writers_read_their_own_writes(replica_app):
+    client = replica_app.test_client()
+    user, admin = _headers(client, "user@parkapp.com", "user123"), _headers(client, "admin@parkapp.com", "admin123")
+    reservation_id = _book(client, user, replica_app)
+
+    # the writer is pinned to the primary; everyone else still reads the (stale) replica
+    dashboard = client.get("/api/user/dashboard-data", headers=user).get_json()
+    assert [r["id"] for r in dashboard["reservations"]] == [reservation_id]
+    assert _admin_feed_ids(client, admin) == []
+
+    replica_app.test_cli_runner().invoke(args=["sync-replica"])
+    assert _admin_feed_ids(client, admin) == [reservation_id]
+
+
+def test_lagging_replica_falls_back_to_the_primary(tmp_path):
+    app = _make_app(tmp_path, REPLICA_MAX_LAG_SECONDS=0.05)
+    app.test_cli_runner().invoke(args=["sync-replica"])
+    router = app.extensions["replica_router"]
+    client = app.test_client()
+    user, admin = _headers(client, "user@parkapp.com", "user123"), _headers(client, "admin@parkapp.com", "admin123")
+    reservation_id = _book(client, user, app)
+
+    router.refresh()
+    assert _admin_feed_ids(client, admin) == []  # just behind: still within the allowed lag
+    time.sleep(0.1)
+    router.refresh()
+    assert _admin_feed_ids(client, admin) == [reservation_id]
+    assert client.get("/api/admin/replica-stats", headers=admin).get_json()["healthy"] is False
+
+
+def test_broken_replica_falls_back_to_the_primary(replica_app):
+    client = replica_app.test_client()
+    headers = _headers(client, "admin@parkapp.com", "admin123")
+    replica_app.extensions["replica_router"].check_seconds = 3600
+    assert client.get("/api/admin/users", headers=headers).status_code == 200
+
+    # breaks between health checks: the failed view is rerun on the primary
+    _on_replica(replica_app, "DROP TABLE reservation")
+    res = client.get("/api/admin/reservations", headers=headers)
+    assert res.status_code == 200 and res.get_json()["reservations"] == []
+    stats = client.get("/api/admin/replica-stats", headers=headers).get_json()
+    assert stats["failures"] >= 1 and stats["healthy"] is False
+
+
+def test_lag_checks_run_in_the_background(replica_app, monkeypatch):
+    router = replica_app.extensions["replica_router"]
+    checked = []
+
+    def check(now):
+        checked.append(threading.current_thread().name)
+        router._next_check = time.monotonic() + 3600
+
+    monkeypatch.setattr(router, "_check", check)
+    router._next_check = 0.0  # due now
+    with replica_app.test_request_context():
+        assert router.use_replica(None)  # the last result, without waiting for a check
+    for _ in range(100):
+        if checked:
+            break
+        time.sleep(0.01)
+    assert checked == ["replica-lag"]
+
+
+def test_fast_reads_follow_the_replica_router(replica_app, asgi_client):
+    pytest.importorskip("aiosqlite")
+    replica_app.config["FAST_READS"] = True
+    asgi = asgi_client(replica_app)
+    client = replica_app.test_client()
+    user = _headers(client, "user@parkapp.com", "user123")
+    _on_replica(replica_app, "UPDATE parking_lot SET prime_location_name = 'On the replica' WHERE id = 1")
+
+    def lot_names():
+        return [lot["name"] for lot in json.loads(asgi.get("/api/parking/lots", user)[2])["lots"]]
+
+    assert "On the replica" in lot_names()
+    _book(client, user, replica_app)
+    assert "On the replica" not in lot_names()  # sticky after the booking
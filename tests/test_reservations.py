@@ -0,0 +1,281 @@
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import pytest
+
+from models.parking_lot import ParkingLot
+from models.parking_spot import ParkingSpot
+from models.reservation import Reservation
+from models.user import User
+
+
+@pytest.fixture
+def history(db):
+    """Seven reservations for the default test user, two sharing a parking_time."""
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    lots = ParkingLot.query.order_by(ParkingLot.id).all()
+    base = datetime(2026, 3, 1, 9, 0)
+    rows = []
+    for i in range(7):
+        spot = ParkingSpot.query.filter_by(lot_id=lots[i % 2].id, spot_no=i + 1).first()
+        rows.append(Reservation(
+            spot_id=spot.id,
+            user_id=user.id,
+            vehicle_number=f"KA01AB{i:04d}",
+            parking_time=base + timedelta(days=min(i, 5)),
+            leaving_time=base + timedelta(days=min(i, 5), hours=2),
+            cost=10.0,
+            status="C" if i < 4 else "U",
+        ))
+    db.session.add_all(rows)
+    db.session.commit()
+    return user, lots, rows
+
+
+def test_admin_feed_pages_by_keyset(client, admin_headers, history):
+    _, _, rows = history
+    seen = []
+    cursor = None
+    while True:
+        url = "/api/admin/reservations?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url, headers=admin_headers).get_json()
+        assert len(data["reservations"]) <= 3
+        seen += data["reservations"]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    expected = sorted(rows, key=lambda r: (r.parking_time, r.id), reverse=True)
+    assert [r["id"] for r in seen] == [r.id for r in expected]
+    assert seen[0]["user"] == "testuser"
+    assert seen[0]["lot_name"] == "Downtown Central Parking"
+
+
+def test_admin_feed_filters(client, admin_headers, history):
+    user, lots, _ = history
+
+    def ids(query):
+        res = client.get(f"/api/admin/reservations?{query}", headers=admin_headers)
+        assert res.status_code == 200
+        return len(res.get_json()["reservations"])
+
+    assert ids("status=completed") == 4
+    assert ids(f"lot_id={lots[1].id}") == 3
+    assert ids(f"user_id={user.id}&status=upcoming") == 3
+    assert ids("from=2026-03-02T00:00:00&to=2026-03-04T00:00:00") == 2
+    # an explicit offset is converted to local time, as for bookings
+    aware = {"from": datetime(2026, 3, 2).astimezone().isoformat(), "to": datetime(2026, 3, 4).astimezone().isoformat()}
+    assert ids(urlencode(aware)) == 2
+    assert client.get("/api/admin/reservations?from=yesterday", headers=admin_headers).status_code == 400
+    assert client.get("/api/admin/reservations?status=bogus", headers=admin_headers).status_code == 400
+    assert client.get("/api/admin/reservations?cursor=xyz", headers=admin_headers).status_code == 400
+
+
+def test_user_dashboard_stats_and_pages(client, user_headers, history):
+    _, _, rows = history
+    res = client.get("/api/user/dashboard-data?limit=4", headers=user_headers)
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["stats"] == {"active": 0, "completed": 4, "upcoming": 3, "cancelled": 0}
+    assert len(data["reservations"]) == 4
+    first = data["reservations"][0]
+    assert first["lot_name"] == "Downtown Central Parking"
+    assert first["lot_address"] == "123 Main Street"
+    assert first["status"] == "upcoming"
+
+    rest = client.get(
+        f"/api/user/dashboard-data?limit=4&cursor={data['next_cursor']}", headers=user_headers
+    ).get_json()
+    assert rest["next_cursor"] is None
+    assert len(rest["reservations"]) == 3
+    assert {r["id"] for r in data["reservations"] + rest["reservations"]} == {r.id for r in rows}
+
+    completed = client.get("/api/user/dashboard-data?status=completed", headers=user_headers).get_json()
+    assert {r["status"] for r in completed["reservations"]} == {"completed"}
+
+
+@pytest.mark.parametrize("hours_from_now", [0, 24])
+def test_concurrent_bookings_of_one_spot_have_one_winner(file_app, hours_from_now):
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Barrier
+
+    from extensions import db
+
+    with file_app.app_context():
+        lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+        spot_id = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first().id
+    login = file_app.test_client().post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+    start = datetime.now() + timedelta(hours=hours_from_now)
+    body = {
+        "spot_id": spot_id,
+        "vehicle_number": "KA01AB1234",
+        "parking_time": start.isoformat(),
+        "leaving_time": (start + timedelta(hours=2)).isoformat(),
+    }
+    threads = 8
+    barrier = Barrier(threads)
+
+    def attempt(_):
+        client = file_app.test_client()
+        barrier.wait()
+        return client.post("/api/parking/reserve", headers=headers, json=body).status_code
+
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(attempt, range(threads)))
+
+    assert codes.count(201) == 1
+    assert set(codes) <= {201, 400, 409}
+    with file_app.app_context():
+        assert Reservation.query.filter_by(spot_id=spot_id).count() == 1
+        lot = db.session.get(ParkingLot, lot.id)
+        assert lot.occupied_spots == (1 if hours_from_now == 0 else 0)
+
+
+def test_bulk_booking_raced_by_a_single_booking_is_a_conflict(file_app, monkeypatch):
+    from sqlalchemy import create_engine, insert
+
+    import app as app_module
+    from extensions import db
+
+    with file_app.app_context():
+        lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+        spot_id = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first().id
+        user_id = User.query.filter_by(email="user@parkapp.com").first().id
+        url = db.engine.url
+    login = file_app.test_client().post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+    start = datetime.now() + timedelta(hours=1)
+    leaving = start + timedelta(hours=2)
+
+    def plan_then_lose_the_race(*args, **kwargs):
+        plan = real_plan(*args, **kwargs)
+        # another worker books the spot after the plan was read
+        rival = create_engine(url)
+        with rival.begin() as conn:
+            conn.execute(insert(Reservation).values(
+                spot_id=spot_id, user_id=user_id, vehicle_number="KA01AB9999",
+                parking_time=start, leaving_time=leaving, status="U",
+            ))
+        rival.dispose()
+        return plan
+
+    real_plan = app_module.plan_bulk_reservations
+    monkeypatch.setattr(app_module, "plan_bulk_reservations", plan_then_lose_the_race)
+    res = file_app.test_client().post("/api/parking/reserve/bulk", headers=headers, json={"items": [
+        {"vehicle_number": "KA01AB1234", "spot_id": spot_id,
+         "parking_time": start.isoformat(), "leaving_time": leaving.isoformat()},
+    ]})
+
+    assert res.status_code == 409
+    assert "SQL" not in str(res.get_json())
+    with file_app.app_context():
+        assert Reservation.query.filter_by(spot_id=spot_id).count() == 1
+
+
+def test_overlap_guard_rejects_direct_inserts(db):
+    from sqlalchemy.exc import IntegrityError
+
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    spot = ParkingSpot.query.first()
+    start = datetime(2030, 1, 1, 9, 0)
+
+    def booking(hours, status="U"):
+        return Reservation(
+            spot_id=spot.id, user_id=user.id, vehicle_number="KA01AB1234",
+            parking_time=start + timedelta(hours=hours),
+            leaving_time=start + timedelta(hours=hours + 2),
+            cost=10.0, status=status,
+        )
+
+    db.session.add_all([booking(0), booking(2), booking(1, status="X")])
+    db.session.commit()
+    db.session.add(booking(1))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def _fleet(lot_id, count, hours_from_now=0, **extra):
+    start = datetime.now() + timedelta(hours=hours_from_now)
+    return [{
+        "vehicle_number": f"KA01FL{i:04d}",
+        "lot_id": lot_id,
+        "parking_time": start.isoformat(),
+        "leaving_time": (start + timedelta(hours=3)).isoformat(),
+        **extra,
+    } for i in range(count)]
+
+
+def test_bulk_reservation_books_whole_fleet(client, db, user_headers):
+    lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=2).first()
+    items = _fleet(lot.id, 10) + [{**_fleet(None, 1, hours_from_now=24)[0], "lot_id": None, "spot_id": spot.id}]
+
+    res = client.post("/api/parking/reserve/bulk", headers=user_headers, json={"items": items})
+    assert res.status_code == 201
+    body = res.get_json()
+    assert (body["created"], body["failed"]) == (11, 0)
+    spot_nos = [r["reservation"]["spot_no"] for r in body["results"]]
+    # spot 2 is free now, the later booking for it doesn't get in the way
+    assert spot_nos == list(range(1, 11)) + [2]
+    assert Reservation.query.count() == 11
+    db.session.refresh(lot)
+    assert (lot.available_spots, lot.occupied_spots) == (40, 10)
+
+
+def test_bulk_reservation_modes(client, db, user_headers):
+    lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=1).first()
+    clash = {"vehicle_number": "KA01FL9999", "spot_id": spot.id,
+             "leaving_time": (datetime.now() + timedelta(hours=1)).isoformat()}
+    items = [clash, dict(clash), {"vehicle_number": "", "lot_id": lot.id}] + _fleet(lot.id, 2)
+
+    res = client.post("/api/parking/reserve/bulk", headers=user_headers, json={"items": items})
+    assert res.status_code == 400
+    assert [r["index"] for r in res.get_json()["results"]] == [1, 2]
+    assert Reservation.query.count() == 0
+
+    res = client.post("/api/parking/reserve/bulk", headers=user_headers, json={"mode": "best_effort", "items": items})
+    assert res.status_code == 201
+    body = res.get_json()
+    assert (body["created"], body["failed"]) == (3, 2)
+    assert [r["status"] for r in body["results"]] == ["created", "error", "error", "created", "created"]
+    assert [r["reservation"]["spot_no"] for r in body["results"] if r["status"] == "created"] == [1, 2, 3]
+
+    too_many = {"items": _fleet(lot.id, 501)}
+    assert client.post("/api/parking/reserve/bulk", headers=user_headers, json=too_many).status_code == 400
+
+
+def test_bulk_reservation_rejects_badly_typed_input(client, db, user_headers):
+    lot = ParkingLot.query.filter_by(prime_location_name="Downtown Central Parking").first()
+    spot = ParkingSpot.query.filter_by(lot_id=lot.id, spot_no=5).first()
+    assert client.post("/api/parking/reserve/bulk", headers=user_headers, json=[1]).status_code == 400
+
+    good = _fleet(lot.id, 1)[0]
+    items = [good, {**good, "lot_id": None, "spot_id": [spot.id]}, {**good, "lot_id": None, "spot_id": str(spot.id)},
+             {**good, "lot_id": True}]
+    res = client.post("/api/parking/reserve/bulk", headers=user_headers, json={"items": items})
+    assert res.status_code == 400
+    assert [(r["index"], list(r["errors"])) for r in res.get_json()["results"]] == [
+        (1, ["spot_id"]), (2, ["spot_id"]), (3, ["lot_id"]),
+    ]
+    assert Reservation.query.count() == 0
+
+
+def test_non_string_times_are_a_bad_request(client, db, user_headers):
+    from services.intervals import parse_client_time
+
+    with pytest.raises(ValueError):
+        parse_client_time(123)
+    spot = ParkingSpot.query.first()
+    leaving = (datetime.now() + timedelta(hours=2)).isoformat()
+    res = client.post("/api/parking/reserve", headers=user_headers, json={
+        "spot_id": spot.id, "vehicle_number": "KA01AB1234", "parking_time": 123, "leaving_time": leaving,
+    })
+    assert res.status_code == 400
+    assert res.get_json()["errors"] == {"general": "Use ISO format for dates"}
+    res = client.post(f"/api/parking/lots/{spot.lot_id}/reserve-any", headers=user_headers, json={
+        "vehicle_number": "KA01AB1234", "leaving_time": 1893456000,
+    })
+    assert res.status_code == 400
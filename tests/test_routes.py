@@ -1,3 +1,6 @@
+import pytest
+
+
 def test_api_root_message(client):
     response = client.get("/")
     assert response.status_code == 200
@@ -18,3 +21,54 @@ def test_token_auth_flow(client, db):
     assert response.status_code == 200
     data = response.get_json()
     assert "access_token" in data
+
+
+@pytest.fixture
+def statements(db):
+    """SQL run from here on; request it after the login fixtures."""
+    from sqlalchemy import event
+
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_admin_checks_come_from_token_claims(client, admin_headers, user_headers, statements):
+    assert client.get("/api/admin/cache-stats", headers=admin_headers).status_code == 200
+    assert client.get("/api/admin/cache-stats", headers=user_headers).status_code == 403
+    assert client.get("/api/user/role", headers=admin_headers).get_json() == {"role": "admin"}
+    # only the auth version lookup (NullCache in tests), never the roles tables
+    assert not [s for s in statements if "roles_users" in s or "FROM role" in s]
+
+
+def test_role_and_active_changes_invalidate_tokens(client, db, user_headers):
+    from models.user import Role, User
+
+    user = User.query.filter_by(email="user@parkapp.com").first()
+    user.roles.append(Role.query.filter_by(name="admin").first())
+    db.session.commit()
+    assert user.auth_version == 1
+
+    assert client.get("/api/user/role", headers=user_headers).status_code == 401
+    login = client.post("/api/auth/login", json={"email": "user@parkapp.com", "password": "user123"})
+    headers = {"Authorization": f"Bearer {login.get_json()['access_token']}"}
+    assert client.get("/api/admin/cache-stats", headers=headers).status_code == 200
+
+    user.active = False
+    db.session.commit()
+    assert client.get("/api/admin/cache-stats", headers=headers).status_code == 401
+
+
+def test_tokens_without_auth_claims_are_rejected(client, db):
+    from flask_jwt_extended import create_access_token
+
+    from models.user import User
+
+    user = User.query.filter_by(email="admin@parkapp.com").first()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+    assert client.get("/api/admin/cache-stats", headers=headers).status_code == 401
@@ -21,3 +21,69 @@ def test_gunicorn_config_valid():
             content = f.read()
         assert "worker_class" in content
         assert "uvicorn.workers.UvicornWorker" in content
+
+
+def test_create_app_does_no_database_io(tmp_path):
+    from app import create_app
+
+    path = tmp_path / "parking.db"
+    app = create_app(test_config={"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    assert not path.exists()
+
+    result = app.test_cli_runner().invoke(args=["init-db", "--no-sample-data"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        from models.parking_lot import ParkingLot
+        from models.user import User
+
+        assert User.query.filter_by(email="admin@parkapp.com").first() is not None
+        assert ParkingLot.query.count() == 0
+
+
+def test_sqlite_connections_get_production_pragmas(file_app):
+    from sqlalchemy import text
+
+    from extensions import db
+
+    with file_app.app_context():
+        def pragma(name):
+            return db.session.execute(text(f"PRAGMA {name}")).scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("busy_timeout") == file_app.config["SQLITE_PRAGMAS"]["busy_timeout"]
+        assert pragma("synchronous") == 1  # NORMAL
+
+
+def test_sqlite_write_lock_serializes_writers_in_a_process(tmp_path):
+    import threading
+
+    from sqlalchemy import create_engine, text
+
+    from services.sqlite import configure_sqlite
+
+    # no busy timeout at all: without the lock the second writer would fail straight away
+    engine = create_engine(f"sqlite:///{tmp_path / 'w.db'}", connect_args={"timeout": 0})
+    configure_sqlite(engine, {"SQLITE_PRAGMAS": {"journal_mode": "WAL"}, "SQLITE_WRITE_LOCK": True})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (n INTEGER)"))
+
+    first = engine.connect()
+    first.begin()
+    first.execute(text("INSERT INTO t VALUES (1)"))
+
+    second_done = threading.Event()
+
+    def second_writer():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+        second_done.set()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    assert not second_done.wait(0.3)  # queued behind the first writer
+    first.commit()
+    first.close()
+    thread.join(5)
+    assert second_done.is_set()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 2